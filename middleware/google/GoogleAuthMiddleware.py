@@ -1,14 +1,25 @@
 import json
+import threading
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi import Request
-from google.auth.transport.requests import Request as GoogleRequest
 from google.oauth2.credentials import Credentials
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
 from cryptography.fernet import Fernet
 from core.utils.env import EnvConfig
 from core.utils.state import global_state
 from core.utils.logger import logger
+from core.utils.config import config
+from app.middleware.google.token_refresh import (
+    refresh_credentials,
+    coalesced_refresh,
+)
+from app.middleware.google.id_token_verifier import verify_oauth2_token
+from app.middleware.google.request_state import request_state
+from app.middleware.google.executor import BlockingExecutor, BLOCKING_POOL_SIZE
+from app.middleware.google.credentials_cache import (
+    CredentialsCache,
+    CREDENTIALS_CACHE_MAX_SIZE,
+    CREDENTIALS_CACHE_TTL,
+)
 
 
 # Load the encryption key from the environment variable
@@ -22,28 +33,109 @@ class GoogleAuthMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.db_handler = global_state.get("db_handler")
         self.auth_callback = auth_callback
+        self.credentials_cache = CredentialsCache(
+            max_size=config.get(
+                "GOOGLE_AUTH_CREDENTIALS_CACHE_SIZE", CREDENTIALS_CACHE_MAX_SIZE
+            ),
+            ttl=config.get("GOOGLE_AUTH_CREDENTIALS_CACHE_TTL", CREDENTIALS_CACHE_TTL),
+        )
+        self.db_handler.add_invalidation_hook(self.credentials_cache.invalidate)
+        global_state.set("credentials_cache", self.credentials_cache, True)
+        # Blocking database and crypto work runs here instead of on the event loop
+        self.executor = BlockingExecutor(
+            max_workers=config.get(
+                "GOOGLE_AUTH_MIDDLEWARE_POOL_SIZE", BLOCKING_POOL_SIZE
+            )
+        )
+        global_state.set("auth_executor", self.executor, True)
+
+    def _refresh_credentials(self, access_token, user_id, creds):
+        """Refresh expired credentials and persist the new access token."""
+        logger.info("GoogleAuthMiddleware: Refreshing expired credentials.")
+
+        def refresh():
+            new_creds = refresh_credentials(creds)
+            id_info = verify_oauth2_token(new_creds.id_token, new_creds.client_id)
+            logger.info(
+                f"GoogleAuthMiddleware new access token for user {id_info['sub']}: {new_creds.token}"
+            )
+            self.db_handler.update_access_token(
+                user_id, new_creds.token, new_creds.expiry
+            )
+            return new_creds
+
+        try:
+            # Parallel requests of the same user share a single refresh
+            creds = coalesced_refresh(self.db_handler, user_id, refresh)
+            self.credentials_cache.set(access_token, user_id, creds)
+            return creds
+
+        except Exception as e:
+            logger.error(
+                f"GoogleAuthMiddleware error refreshing credentials: {str(e)}",
+                exc_info=True,
+            )
+            raise RuntimeError(
+                f"There has been an error with authenticating, please go to {EnvConfig.get('APP_HOST')}/auth/login and authenticate again"
+            ) from e
+
+    def _deferred_refresh(self, access_token, user_id, creds):
+        """Return a provider that refreshes the credentials once, on first use."""
+        lock = threading.Lock()
+        refreshed = {}
+
+        def provider():
+            with lock:
+                if "credentials" not in refreshed:
+                    refreshed["credentials"] = self._refresh_credentials(
+                        access_token, user_id, creds
+                    )
+            return refreshed["credentials"]
+
+        return provider
 
     async def dispatch(self, request: Request, call_next):
         """Authenticate with Google Drive and Docs before processing the request."""
+        # Authentication status and services are scoped to this request only
+        scope = request_state.begin()
+        try:
+            return await self._authenticate(request, call_next)
+        finally:
+            request_state.end(scope)
+
+    async def _authenticate(self, request: Request, call_next):
         logger.info("GoogleAuthMiddleware: checking credentials")
         try:
-            global_state.set(
+            request_state.set(
                 "middleware.GoogleAuthMiddleware.is_authenticated", False, True
             )
             access_token = request.headers.get("x-access-token", None)
 
             if not access_token:
-                global_state.set(
+                request_state.set(
                     "middleware.GoogleAuthMiddleware.error_message",
                     f"X-ACCESS-TOKEN is a required header parameter. Please go to {EnvConfig.get('APP_HOST')}/auth/login to get the required paramaters.",
                     True,
                 )
                 return await call_next(request)
 
+            # Serve recently used credentials without touching the database
+            cached = self.credentials_cache.get(access_token)
+            if cached:
+                self.executor.submit(self.db_handler.touch_last_used, cached["user_id"])
+                request_state.set("google_user_id", cached["user_id"], True)
+                self.auth_callback()(cached["credentials"])
+                request_state.set(
+                    "middleware.GoogleAuthMiddleware.is_authenticated", True, True
+                )
+                return await call_next(request)
+
             try:
-                cred = self.db_handler.get_credentials(access_token)
+                cred = await self.executor.run(
+                    self.db_handler.get_credentials, access_token
+                )
             except Exception as e:
-                global_state.set(
+                request_state.set(
                     "middleware.GoogleAuthMiddleware.error_message",
                     f"There has been an error with authenticating, please go to {EnvConfig.get('APP_HOST')}/auth/login and authenticate again",
                     True,
@@ -51,7 +143,7 @@ class GoogleAuthMiddleware(BaseHTTPMiddleware):
                 return await call_next(request)
 
             if "error" in cred:
-                global_state.set(
+                request_state.set(
                     "middleware.GoogleAuthMiddleware.error_message",
                     f"There has been an error with authenticating, please go to {EnvConfig.get('APP_HOST')}/auth/login and authenticate again",
                     True,
@@ -61,6 +153,10 @@ class GoogleAuthMiddleware(BaseHTTPMiddleware):
                 )
                 return await call_next(request)  # Proceed without authentication
 
+            # Mark the user active so the scheduler refreshes the token ahead of expiry
+            self.executor.submit(self.db_handler.touch_last_used, cred["user_id"])
+            request_state.set("google_user_id", cred["user_id"], True)
+
             # Extract credentials
             credentials = cred["credentials"]
             try:
@@ -74,54 +170,31 @@ class GoogleAuthMiddleware(BaseHTTPMiddleware):
             # Validate credentials
             if not creds or not creds.valid:
                 if creds and creds.expired and creds.refresh_token:
-                    logger.info("GoogleAuthMiddleware: Refreshing expired credentials.")
-                    try:
-                        creds = Credentials(
-                            None,
-                            refresh_token=creds.refresh_token,
-                            client_id=creds.client_id,
-                            client_secret=creds.client_secret,
-                            token_uri="https://oauth2.googleapis.com/token",
-                        )
-                        creds.refresh(GoogleRequest())
-                        id_info = id_token.verify_oauth2_token(
-                            creds.id_token,
-                            google_requests.Request(),
-                            creds.client_id,
-                        )
-                        user_id = id_info["sub"]
-                        logger.info(
-                            f"GoogleAuthMiddleware new access token for user {user_id}: {creds.token}"
-                        )
-
-                        self.db_handler.update_access_token(user_id, creds.token)
-
-                    except Exception as e:
-                        logger.error(
-                            f"GoogleAuthMiddleware error refreshing credentials: {str(e)}",
-                            exc_info=True,
-                        )
-                        global_state.set(
-                            "middleware.GoogleAuthMiddleware.error_message",
-                            f"There has been an error with authenticating, please go to {EnvConfig.get('APP_HOST')}/auth/login and authenticate again",
-                            True,
-                        )
-                        return await call_next(request)
+                    # Defer the refresh until a tool actually uses a Google service
+                    self.auth_callback()(
+                        self._deferred_refresh(access_token, cred["user_id"], creds)
+                    )
+                    request_state.set(
+                        "middleware.GoogleAuthMiddleware.is_authenticated", True, True
+                    )
+                    return await call_next(request)
 
                 else:
                     logger.warning("GoogleAuthMiddleware: Invalid credentials.")
                     # self.db_handler.delete_credentials(encrypted_user_id)
-                    global_state.set(
+                    request_state.set(
                         "middleware.GoogleAuthMiddleware.error_message",
                         f"There has been an error with authenticating, please deauthenticate the app and go to {EnvConfig.get('APP_HOST')}/auth/login",
                         True,
                     )
                     return await call_next(request)  # Proceed without authentication
 
+            self.credentials_cache.set(access_token, cred["user_id"], creds)
+
             # Attach services to request state
             self.auth_callback()(creds)
 
-            global_state.set(
+            request_state.set(
                 "middleware.GoogleAuthMiddleware.is_authenticated", True, True
             )
             response = await call_next(request)
@@ -129,7 +202,7 @@ class GoogleAuthMiddleware(BaseHTTPMiddleware):
 
         except Exception as e:
             logger.error(f"GoogleAuthMiddleware authentication failed: {str(e)}")
-            global_state.set(
+            request_state.set(
                 "middleware.GoogleAuthMiddleware.error_message",
                 f"There has been an error with authenticating, please go to {EnvConfig.get('APP_HOST')}/auth/login to authenticate",
                 True,
@@ -139,13 +212,13 @@ class GoogleAuthMiddleware(BaseHTTPMiddleware):
 
 def check_access(returnJsonOnError=False):
 
-    if not global_state.get("middleware.GoogleAuthMiddleware.is_authenticated"):
+    if not request_state.get("middleware.GoogleAuthMiddleware.is_authenticated"):
         logger.error("GoogleAuthMiddleware: User is not authenticated.")
 
         if returnJsonOnError:
             return {
                 "status": "error",
-                "error": global_state.get(
+                "error": request_state.get(
                     "middleware.GoogleAuthMiddleware.error_message",
                     "User is not authenticated.",
                 ),
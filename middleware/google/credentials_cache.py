@@ -0,0 +1,119 @@
+import time
+import threading
+from collections import OrderedDict
+from core.utils.logger import logger
+from app.middleware.google.database import parse_expiry
+
+# Cache defaults, can be overridden from app config
+CREDENTIALS_CACHE_MAX_SIZE = 1024  # Maximum number of cached access tokens
+CREDENTIALS_CACHE_TTL = 300  # Seconds an entry is kept at most
+CREDENTIALS_CACHE_EXPIRY_MARGIN = 60  # Seconds before token expiry entries are dropped
+
+
+class CredentialsCache:
+    """Bounded LRU cache of ready to use Google credentials keyed by access token."""
+
+    def __init__(
+        self,
+        max_size=CREDENTIALS_CACHE_MAX_SIZE,
+        ttl=CREDENTIALS_CACHE_TTL,
+        expiry_margin=CREDENTIALS_CACHE_EXPIRY_MARGIN,
+    ):
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self.expiry_margin = expiry_margin
+        self._entries = OrderedDict()  # access_token -> (expires_at, user_id, creds)
+        self._tokens_by_user = {}  # user_id -> set of access tokens
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _expires_at(self, credentials):
+        """Entries live for the TTL, but never past the token expiry."""
+        expires_at = time.time() + self.ttl
+        token_expires_at = parse_expiry(getattr(credentials, "expiry", None))
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at - self.expiry_margin)
+        return expires_at
+
+    def get(self, access_token):
+        """Return {"user_id", "credentials"} for the access token or None."""
+        with self._lock:
+            entry = self._entries.get(access_token)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            expires_at, user_id, credentials = entry
+            if expires_at <= time.time():
+                self._remove(access_token)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(access_token)
+            self._stats["hits"] += 1
+            return {"user_id": user_id, "credentials": credentials}
+
+    def set(self, access_token, user_id, credentials):
+        """Cache credentials for an access token, evicting the least recently used entries."""
+        expires_at = self._expires_at(credentials)
+        if expires_at <= time.time():
+            return  # Token is about to expire, nothing to gain from caching it
+
+        with self._lock:
+            if access_token in self._entries:
+                self._remove(access_token)
+            self._entries[access_token] = (expires_at, user_id, credentials)
+            self._tokens_by_user.setdefault(user_id, set()).add(access_token)
+
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, user_id=None, access_token=None):
+        """Drop cached credentials for a user and/or an access token."""
+        with self._lock:
+            tokens = set(self._tokens_by_user.get(user_id, ())) if user_id else set()
+            if access_token:
+                tokens.add(access_token)
+            for token in tokens:
+                if self._remove(token):
+                    self._stats["invalidations"] += 1
+
+        if tokens:
+            logger.debug(
+                f"GoogleAuthMiddleware invalidated {len(tokens)} cached credential(s)"
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+    def _remove(self, access_token):
+        """Remove an entry, the lock must be held by the caller."""
+        entry = self._entries.pop(access_token, None)
+        if entry is None:
+            return False
+        user_tokens = self._tokens_by_user.get(entry[1])
+        if user_tokens is not None:
+            user_tokens.discard(access_token)
+            if not user_tokens:
+                del self._tokens_by_user[entry[1]]
+        return True
@@ -1,34 +1,289 @@
 import sqlite3
 import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from contextlib import contextmanager
 from cryptography.fernet import Fernet
 from core.utils.logger import logger
 from core.utils.state import global_state
 from core.utils.env import EnvConfig
+from core.utils.config import config
+from app.middleware.google.token_refresh import (
+    TokenRefreshScheduler,
+    TOKEN_REFRESH_INTERVAL,
+    TOKEN_REFRESH_WINDOW,
+    TOKEN_REFRESH_ACTIVE_WINDOW,
+)
+
+# Connection pool defaults, can be overridden from app config
+DB_POOL_SIZE = 8  # Maximum number of open connections
+DB_POOL_TIMEOUT = 10  # Seconds to wait for a free connection
+DB_BUSY_TIMEOUT = 5000  # Milliseconds sqlite waits on a locked database
+DB_SYNCHRONOUS = "NORMAL"  # Safe with WAL, avoids an fsync per commit
+DB_CACHED_STATEMENTS = 64  # Prepared statements kept per connection
+
+# Ordered schema migrations applied on startup, each entry is
+# (version, description, list of SQL statements). Never edit an applied
+# migration, append a new one instead.
+MIGRATIONS = [
+    (
+        1,
+        "Unique index on user_credentials.access_token",
+        [
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_credentials_access_token ON user_credentials (access_token)",
+        ],
+    ),
+    (
+        2,
+        "Token expiry and last used timestamps",
+        [
+            "ALTER TABLE user_credentials ADD COLUMN token_expiry REAL",
+            "ALTER TABLE user_credentials ADD COLUMN last_used_at REAL",
+            "CREATE INDEX IF NOT EXISTS idx_user_credentials_token_expiry ON user_credentials (token_expiry)",
+        ],
+    ),
+    (
+        3,
+        "Cross-process token refresh leases",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS refresh_leases (
+                user_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """,
+        ],
+    ),
+    (
+        4,
+        "Last failed token refresh timestamp",
+        [
+            "ALTER TABLE user_credentials ADD COLUMN refresh_failed_at REAL",
+        ],
+    ),
+]
+
+
+def parse_expiry(expiry):
+    """Convert a credentials expiry (ISO string or naive UTC datetime) to a unix timestamp."""
+    if not expiry:
+        return None
+    if isinstance(expiry, str):
+        expiry = datetime.strptime(
+            expiry.rstrip("Z").split(".")[0], "%Y-%m-%dT%H:%M:%S"
+        )
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)  # google-auth uses naive UTC
+    return expiry.timestamp()
 
 
 def init_db(server_name, dbPath=None):
     encryption_key = EnvConfig.get("CYPHER")
     cipher = Fernet(encryption_key)
     db_path = EnvConfig.get("DB_PATH") if dbPath is None else dbPath
-    db_handler = DatabaseHandler(db_path, cipher)
+    db_handler = DatabaseHandler(
+        db_path,
+        cipher,
+        pool_size=config.get("GOOGLE_AUTH_DB_POOL_SIZE", DB_POOL_SIZE),
+        pool_timeout=config.get("GOOGLE_AUTH_DB_POOL_TIMEOUT", DB_POOL_TIMEOUT),
+        busy_timeout=config.get("GOOGLE_AUTH_DB_BUSY_TIMEOUT", DB_BUSY_TIMEOUT),
+    )
     global_state.set("db_handler", db_handler)
     logger.info("GoogleAuthMiddleware: Database initialized successfully.")
 
+    if config.get("GOOGLE_TOKEN_REFRESH_ENABLED", True):
+        scheduler = TokenRefreshScheduler(
+            db_handler,
+            interval=config.get(
+                "GOOGLE_TOKEN_REFRESH_INTERVAL", TOKEN_REFRESH_INTERVAL
+            ),
+            refresh_window=config.get(
+                "GOOGLE_TOKEN_REFRESH_WINDOW", TOKEN_REFRESH_WINDOW
+            ),
+            active_window=config.get(
+                "GOOGLE_TOKEN_REFRESH_ACTIVE_WINDOW", TOKEN_REFRESH_ACTIVE_WINDOW
+            ),
+        )
+        scheduler.start()
+        global_state.set("token_refresh_scheduler", scheduler)
+
+
+class ConnectionPool:
+    """Bounded pool of persistent SQLite connections shared between threads."""
+
+    def __init__(
+        self,
+        db_path,
+        pool_size=DB_POOL_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        busy_timeout=DB_BUSY_TIMEOUT,
+        synchronous=DB_SYNCHRONOUS,
+    ):
+        self.db_path = db_path
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.busy_timeout = int(busy_timeout)
+        self.synchronous = synchronous
+        self._idle = queue.LifoQueue()  # Most recently used connection first
+        self._lock = threading.Lock()
+        self._connections = []
+        self._stats = {
+            "created": 0,
+            "acquired": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+        }
+
+    def _create_connection(self):
+        """Open a new connection configured for concurrent access."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout / 1000,
+            check_same_thread=False,  # Connections move between threads via the pool
+            cached_statements=DB_CACHED_STATEMENTS,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout}")
+        logger.info(
+            f"GoogleAuthMiddleware opened database connection {len(self._connections) + 1}/{self.pool_size}"
+        )
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening a new one if below the limit."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._connections) < self.pool_size:
+                    conn = self._create_connection()
+                    self._connections.append(conn)
+                    self._stats["created"] += 1
+                else:
+                    self._stats["waits"] += 1
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"No database connection available after {self.timeout} seconds"
+                    )
+
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(
+                self._stats["peak_in_use"], self._stats["in_use"]
+            )
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool."""
+        if conn.in_transaction:
+            conn.rollback()  # Never hand out a connection with a pending transaction
+        with self._lock:
+            self._stats["in_use"] -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Return a snapshot of the pool statistics."""
+        with self._lock:
+            return {
+                **self._stats,
+                "open": len(self._connections),
+                "idle": self._idle.qsize(),
+                "pool_size": self.pool_size,
+            }
+
+    def close(self):
+        """Close every connection owned by the pool."""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logger.warning(
+                        f"GoogleAuthMiddleware error closing connection: {e}"
+                    )
+            self._connections = []
+            self._idle = queue.LifoQueue()
+
 
 class DatabaseHandler:
     """Class to handle database operations."""
 
-    def __init__(self, db_path, cipher):
+    def __init__(
+        self,
+        db_path,
+        cipher,
+        pool_size=DB_POOL_SIZE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        busy_timeout=DB_BUSY_TIMEOUT,
+    ):
         self.db_path = db_path
         self.cipher = cipher
+        self.invalidation_hooks = []  # Called when stored credentials change
+        self._last_used = {}  # user_id -> last time last_used_at was written
+        self.pool = ConnectionPool(
+            db_path,
+            pool_size=pool_size,
+            timeout=pool_timeout,
+            busy_timeout=busy_timeout,
+        )
         self.initialize_db()
 
+    def add_invalidation_hook(self, callback):
+        """Register a callback(user_id, access_token) run after credentials change."""
+        self.invalidation_hooks.append(callback)
+
+    def _notify_invalidation(self, user_id, access_token=None):
+        for callback in self.invalidation_hooks:
+            try:
+                callback(user_id=user_id, access_token=access_token)
+            except Exception as e:
+                logger.error(
+                    f"GoogleAuthMiddleware invalidation hook failed: {str(e)}",
+                    exc_info=True,
+                )
+
+    def get_pool_stats(self):
+        """Return connection pool statistics."""
+        return self.pool.stats()
+
+    def close(self):
+        """Close all pooled database connections."""
+        self.pool.close()
+
     def initialize_db(self):
         """Create the SQLite database and tables if they do not exist."""
         logger.info(
             f"GoogleAuthMiddleware initializing database at: {self.db_path}"
         )  # Log database initialization
-        conn = sqlite3.connect(self.db_path)
+        with self.pool.connection() as conn:
+            self._create_tables(conn)
+            self._apply_migrations(conn)
+        logger.info(
+            "Database initialized successfully."
+        )  # Log successful initialization
+
+    def _create_tables(self, conn):
         cursor = conn.cursor()
 
         # Create table for user credentials with access_token column
@@ -42,12 +297,55 @@ class DatabaseHandler:
             """
         )
 
+        # Track applied schema migrations
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at REAL NOT NULL
+            )
+            """
+        )
+
         conn.commit()
         cursor.close()
-        conn.close()
-        logger.info(
-            "Database initialized successfully."
-        )  # Log successful initialization
+
+    def get_schema_version(self, conn=None):
+        """Return the highest applied migration version."""
+        if conn is None:
+            with self.pool.connection() as conn:
+                return self.get_schema_version(conn)
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+
+    def _apply_migrations(self, conn):
+        """Apply pending migrations in order, each one in its own transaction."""
+        for version, description, statements in MIGRATIONS:
+            # Take the write lock first so concurrent workers don't migrate twice
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.get_schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+
+                logger.info(
+                    f"GoogleAuthMiddleware applying database migration {version}: {description}"
+                )
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, time.time()),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logger.error(
+                    f"GoogleAuthMiddleware database migration {version} failed",
+                    exc_info=True,
+                )
+                raise
 
     def insert_credentials(self, user_id: str, credentials_json: dict):
         """Insert encrypted JSON credentials into the database."""
@@ -55,62 +353,73 @@ class DatabaseHandler:
             f"GoogleAuthMiddleware inserting credentials for user_id: {user_id}"
         )  # Log credential insertion
 
-        # Connect to the database
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
 
-        # Check if the user already exists to retrieve the existing access token
-        cursor.execute(
-            "SELECT access_token, credentials_json FROM user_credentials WHERE user_id = ?",
-            (user_id,),
-        )
-        existing_credentials = cursor.fetchone()
-
-        if existing_credentials:
-            # If the user exists, retrieve the existing access token and credentials using named access
-            access_token = existing_credentials["access_token"]  # Access by column name
-            existing_credentials_json = json.loads(
-                self.cipher.decrypt(existing_credentials["credentials_json"]).decode()
-            )
-            credentials_json["refresh_token"] = (
-                credentials_json["refresh_token"]
-                if credentials_json["refresh_token"]
-                else existing_credentials_json.get("refresh_token")
-            )
-            logger.info(
-                f"GoogleAuthMiddleware existing credentials found for user_id: {user_id}."
-            )
-        else:
-            # Generate a new access token
-            access_token = (
-                Fernet(EnvConfig.get("CYPHER").encode())
-                .encrypt(user_id.encode())
-                .decode()
+            # Check if the user already exists to retrieve the existing access token
+            cursor.execute(
+                "SELECT access_token, credentials_json FROM user_credentials WHERE user_id = ?",
+                (user_id,),
             )
-            logger.info(
-                f"GoogleAuthMiddleware no existing credentials found for user_id: {user_id}. Generated new access token."
+            existing_credentials = cursor.fetchone()
+
+            if existing_credentials:
+                # If the user exists, retrieve the existing access token and credentials using named access
+                access_token = existing_credentials[
+                    "access_token"
+                ]  # Access by column name
+                existing_credentials_json = json.loads(
+                    self.cipher.decrypt(
+                        existing_credentials["credentials_json"]
+                    ).decode()
+                )
+                credentials_json["refresh_token"] = (
+                    credentials_json["refresh_token"]
+                    if credentials_json["refresh_token"]
+                    else existing_credentials_json.get("refresh_token")
+                )
+                logger.info(
+                    f"GoogleAuthMiddleware existing credentials found for user_id: {user_id}."
+                )
+            else:
+                # Generate a new access token
+                access_token = (
+                    Fernet(EnvConfig.get("CYPHER").encode())
+                    .encrypt(user_id.encode())
+                    .decode()
+                )
+                logger.info(
+                    f"GoogleAuthMiddleware no existing credentials found for user_id: {user_id}. Generated new access token."
+                )
+
+            encrypted_credentials = self.cipher.encrypt(
+                json.dumps(credentials_json).encode()
             )
 
-        encrypted_credentials = self.cipher.encrypt(
-            json.dumps(credentials_json).encode()
-        )
+            # Insert or update the credentials in the database
+            cursor.execute(
+                """
+                INSERT INTO user_credentials (user_id, credentials_json, access_token, token_expiry)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET 
+                    credentials_json = excluded.credentials_json,
+                    token_expiry = excluded.token_expiry,
+                    refresh_failed_at = NULL,
+                    access_token = access_token;  -- Keep existing access token
+                """,
+                (
+                    user_id,
+                    encrypted_credentials,
+                    access_token,
+                    parse_expiry(credentials_json.get("expiry")),
+                ),
+            )
 
-        # Insert or update the credentials in the database
-        cursor.execute(
-            """
-            INSERT INTO user_credentials (user_id, credentials_json, access_token)
-            VALUES (?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET 
-                credentials_json = excluded.credentials_json,
-                access_token = access_token;  -- Keep existing access token
-            """,
-            (user_id, encrypted_credentials, access_token),
-        )
+            conn.commit()
+            cursor.close()
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+        self._notify_invalidation(user_id, access_token)
         logger.info(
             f"GoogleAuthMiddleware credentials for user_id: {user_id} inserted/updated successfully."
         )  # Log success
@@ -123,22 +432,20 @@ class DatabaseHandler:
             logger.info(
                 f"GoogleAuthMiddleware retrieving credentials for access_token: {identifier}"
             )  # Log credential retrieval
-            query = "SELECT credentials_json, access_token, user_id FROM user_credentials WHERE access_token = ?;"
+            query = "SELECT credentials_json, access_token, token_expiry, user_id FROM user_credentials WHERE access_token = ?;"
             params = (identifier,)
         else:
             logger.info(
                 f"GoogleAuthMiddleware retrieving credentials for user_id: {identifier}"
             )  # Log credential retrieval
-            query = "SELECT credentials_json, access_token FROM user_credentials WHERE user_id = ?;"
+            query = "SELECT credentials_json, access_token, token_expiry FROM user_credentials WHERE user_id = ?;"
             params = (identifier,)
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(query, params)
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            result = cursor.fetchone()
+            cursor.close()
 
         if result:
             encrypted_credentials = result[0]
@@ -147,7 +454,7 @@ class DatabaseHandler:
             )
             access_token = result[1]  # Retrieve access token
             user_id = (
-                result[2] if by_access_token else identifier
+                result[3] if by_access_token else identifier
             )  # Get user_id if searching by access token
             logger.info(
                 f"GoogleAuthMiddleware credentials retrieved successfully for identifier: {identifier}"
@@ -156,6 +463,7 @@ class DatabaseHandler:
                 "user_id": user_id,
                 "credentials": decrypted_credentials,
                 "access_token": access_token,
+                "token_expiry": result[2],
             }
         else:
             logger.warning(
@@ -163,25 +471,109 @@ class DatabaseHandler:
             )  # Log warning for not found
             return {"error": "User ID not found."}
 
+    def touch_last_used(self, user_id: str, min_interval: int = 60):
+        """Record that a user made a request, written at most once per min_interval seconds."""
+        now = time.time()
+        if now - self._last_used.get(user_id, 0) < min_interval:
+            return
+        self._last_used[user_id] = now
+
+        with self.pool.connection() as conn:
+            conn.execute(
+                "UPDATE user_credentials SET last_used_at = ? WHERE user_id = ?;",
+                (now, user_id),
+            )
+            conn.commit()
+
+    def get_credentials_expiring(
+        self,
+        before: float,
+        active_since: float = 0,
+        limit: int = 100,
+        failed_before: float = None,
+    ):
+        """Return (user_id, credentials) of users active since active_since whose token expires before the given time.
+
+        Users whose last refresh failed at or after failed_before are left out,
+        so they don't take the places of other users in every batch.
+        """
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT user_id, credentials_json FROM user_credentials
+                WHERE token_expiry IS NOT NULL AND token_expiry < ?
+                    AND last_used_at >= ?
+                    AND (refresh_failed_at IS NULL OR ? IS NULL OR refresh_failed_at < ?)
+                ORDER BY token_expiry
+                LIMIT ?;
+                """,
+                (before, active_since, failed_before, failed_before, limit),
+            ).fetchall()
+
+        return [
+            (user_id, json.loads(self.cipher.decrypt(encrypted_credentials).decode()))
+            for user_id, encrypted_credentials in rows
+        ]
+
+    def record_refresh_failure(self, user_id: str):
+        """Record that refreshing the token of a user failed, cleared by the next token update."""
+        with self.pool.connection() as conn:
+            conn.execute(
+                "UPDATE user_credentials SET refresh_failed_at = ? WHERE user_id = ?;",
+                (time.time(), user_id),
+            )
+            conn.commit()
+
+    def acquire_refresh_lease(self, user_id: str, owner: str, ttl: float) -> bool:
+        """Try to take the token refresh lease of a user, returns True when acquired."""
+        now = time.time()
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO refresh_leases (user_id, owner, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    owner = excluded.owner,
+                    expires_at = excluded.expires_at
+                WHERE refresh_leases.expires_at < ? OR refresh_leases.owner = excluded.owner;
+                """,
+                (user_id, owner, now + ttl, now),
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def release_refresh_lease(self, user_id: str, owner: str):
+        """Release a token refresh lease held by owner."""
+        with self.pool.connection() as conn:
+            conn.execute(
+                "DELETE FROM refresh_leases WHERE user_id = ? AND owner = ?;",
+                (user_id, owner),
+            )
+            conn.commit()
+
     def delete_credentials(self, access_token: str, user_id: str):
         """Delete credentials from the database based on access token and user ID."""
         logger.info(
             f"GoogleAuthMiddleware attempting to delete credentials for access_token: {access_token} and user_id: {user_id}"
         )  # Log credential deletion attempt
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
 
-        # Delete the credentials using both access_token and user_id
-        cursor.execute(
-            "DELETE FROM user_credentials WHERE access_token = ? AND user_id = ?;",
-            (access_token, user_id),
-        )
+            # Delete the credentials using both access_token and user_id
+            cursor.execute(
+                "DELETE FROM user_credentials WHERE access_token = ? AND user_id = ?;",
+                (access_token, user_id),
+            )
 
-        conn.commit()
+            conn.commit()
+            deleted = cursor.rowcount
+            cursor.close()
+
+        self._notify_invalidation(user_id, access_token)
 
         # Check if any rows were deleted
-        if cursor.rowcount > 0:
+        if deleted > 0:
             logger.info(
                 f"GoogleAuthMiddleware credentials for user_id: {user_id} deleted successfully."
             )  # Log success
@@ -190,59 +582,64 @@ class DatabaseHandler:
                 f"GoogleAuthMiddleware no credentials found for access_token: {access_token} and user_id: {user_id}"
             )  # Log warning for not found
 
-        cursor.close()
-        conn.close()
-
-    def update_access_token(self, user_id: str, new_access_token: str):
-        """Update the access token in the credentials_json for a specific user in the database."""
+    def update_access_token(self, user_id: str, new_access_token: str, expiry=None):
+        """Update the access token and its expiry in the credentials_json for a specific user in the database."""
         logger.info(
             f"GoogleAuthMiddleware updating access token for user_id: {user_id}"
         )  # Log the update attempt
 
-        # Connect to the database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Retrieve existing credentials
-        cursor.execute(
-            "SELECT credentials_json FROM user_credentials WHERE user_id = ?;",
-            (user_id,),
-        )
-        result = cursor.fetchone()
-
-        if result:
-            # Decrypt existing credentials
-            encrypted_credentials = result[0]
-            decrypted_credentials = json.loads(
-                self.cipher.decrypt(encrypted_credentials).decode()
-            )
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
 
-            # Update the access token in the credentials JSON
-            decrypted_credentials["access_token"] = new_access_token
-
-            # Encrypt the updated credentials
-            updated_encrypted_credentials = self.cipher.encrypt(
-                json.dumps(decrypted_credentials).encode()
-            )
-
-            # Update the credentials in the database
+            # Retrieve existing credentials
             cursor.execute(
-                """
-                UPDATE user_credentials
-                SET credentials_json = ?
-                WHERE user_id = ?;
-                """,
-                (updated_encrypted_credentials, user_id),
+                "SELECT credentials_json FROM user_credentials WHERE user_id = ?;",
+                (user_id,),
             )
-
-            conn.commit()
-            logger.info(
-                f"GoogleAuthMiddleware access token updated successfully for user_id: {user_id}."
-            )  # Log success
-        else:
-            logger.warning(
-                f"GoogleAuthMiddleware no credentials found for user_id: {user_id}."
-            )  # Log warning if not found
-
-        cursor.close()
-        conn.close()
+            result = cursor.fetchone()
+
+            if result:
+                # Decrypt existing credentials
+                encrypted_credentials = result[0]
+                decrypted_credentials = json.loads(
+                    self.cipher.decrypt(encrypted_credentials).decode()
+                )
+
+                # Update the access token in the credentials JSON
+                decrypted_credentials["token"] = new_access_token
+                decrypted_credentials.pop("access_token", None)  # Legacy key
+                if expiry:
+                    decrypted_credentials["expiry"] = (
+                        expiry if isinstance(expiry, str) else expiry.isoformat()
+                    )
+
+                # Encrypt the updated credentials
+                updated_encrypted_credentials = self.cipher.encrypt(
+                    json.dumps(decrypted_credentials).encode()
+                )
+
+                # Update the credentials in the database
+                cursor.execute(
+                    """
+                    UPDATE user_credentials
+                    SET credentials_json = ?, token_expiry = ?, refresh_failed_at = NULL
+                    WHERE user_id = ?;
+                    """,
+                    (
+                        updated_encrypted_credentials,
+                        parse_expiry(decrypted_credentials.get("expiry")),
+                        user_id,
+                    ),
+                )
+
+                conn.commit()
+                self._notify_invalidation(user_id)
+                logger.info(
+                    f"GoogleAuthMiddleware access token updated successfully for user_id: {user_id}."
+                )  # Log success
+            else:
+                logger.warning(
+                    f"GoogleAuthMiddleware no credentials found for user_id: {user_id}."
+                )  # Log warning if not found
+
+            cursor.close()
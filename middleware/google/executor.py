@@ -0,0 +1,92 @@
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from core.utils.logger import logger
+
+# Default number of threads running blocking middleware work
+BLOCKING_POOL_SIZE = 8
+
+
+class BlockingExecutor:
+    """Bounded thread pool that runs blocking work (sqlite, crypto, HTTP) off the event loop."""
+
+    def __init__(self, max_workers=BLOCKING_POOL_SIZE, name="google-auth"):
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "active": 0,
+            "queued": 0,
+            "peak_queued": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    def _wrap(self, fn, args, kwargs):
+        """Wrap fn to keep the queue metrics and the caller's context variables."""
+        context = contextvars.copy_context()
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["queued"] += 1
+            self._stats["peak_queued"] = max(
+                self._stats["peak_queued"], self._stats["queued"]
+            )
+
+        def task():
+            waited = time.monotonic() - submitted_at
+            with self._lock:
+                self._stats["queued"] -= 1
+                self._stats["active"] += 1
+                self._stats["total_wait"] += waited
+                self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+            try:
+                result = context.run(fn, *args, **kwargs)
+                with self._lock:
+                    self._stats["completed"] += 1
+                return result
+            except Exception:
+                with self._lock:
+                    self._stats["failed"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._stats["active"] -= 1
+
+        return task
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool and wait for its result without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._wrap(fn, args, kwargs))
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn in the pool without waiting for it, errors are logged."""
+        future = self._executor.submit(self._wrap(fn, args, kwargs))
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"GoogleAuthMiddleware background task failed: {str(error)}")
+
+    def stats(self):
+        """Return a snapshot of the pool and queue depth metrics."""
+        with self._lock:
+            stats = dict(self._stats)
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_wait"] = stats["total_wait"] / finished if finished else 0.0
+        stats["max_workers"] = self.max_workers
+        return stats
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,98 @@
+import re
+import time
+import threading
+import requests
+from google.auth import exceptions, jwt
+from core.utils.logger import logger
+
+GOOGLE_OAUTH2_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+# Used when the certificates response has no Cache-Control max-age
+DEFAULT_CERTS_MAX_AGE = 60 * 60
+CERTS_REQUEST_TIMEOUT = 10
+CERTS_MIN_REFETCH_INTERVAL = 60  # Limits early re-downloads on unknown key ids
+
+
+class CachedIdTokenVerifier:
+    """Verify Google ID tokens locally against cached signing certificates.
+
+    Certificates are downloaded through a pooled HTTP session and kept for
+    the max-age advertised by Google. An unknown key id triggers an early
+    re-download (at most once a minute) to pick up rotated keys.
+    """
+
+    def __init__(
+        self,
+        certs_url=GOOGLE_OAUTH2_CERTS_URL,
+        session=None,
+        clock_skew_in_seconds=0,
+    ):
+        self.certs_url = certs_url
+        self.session = session or requests.Session()
+        self.clock_skew_in_seconds = clock_skew_in_seconds
+        self._certs = None
+        self._expires_at = 0
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+
+    def _fetch_certs(self):
+        response = self.session.get(self.certs_url, timeout=CERTS_REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        max_age = DEFAULT_CERTS_MAX_AGE
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if match:
+            max_age = int(match.group(1))
+
+        self._certs = response.json()
+        self._fetched_at = time.time()
+        self._expires_at = self._fetched_at + max_age
+        logger.info(
+            f"GoogleAuthMiddleware fetched {len(self._certs)} ID token certificate(s), cached for {max_age}s"
+        )
+
+    def get_certs(self, force=False):
+        """Return the signing certificates, downloading them only when stale."""
+        with self._lock:
+            now = time.time()
+            if force and now - self._fetched_at < CERTS_MIN_REFETCH_INTERVAL:
+                force = False  # Fetched moments ago, the key id is simply unknown
+            if force or self._certs is None or now >= self._expires_at:
+                self._fetch_certs()
+            return self._certs
+
+    def verify(self, token, audience=None):
+        """Verify an ID token issued by Google and return its decoded payload."""
+        try:
+            id_info = jwt.decode(
+                token,
+                certs=self.get_certs(),
+                audience=audience,
+                clock_skew_in_seconds=self.clock_skew_in_seconds,
+            )
+        except exceptions.MalformedError as e:
+            if "Certificate for key id" not in str(e):
+                raise
+            # Google rotated its keys before our cached copy expired
+            id_info = jwt.decode(
+                token,
+                certs=self.get_certs(force=True),
+                audience=audience,
+                clock_skew_in_seconds=self.clock_skew_in_seconds,
+            )
+
+        if id_info.get("iss") not in GOOGLE_ISSUERS:
+            raise exceptions.GoogleAuthError(
+                f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}"
+            )
+
+        return id_info
+
+
+id_token_verifier = CachedIdTokenVerifier()
+
+
+def verify_oauth2_token(token, audience=None):
+    """Drop-in for google.oauth2.id_token.verify_oauth2_token using the shared verifier."""
+    return id_token_verifier.verify(token, audience)
@@ -0,0 +1,41 @@
+import contextvars
+from core.utils.state import global_state
+
+_request_state = contextvars.ContextVar("google_auth_request_state", default=None)
+
+
+class RequestState:
+    """Request scoped key/value state with the same interface as global_state.
+
+    The middleware opens a scope for every request, so concurrent requests of
+    different users never see each other's services or authentication status.
+    Outside of a request scope (scripts, tests) reads and writes fall back to
+    global_state.
+    """
+
+    def begin(self):
+        """Open a new empty scope for the current context, returns a reset token."""
+        return _request_state.set({})
+
+    def end(self, token):
+        """Close the scope opened by begin."""
+        _request_state.reset(token)
+
+    def is_active(self):
+        return _request_state.get() is not None
+
+    def get(self, key, default=None):
+        state = _request_state.get()
+        if state is None:
+            return global_state.get(key, default)
+        return state.get(key, default)
+
+    def set(self, key, value, override=True):
+        state = _request_state.get()
+        if state is None:
+            global_state.set(key, value, override)
+        elif override or key not in state:
+            state[key] = value
+
+
+request_state = RequestState()
@@ -0,0 +1,245 @@
+import os
+import time
+import uuid
+import threading
+from google.auth.transport.requests import Request as GoogleRequest
+from google.oauth2.credentials import Credentials
+from core.utils.logger import logger
+
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# Scheduler defaults, can be overridden from app config
+TOKEN_REFRESH_INTERVAL = 60  # Seconds between scheduler runs
+TOKEN_REFRESH_WINDOW = 5 * 60  # Refresh tokens expiring within this many seconds
+TOKEN_REFRESH_ACTIVE_WINDOW = 60 * 60  # Only refresh users active this recently
+TOKEN_REFRESH_BATCH_SIZE = 100  # Maximum number of users refreshed per run
+TOKEN_REFRESH_RETRY_DELAY = 15 * 60  # Seconds before retrying a failed user
+REFRESH_LEASE_TTL = 30  # Seconds a worker holds the cross-process refresh lease
+REFRESH_LEASE_WAIT = 30  # Seconds to wait for another worker's refresh
+REFRESH_LEASE_POLL_INTERVAL = 0.2  # Seconds between checks while waiting
+
+
+def refresh_credentials(creds, token_uri=None, request=None):
+    """Exchange the refresh token of the given credentials for a new access token.
+
+    Returns new Credentials, the passed object is left untouched.
+    """
+    creds = Credentials(
+        None,
+        refresh_token=creds.refresh_token,
+        client_id=creds.client_id,
+        client_secret=creds.client_secret,
+        token_uri=token_uri or GOOGLE_TOKEN_URI,
+    )
+    creds.refresh(request or GoogleRequest())
+    return creds
+
+
+class SingleFlight:
+    """Run at most one call per key at a time, concurrent callers share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> in flight call
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+refresh_flight = SingleFlight()
+
+# Identifies this process in the refresh lease table
+_lease_owner_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _stored_fresh_credentials(db_handler, user_id, min_validity):
+    """Return the stored credentials if their token is valid for at least min_validity seconds."""
+    stored = db_handler.get_credentials(user_id, by_access_token=False)
+    if "error" in stored or not stored.get("token_expiry"):
+        return None
+    if stored["token_expiry"] - time.time() <= max(min_validity, 0):
+        return None
+    creds = Credentials.from_authorized_user_info(stored["credentials"])
+    return creds if creds.valid else None
+
+
+def _refresh_with_lease(db_handler, user_id, refresh, min_validity, lease_ttl, wait):
+    owner = f"{_lease_owner_prefix}-{threading.get_ident()}"
+    deadline = time.time() + wait
+
+    while True:
+        if db_handler.acquire_refresh_lease(user_id, owner, lease_ttl):
+            try:
+                # Another worker may have refreshed while we waited for the lease
+                creds = _stored_fresh_credentials(db_handler, user_id, min_validity)
+                return creds if creds is not None else refresh()
+            finally:
+                db_handler.release_refresh_lease(user_id, owner)
+
+        # Another worker holds the lease, wait for it to store the new token
+        creds = _stored_fresh_credentials(db_handler, user_id, min_validity)
+        if creds is not None:
+            return creds
+        if time.time() >= deadline:
+            raise TimeoutError(
+                f"Timed out waiting for another worker to refresh credentials of user_id: {user_id}"
+            )
+        time.sleep(REFRESH_LEASE_POLL_INTERVAL)
+
+
+def coalesced_refresh(
+    db_handler,
+    user_id,
+    refresh,
+    min_validity=0,
+    lease_ttl=REFRESH_LEASE_TTL,
+    wait=REFRESH_LEASE_WAIT,
+):
+    """Refresh a user's credentials at most once at a time across threads and workers.
+
+    Concurrent callers in this process share one call, other processes are
+    kept out by a lease row in the credentials database. Callers that lose
+    the race receive the credentials stored by the winner. refresh must
+    persist the new token and return the new Credentials.
+    """
+    return refresh_flight.do(
+        user_id,
+        lambda: _refresh_with_lease(
+            db_handler, user_id, refresh, min_validity, lease_ttl, wait
+        ),
+    )
+
+
+class TokenRefreshScheduler:
+    """Background thread refreshing access tokens of active users before they expire."""
+
+    def __init__(
+        self,
+        db_handler,
+        interval=TOKEN_REFRESH_INTERVAL,
+        refresh_window=TOKEN_REFRESH_WINDOW,
+        active_window=TOKEN_REFRESH_ACTIVE_WINDOW,
+        batch_size=TOKEN_REFRESH_BATCH_SIZE,
+        token_uri=None,
+    ):
+        self.db_handler = db_handler
+        self.interval = interval
+        self.refresh_window = refresh_window
+        self.active_window = active_window
+        self.batch_size = batch_size
+        self.token_uri = token_uri  # Override for testing against a local endpoint
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._stats = {"runs": 0, "refreshed": 0, "failed": 0}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="google-token-refresh", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"GoogleAuthMiddleware token refresh scheduler started, interval: {self.interval}s, window: {self.refresh_window}s"
+        )
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return dict(self._stats)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(
+                    f"GoogleAuthMiddleware token refresh run failed: {str(e)}",
+                    exc_info=True,
+                )
+            self._stop_event.wait(self.interval)
+
+    def run_once(self):
+        """Refresh every recently active user whose token expires within the window."""
+        now = time.time()
+        due = self.db_handler.get_credentials_expiring(
+            before=now + self.refresh_window,
+            active_since=now - self.active_window,
+            limit=self.batch_size,
+            # Don't hammer the token endpoint for revoked grants
+            failed_before=now - TOKEN_REFRESH_RETRY_DELAY,
+        )
+        self._stats["runs"] += 1
+
+        refreshed = 0
+        for user_id, credentials in due:
+            if self._stop_event.is_set():
+                break
+            if self.refresh_user(user_id, credentials):
+                refreshed += 1
+
+        if due:
+            logger.info(
+                f"GoogleAuthMiddleware proactively refreshed {refreshed}/{len(due)} access token(s)"
+            )
+        return refreshed
+
+    def refresh_user(self, user_id, credentials):
+        """Refresh and persist the access token of a single user."""
+        try:
+            creds = Credentials.from_authorized_user_info(credentials)
+            if not creds.refresh_token:
+                logger.warning(
+                    f"GoogleAuthMiddleware no refresh token stored for user_id: {user_id}"
+                )
+                self.db_handler.record_refresh_failure(user_id)
+                return False
+
+            def refresh():
+                new_creds = refresh_credentials(
+                    creds, token_uri=self.token_uri or credentials.get("token_uri")
+                )
+                self.db_handler.update_access_token(
+                    user_id, new_creds.token, new_creds.expiry
+                )
+                return new_creds
+
+            coalesced_refresh(
+                self.db_handler, user_id, refresh, min_validity=self.refresh_window
+            )
+            self._stats["refreshed"] += 1
+            return True
+        except Exception as e:
+            self._stats["failed"] += 1
+            self.db_handler.record_refresh_failure(user_id)
+            logger.error(
+                f"GoogleAuthMiddleware error refreshing token for user_id {user_id}: {str(e)}"
+            )
+            return False
@@ -1,16 +1,17 @@
 import os, base64, json
+import threading
+from requests.adapters import HTTPAdapter
 from fastapi.templating import Jinja2Templates
 from fastapi import Cookie
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, JSONResponse
 from google_auth_oauthlib.flow import Flow
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from core.utils.logger import logger
 from core.utils.config import config
 from core.utils.env import EnvConfig
 from core.utils.state import global_state
 from app.utils.credentials import credentials_to_json
+from app.middleware.google.id_token_verifier import verify_oauth2_token
 
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = config.get("OAUTHLIB_INSECURE_TRANSPORT")
 os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = config.get("OAUTHLIB_RELAX_TOKEN_SCOPE")
@@ -25,6 +26,48 @@ login_uri = "/auth/login"
 
 router = APIRouter()
 
+# Connection pool shared by the OAuth sessions of every flow for the token exchange
+token_exchange_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+
+_client_config_cache = {"path": None, "mtime": None, "config": None}
+_client_config_lock = threading.Lock()
+
+
+def get_client_config():
+    """Return the parsed OAuth client secrets, re-reading the file only when it changes."""
+    path = config.get("GOOGLE_OAUTH_CLIENT_SECRETS_FILE")
+    mtime = os.stat(path).st_mtime
+
+    with _client_config_lock:
+        if (
+            _client_config_cache["path"] != path
+            or _client_config_cache["mtime"] != mtime
+        ):
+            with open(path, "r", encoding="utf-8") as f:
+                _client_config_cache["config"] = json.load(f)
+            _client_config_cache["path"] = path
+            _client_config_cache["mtime"] = mtime
+            logger.info(f"Loaded OAuth client configuration from {path}")
+        return _client_config_cache["config"]
+
+
+def create_flow():
+    """Create an OAuth flow from the cached client configuration."""
+    flow = Flow.from_client_config(
+        get_client_config(),
+        scopes=config.get("GOOGLE_OAUTH_SCOPES"),
+        redirect_uri=f"{EnvConfig.get('APP_HOST')}/auth/callback",
+    )
+    flow.oauth2session.mount("https://", token_exchange_adapter)
+    return flow
+
+
+# Load the client configuration at startup
+try:
+    get_client_config()
+except OSError as e:
+    logger.warning(f"OAuth client configuration not loaded at startup: {str(e)}")
+
 
 @router.get("/auth")
 async def login(request: Request):
@@ -42,11 +85,7 @@ async def login(request: Request, current_access_token: str = None):
     state_encoded = base64.urlsafe_b64encode(json.dumps(state_data).encode()).decode()
 
     # Prepare the flow for authorization
-    flow = Flow.from_client_secrets_file(
-        config.get("GOOGLE_OAUTH_CLIENT_SECRETS_FILE"),
-        scopes=config.get("GOOGLE_OAUTH_SCOPES"),
-        redirect_uri=f"{EnvConfig.get('APP_HOST')}/auth/callback",
-    )
+    flow = create_flow()
 
     # Generate the authorization URL with the state parameter
     authorization_url, _ = flow.authorization_url(
@@ -77,11 +116,7 @@ async def auth_callback(request: Request):
             # Decode the state parameter
             state_data = json.loads(base64.urlsafe_b64decode(state_encoded).decode())
             current_access_token = state_data.get("current_access_token")
-        flow = Flow.from_client_secrets_file(
-            config.get("GOOGLE_OAUTH_CLIENT_SECRETS_FILE"),
-            scopes=config.get("GOOGLE_OAUTH_SCOPES"),
-            redirect_uri=f"{EnvConfig.get('APP_HOST')}/auth/callback",
-        )
+        flow = create_flow()
         flow.fetch_token(authorization_response=str(request.url))
         credentials = flow.credentials
         credentials_json = credentials_to_json(credentials)
@@ -95,9 +130,7 @@ async def auth_callback(request: Request):
         #    return RedirectResponse(url="/auth/login")
 
         try:
-            id_info = id_token.verify_oauth2_token(
-                credentials.id_token, google_requests.Request(), credentials.client_id
-            )
+            id_info = verify_oauth2_token(credentials.id_token, credentials.client_id)
             user_id = id_info["sub"]
         except ValueError as e:
             logger.error(f"Invalid ID token: {str(e)}")
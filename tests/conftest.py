@@ -1,5 +1,7 @@
 import os
 import sys
+import json
+import httplib2
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
@@ -17,6 +19,25 @@ from app.tools.create_folder import gdrive_create_folder_tool
 from app.tools.delete_item import gdrive_delete_item_tool
 from app.tools.create_document import gdrive_create_document_tool
 from app.tools.create_sheet import gdrive_create_sheet_tool
+from googleapiclient.errors import HttpError
+
+
+def http_error(status, reason):
+    """Build the HttpError the Google client raises for an API error response."""
+    content = json.dumps(
+        {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}}
+    ).encode()
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+class FakeRequest:
+    """Stand-in for a Google API request, execute() returns the given response."""
+
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
 
 
 @pytest.fixture(scope="module")
@@ -54,7 +75,7 @@ def auth_setup():
                 logger.info(
                     f"GoogleAuthMiddleware new access token for user {user_id}: {creds.token}"
                 )
-                db_handler.update_access_token(user_id, creds.token)
+                db_handler.update_access_token(user_id, creds.token, creds.expiry)
 
             except Exception as e:
                 logger.error(
@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import pytest
+from app.services import google_auth
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeConfig:
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+
+def write_client_config(path, client_id, mtime):
+    path.write_text(json.dumps({"web": {"client_id": client_id}}))
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def secrets_file(tmp_path, monkeypatch):
+    path = tmp_path / "client_secrets.json"
+    monkeypatch.setattr(
+        google_auth,
+        "config",
+        FakeConfig({"GOOGLE_OAUTH_CLIENT_SECRETS_FILE": str(path)}),
+    )
+    monkeypatch.setattr(
+        google_auth,
+        "_client_config_cache",
+        {"path": None, "mtime": None, "config": None},
+    )
+    return path
+
+
+def test_client_config_is_read_once_until_the_file_changes(secrets_file, monkeypatch):
+    write_client_config(secrets_file, "client-1", 1_000_000)
+    reads = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        if args[:1] == ("r",):
+            reads.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", counting_open)
+
+    first = google_auth.get_client_config()
+    assert first["web"]["client_id"] == "client-1"
+    assert google_auth.get_client_config() is first
+    assert len(reads) == 1
+
+    # A rotated secrets file is picked up without a restart
+    write_client_config(secrets_file, "client-2", 1_000_010)
+    assert google_auth.get_client_config()["web"]["client_id"] == "client-2"
+    assert google_auth.get_client_config()["web"]["client_id"] == "client-2"
+    assert len(reads) == 2
+
+
+def test_missing_client_config_raises(secrets_file):
+    with pytest.raises(OSError):
+        google_auth.get_client_config()
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import pytest
+from app.middleware.google.request_state import request_state
+from app.utils.drive_index import DriveIndex
+from app.utils import content_index as content_index_module
+from app.utils.content_index import ContentIndex, schedule_update
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def drive_file(file_id, name, modified="2024-01-01T00:00:00Z", mime_type="text/plain"):
+    return {
+        "id": file_id,
+        "name": name,
+        "mimeType": mime_type,
+        "parents": ["root-id"],
+        "modifiedTime": modified,
+    }
+
+
+class FakeExtractor:
+    """Returns the text of fake files and records which files were downloaded."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.calls = []
+
+    def __call__(self, file_id, mime_type):
+        self.calls.append(file_id)
+        if file_id not in self.texts:
+            raise RuntimeError("File not found.")
+        return self.texts[file_id]
+
+
+@pytest.fixture
+def index(tmp_path):
+    drive_index = DriveIndex(str(tmp_path / "index.db"))
+    with drive_index._lock, drive_index._conn:
+        drive_index._write(
+            drive_index._conn,
+            files=[
+                drive_file("budget", "Budget 2024.txt"),
+                drive_file("minutes", "Meeting minutes.txt"),
+                drive_file("photo", "photo.jpg", mime_type="image/jpeg"),
+            ],
+        )
+        drive_index._set_meta(
+            drive_index._conn, root_id="root-id", page_token="1", synced_at=time.time()
+        )
+    yield ContentIndex(drive_index)
+    drive_index.close()
+
+
+def test_search_returns_ranked_snippets(index):
+    extractor = FakeExtractor(
+        {
+            "budget": "The marketing budget was approved. Budget review in May.",
+            "minutes": "Minutes of the meeting: the budget is still open, café at noon.",
+        }
+    )
+    assert index.update(extractor) == 2
+    assert sorted(extractor.calls) == ["budget", "minutes"]  # Images are skipped
+
+    results = index.search("budget")
+    assert [file["id"] for file in results] == ["budget", "minutes"]
+    assert "[budget]" in results[0]["snippet"].lower()
+    assert [file["id"] for file in index.search("cafe noon")] == ["minutes"]
+    assert index.search("budget* (") == results  # Query syntax is not interpreted
+    assert index.stats() == {"indexed": 2, "pending": 0}
+
+
+def test_only_changed_files_are_extracted_again(index):
+    extractor = FakeExtractor({"budget": "quarterly figures", "minutes": "agenda"})
+    index.update(extractor)
+    extractor.calls.clear()
+
+    with index._lock, index._conn:
+        index.drive_index._write(
+            index._conn,
+            files=[
+                drive_file("minutes", "Meeting minutes.txt", "2024-02-01T00:00:00Z")
+            ],
+            removed=["budget"],
+        )
+    extractor.texts["minutes"] = "new agenda with holidays"
+    assert index.stats()["pending"] == 1
+    assert index.update(extractor) == 1
+
+    assert extractor.calls == ["minutes"]
+    assert index.search("quarterly") == []
+    assert [file["id"] for file in index.search("holidays")] == ["minutes"]
+
+
+def test_failed_files_are_not_retried_until_they_change(index):
+    extractor = FakeExtractor({"budget": "figures"})
+    index.update(extractor)
+    extractor.calls.clear()
+
+    assert index.update(extractor) == 0
+    assert extractor.calls == []
+    assert index.stats() == {"indexed": 1, "pending": 0}
+
+
+def test_background_update_uses_the_request_services(index, monkeypatch):
+    monkeypatch.setattr(content_index_module, "_executor", None)
+    seen = []
+
+    def extract(file_id, mime_type):
+        seen.append(request_state.get("google_drive_service"))
+        return "text"
+
+    scope = request_state.begin()
+    request_state.set("google_drive_service", "user-service")
+    schedule_update(index, extract)
+    request_state.end(scope)
+
+    content_index_module._executor.shutdown(wait=True)
+    assert seen == ["user-service", "user-service"]
+    assert index.stats()["indexed"] == 2
@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from cryptography.fernet import Fernet
+from core.utils.env import EnvConfig
+from app.middleware.google.database import DatabaseHandler
+from app.middleware.google.credentials_cache import CredentialsCache
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def credentials(expires_in=3600):
+    expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+    return SimpleNamespace(token="token", expiry=expiry)
+
+
+@pytest.fixture
+def db_handler(tmp_path):
+    handler = DatabaseHandler(
+        str(tmp_path / "credentials.db"), Fernet(EnvConfig.get("CYPHER"))
+    )
+    yield handler
+    handler.close()
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CredentialsCache(max_size=2)
+    cache.set("token-a", "user-a", credentials())
+    cache.set("token-b", "user-b", credentials())
+    assert cache.get("token-a") is not None  # token-b is now the oldest
+
+    cache.set("token-c", "user-c", credentials())
+
+    assert cache.get("token-b") is None
+    assert cache.get("token-a")["user_id"] == "user-a"
+    assert cache.get("token-c")["user_id"] == "user-c"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_entries_expire_a_minute_before_the_token():
+    cache = CredentialsCache(ttl=300, expiry_margin=60)
+    creds = credentials(expires_in=120)
+
+    before = time.time()
+    cache.set("token-a", "user-a", creds)
+    expires_at = cache._entries["token-a"][0]
+
+    # The TTL would keep it for 300 seconds, the token expiry caps it at 60
+    assert before + 59 <= expires_at <= time.time() + 61
+
+    cache.set("token-b", "user-b", credentials(expires_in=30))
+    assert cache.get("token-b") is None  # Too close to expiry to be cached
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    cache = CredentialsCache(ttl=300)
+    cache.set("token-a", "user-a", credentials())
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 301)
+
+    assert cache.get("token-a") is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidate_by_user_and_by_token():
+    cache = CredentialsCache()
+    cache.set("token-a1", "user-a", credentials())
+    cache.set("token-a2", "user-a", credentials())
+    cache.set("token-b", "user-b", credentials())
+    cache.set("token-c", "user-c", credentials())
+
+    cache.invalidate(user_id="user-a")
+    assert cache.get("token-a1") is None
+    assert cache.get("token-a2") is None
+
+    cache.invalidate(access_token="token-b")
+    assert cache.get("token-b") is None
+
+    cache.invalidate(user_id="user-unknown", access_token="token-unknown")
+    assert cache.get("token-c")["user_id"] == "user-c"
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_updating_the_access_token_invalidates_the_cache(db_handler):
+    cache = CredentialsCache()
+    db_handler.add_invalidation_hook(cache.invalidate)
+    db_handler.insert_credentials(
+        "user-a",
+        {
+            "token": "token-a",
+            "refresh_token": "refresh-a",
+            "scopes": ["openid"],
+        },
+    )
+    cache.set("token-a", "user-a", credentials())
+    cache.set("token-b", "user-b", credentials())
+
+    db_handler.update_access_token(
+        "user-a", "token-a-new", datetime.utcnow() + timedelta(hours=1)
+    )
+
+    assert cache.get("token-a") is None
+    assert cache.get("token-b")["user_id"] == "user-b"
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+import pytest
+from cryptography.fernet import Fernet
+from core.utils.env import EnvConfig
+from app.middleware.google.database import (
+    MIGRATIONS,
+    ConnectionPool,
+    DatabaseHandler,
+)
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), pool_size=2, timeout=0.1)
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused(pool):
+    for _ in range(3):
+        with pool.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["acquired"] == 3
+    assert stats["in_use"] == 0
+    assert stats["open"] == stats["idle"] == 1
+
+
+def test_pool_is_bounded(pool):
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+
+    # A waiting thread gets the connection as soon as it is released
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    pool.timeout = 5
+    waiter.start()
+    pool.release(first)
+    waiter.join()
+
+    assert acquired == [first]
+    stats = pool.stats()
+    assert stats["created"] == 2
+    assert stats["waits"] >= 1
+    assert stats["timeouts"] == 1
+    assert stats["peak_in_use"] == 2
+    assert stats["in_use"] == 2
+    pool.release(second)
+    pool.release(acquired[0])
+
+
+def test_released_connections_have_no_pending_transaction(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+        conn.commit()
+        conn.execute("INSERT INTO items VALUES ('pending')")
+        assert conn.in_transaction
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+def test_handler_queries_share_pooled_connections(tmp_path):
+    handler = DatabaseHandler(
+        str(tmp_path / "credentials.db"),
+        Fernet(EnvConfig.get("CYPHER")),
+        pool_size=4,
+    )
+    handler.insert_credentials("user-1", {"token": "token-1", "scopes": []})
+    for _ in range(10):
+        credentials = handler.get_credentials("user-1", by_access_token=False)
+        assert credentials["credentials"]["token"] == "token-1"
+
+    stats = handler.get_pool_stats()
+    assert stats["created"] == 1
+    assert stats["acquired"] >= 12
+    handler.close()
+    assert handler.get_pool_stats()["open"] == 0
+
+
+def baseline_database(db_path, cipher):
+    """Create a database with the schema from before migrations existed."""
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE user_credentials (
+            user_id TEXT PRIMARY KEY,
+            credentials_json TEXT NOT NULL,
+            access_token TEXT
+        )
+        """
+    )
+    credentials = cipher.encrypt(json.dumps({"token": "google-token"}).encode())
+    conn.execute(
+        "INSERT INTO user_credentials VALUES (?, ?, ?)",
+        ("user-1", credentials, "access-token-1"),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_migrations_upgrade_a_baseline_database(tmp_path):
+    db_path = str(tmp_path / "credentials.db")
+    cipher = Fernet(EnvConfig.get("CYPHER"))
+    baseline_database(db_path, cipher)
+
+    handler = DatabaseHandler(db_path, cipher)
+    assert handler.get_schema_version() == MIGRATIONS[-1][0]
+
+    with handler.pool.connection() as conn:
+        columns = {
+            row[1] for row in conn.execute("PRAGMA table_info(user_credentials)")
+        }
+        indexes = {
+            row[1] for row in conn.execute("PRAGMA index_list(user_credentials)")
+        }
+        tables = {
+            row[0]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        }
+    assert {"token_expiry", "last_used_at", "refresh_failed_at"} <= columns
+    assert "idx_user_credentials_access_token" in indexes
+    assert "refresh_leases" in tables
+
+    # Existing credentials are still found by their access token
+    credentials = handler.get_credentials("access-token-1")
+    assert credentials["user_id"] == "user-1"
+    assert credentials["credentials"]["token"] == "google-token"
+    handler.close()
+
+
+def test_reopening_a_migrated_database_is_a_no_op(tmp_path):
+    db_path = str(tmp_path / "credentials.db")
+    cipher = Fernet(EnvConfig.get("CYPHER"))
+    DatabaseHandler(db_path, cipher).close()
+
+    handler = DatabaseHandler(db_path, cipher)
+    with handler.pool.connection() as conn:
+        applied = conn.execute(
+            "SELECT version FROM schema_version ORDER BY version"
+        ).fetchall()
+    assert [row[0] for row in applied] == [version for version, _, _ in MIGRATIONS]
+    handler.close()
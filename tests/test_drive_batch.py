@@ -0,0 +1,146 @@
+import os
+import sys
+import pytest
+from googleapiclient.errors import HttpError
+from app.middleware.google.request_state import request_state
+from app.utils.drive_batch import execute_batch, DRIVE_BATCH_SIZE
+from app.tools.bulk_move_items import gdrive_bulk_move_items_tool
+from app.tools.bulk_delete_items import gdrive_bulk_delete_items_tool
+from conftest import http_error
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeCall:
+    def __init__(self, method, **params):
+        self.method = method
+        self.params = params
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.calls = []
+
+    def add(self, request, request_id):
+        self.calls.append((request_id, request))
+
+    def execute(self):
+        assert len(self.calls) <= DRIVE_BATCH_SIZE
+        self.service.batches.append(len(self.calls))
+        for request_id, call in self.calls:
+            try:
+                response, error = self.service.handle(call), None
+            except HttpError as e:
+                response, error = None, e
+            self.callback(request_id, response, error)
+
+
+class FakeDriveService:
+    """Stand-in for the Drive v3 service supporting batch requests."""
+
+    def __init__(self, parents, rate_limited=()):
+        self.parents = parents  # file id -> list of parent ids
+        self.rate_limited = set(rate_limited)  # ids failing once with a 403
+        self.batches = []
+
+    def files(self):
+        return self
+
+    def get(self, **params):
+        return FakeCall("get", **params)
+
+    def update(self, **params):
+        return FakeCall("update", **params)
+
+    def delete(self, **params):
+        return FakeCall("delete", **params)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def handle(self, call):
+        file_id = call.params["fileId"]
+        if file_id in self.rate_limited:
+            self.rate_limited.discard(file_id)
+            raise http_error(403, "userRateLimitExceeded")
+        if file_id not in self.parents:
+            raise http_error(404, "notFound")
+        if call.method == "get":
+            return {"id": file_id, "parents": list(self.parents[file_id])}
+        if call.method == "update":
+            assert call.params["removeParents"] == ",".join(self.parents[file_id])
+            self.parents[file_id] = [call.params["addParents"]]
+            return {"id": file_id, "parents": self.parents[file_id]}
+        del self.parents[file_id]
+        return ""
+
+
+@pytest.fixture
+def drive_service():
+    service = FakeDriveService(
+        {f"file-{i}": ["old-folder"] for i in range(250)},
+        rate_limited=["file-3", "file-120"],
+    )
+    scope = request_state.begin()
+    request_state.set("middleware.GoogleAuthMiddleware.is_authenticated", True)
+    request_state.set("google_drive_service", service)
+    yield service
+    request_state.end(scope)
+
+
+def test_execute_batch_retries_rate_limited_calls(drive_service):
+    delays = []
+    results = execute_batch(
+        drive_service,
+        {
+            file_id: lambda file_id=file_id: drive_service.files().get(fileId=file_id)
+            for file_id in ["file-1", "file-3", "missing"]
+        },
+        sleep=delays.append,
+    )
+
+    assert results["file-1"][0]["id"] == "file-1"
+    assert results["file-3"][0]["id"] == "file-3"
+    assert results["missing"][1].resp.status == 404
+    assert len(delays) == 1
+
+
+def test_bulk_move_batches_lookups_and_updates(drive_service, monkeypatch):
+    monkeypatch.setattr("app.utils.drive_batch.time.sleep", lambda delay: None)
+    item_ids = [f"file-{i}" for i in range(250)] + ["missing"]
+
+    response = gdrive_bulk_move_items_tool(item_ids=item_ids, new_parent_id="new")
+
+    assert response["status"] == "partial"
+    assert response["succeeded"] == 250
+    assert response["results"][-1]["status"] == "error"
+    assert all(parents == ["new"] for parents in drive_service.parents.values())
+    # 251 lookups and 250 updates in batches of 100, plus a retry of the rate limited lookups
+    assert sorted(drive_service.batches) == [2, 50, 51, 100, 100, 100, 100]
+
+
+def test_bulk_delete_with_one_confirmation_token(drive_service, monkeypatch):
+    monkeypatch.setattr("app.utils.drive_batch.time.sleep", lambda delay: None)
+    item_ids = [f"file-{i}" for i in range(200)]
+
+    response = gdrive_bulk_delete_items_tool(item_ids=item_ids)
+    assert response["action"] == "confirm_deletion"
+    assert response["item_count"] == 200
+    assert drive_service.batches == []
+    confirmation_token = response["confirmation_token"]
+
+    # The token only covers the exact list it was issued for
+    response = gdrive_bulk_delete_items_tool(
+        item_ids=item_ids + ["file-200"], confirmation_token=confirmation_token
+    )
+    assert "error" in response
+    assert drive_service.batches == []
+
+    response = gdrive_bulk_delete_items_tool(
+        item_ids=list(reversed(item_ids)), confirmation_token=confirmation_token
+    )
+    assert response["status"] == "success"
+    assert response["succeeded"] == 200
+    assert not any(file_id in drive_service.parents for file_id in item_ids)
@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+import pytest
+from app.utils.drive import FOLDER_MIME_TYPE
+from app.utils.drive_index import DriveIndex, DriveIndexManager
+from conftest import FakeRequest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeDriveChanges:
+    """Stand-in for the Drive v3 files and changes endpoints."""
+
+    def __init__(self):
+        self.files_by_id = {}
+        self.log = []  # Ids of changed files, in the order they changed
+        self.calls = []
+
+    def add(self, file_id, name, parent="root-id", folder=False):
+        self.update(
+            {
+                "id": file_id,
+                "name": name,
+                "mimeType": FOLDER_MIME_TYPE if folder else "text/plain",
+                "parents": [parent],
+            }
+        )
+
+    def update(self, file):
+        self.files_by_id[file["id"]] = {**self.files_by_id.get(file["id"], {}), **file}
+        self.log.append(file["id"])
+
+    def remove(self, file_id):
+        del self.files_by_id[file_id]
+        self.log.append(file_id)
+
+    def files(self):
+        return FakeFiles(self)
+
+    def changes(self):
+        return self
+
+    def getStartPageToken(self):
+        self.calls.append("getStartPageToken")
+        return FakeRequest({"startPageToken": str(len(self.log))})
+
+    def list(self, pageToken, pageSize, includeRemoved, spaces, fields):
+        self.calls.append("changes.list")
+        start = int(pageToken)
+        end = min(start + pageSize, len(self.log))
+        changes = []
+        for file_id in self.log[start:end]:
+            file = self.files_by_id.get(file_id)
+            changes.append(
+                {"fileId": file_id, "removed": False, "file": file}
+                if file
+                else {"fileId": file_id, "removed": True}
+            )
+        if end < len(self.log):
+            return FakeRequest({"changes": changes, "nextPageToken": str(end)})
+        return FakeRequest({"changes": changes, "newStartPageToken": str(end)})
+
+
+class FakeFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def get(self, fileId, fields):
+        return FakeRequest({"id": "root-id"})
+
+    def list(self, q, pageSize, fields, pageToken=None, orderBy=None):
+        self.drive.calls.append("files.list")
+        files = [
+            file for file in self.drive.files_by_id.values() if not file.get("trashed")
+        ]
+        return FakeRequest({"files": files})
+
+
+@pytest.fixture
+def drive():
+    drive = FakeDriveChanges()
+    drive.add("reports", "Reports", folder=True)
+    drive.add("q1", "Q1 Report.txt", parent="reports")
+    drive.add("notes", "notes.txt")
+    return drive
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DriveIndex(str(tmp_path / "index.db"))
+    yield index
+    index.close()
+
+
+def test_seed_answers_queries_locally(drive, index):
+    index.refresh(drive)
+
+    assert [f["id"] for f in index.search_by_name("report")] == ["q1", "reports"]
+    assert [f["id"] for f in index.list_children()] == ["reports", "notes"]
+    assert [f["name"] for f in index.get_path("q1")] == ["Reports", "Q1 Report.txt"]
+    assert drive.calls == ["getStartPageToken", "files.list"]
+
+
+def test_search_limit_and_partial_paths(drive, index):
+    drive.add("orphan", "Report draft.txt", parent="unindexed")
+    index.refresh(drive)
+
+    assert [f["id"] for f in index.search_by_name("report", 2)] == ["q1", "orphan"]
+    assert index.get_path("orphan") is None
+
+
+def test_sync_applies_changes_feed(drive, index):
+    index.refresh(drive)
+
+    drive.add("q2", "Q2 Report.txt", parent="reports")
+    drive.update({"id": "notes", "name": "Meeting notes.txt", "parents": ["reports"]})
+    drive.update({"id": "q1", "trashed": True})
+    assert index.refresh(drive) == 3
+
+    assert [f["id"] for f in index.list_children("reports")] == ["notes", "q2"]
+    assert index.get("q1") is None
+    assert drive.calls[-1] == "changes.list"
+
+
+def test_removed_folder_drops_its_descendants(drive, index):
+    index.refresh(drive)
+    drive.remove("reports")
+    drive.files_by_id.pop("q1")
+    index.refresh(drive)
+
+    assert index.get("reports") is None
+    assert index.get("q1") is None
+    assert index.get("notes") is not None
+
+
+def test_count_children_of_folder(drive, index):
+    drive.add("archive", "Archive", parent="reports", folder=True)
+    drive.update({"id": "q1", "size": "100"})
+    drive.update(
+        {
+            **drive.files_by_id["notes"],
+            "id": "old",
+            "parents": ["archive"],
+            "size": "50",
+        }
+    )
+    index.refresh(drive)
+
+    assert index.count_children("reports") == (1, 1, 100)
+    assert index.count_children("reports", recursive=True) == (2, 1, 150)
+
+    # Counts follow the changes feed
+    drive.remove("old")
+    index.refresh(drive)
+    assert index.count_children("reports", recursive=True) == (1, 1, 100)
+
+
+def test_manager_seeds_in_background_and_bounds_staleness(drive, tmp_path):
+    manager = DriveIndexManager(str(tmp_path), refresh_interval=60, max_staleness=120)
+
+    with manager.lease("user-1", drive) as index:
+        assert index is None  # Seeding in the background
+    for _ in range(100):
+        if "user-1" not in manager._syncing:
+            break
+        time.sleep(0.01)
+    with manager.lease("user-1", drive) as index:
+        assert index is not None
+
+        # Past the staleness bound the change is applied before answering
+        drive.add("new", "new.txt")
+        with index._lock, index._conn:
+            index._set_meta(index._conn, synced_at=time.time() - 300)
+    with manager.lease("user-1", drive) as index:
+        assert index.get("new") is not None
+    assert index.leases == 0
+
+
+def test_manager_only_closes_indexes_without_leases(drive, tmp_path):
+    manager = DriveIndexManager(str(tmp_path), max_open=1)
+    first = manager.acquire("user-1")
+
+    second = manager.acquire("user-2")
+    assert manager.stats()["open"] == 2  # user-1 is still held
+    assert first.count_children("root") == (0, 0, 0)
+
+    manager.release(first)
+    assert manager.stats()["open"] == 1
+    manager.release(second)
+    assert manager.acquire("user-2") is second
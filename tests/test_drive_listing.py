@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import pytest
+from app.utils.drive import (
+    list_files,
+    iter_files,
+    count_files,
+    encode_cursor,
+    walk_folder_tree,
+    DRIVE_MAX_PAGE_SIZE,
+    FOLDER_MIME_TYPE,
+)
+from conftest import FakeRequest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeDriveService:
+    """Stand-in for the Drive v3 files().list endpoint with page tokens."""
+
+    def __init__(self, count):
+        self.items = [
+            {"id": f"id-{i}", "name": f"file-{i}", "mimeType": "text/plain"}
+            for i in range(count)
+        ]
+        self.calls = []
+
+    def files(self):
+        return self
+
+    def list(self, q, pageSize, fields, pageToken=None, orderBy=None):
+        assert pageSize <= DRIVE_MAX_PAGE_SIZE
+        assert fields.startswith("nextPageToken, files(")
+        self.calls.append(
+            {"pageSize": pageSize, "pageToken": pageToken, "fields": fields}
+        )
+        start = int(pageToken or 0)
+        end = start + pageSize
+        response = {"files": self.items[start:end]}
+        if end < len(self.items):
+            response["nextPageToken"] = str(end)
+        return FakeRequest(response)
+
+
+def test_iter_files_follows_every_page():
+    service = FakeDriveService(2500)
+    files = list(iter_files(service, "'root' in parents"))
+
+    assert len(files) == 2500
+    assert [call["pageSize"] for call in service.calls] == [1000, 1000, 1000]
+
+
+def test_count_files_transfers_only_ids():
+    service = FakeDriveService(2500)
+
+    assert count_files(service, "'root' in parents") == 2500
+    assert [call["fields"] for call in service.calls] == [
+        "nextPageToken, files(id)"
+    ] * 3
+
+
+def test_list_files_pages_with_cursor():
+    service = FakeDriveService(2500)
+    query = "'root' in parents"
+
+    seen = []
+    files, cursor = list_files(service, query, limit=700)
+    seen.extend(files)
+    while cursor:
+        files, cursor = list_files(service, query, limit=700, cursor=cursor)
+        seen.extend(files)
+
+    assert [file["id"] for file in seen] == [f"id-{i}" for i in range(2500)]
+
+
+def test_list_files_without_limit_returns_everything():
+    service = FakeDriveService(1500)
+    files, cursor = list_files(service, "'root' in parents")
+
+    assert len(files) == 1500
+    assert cursor is None
+
+
+def test_cursor_must_match_listing():
+    service = FakeDriveService(10)
+    cursor = encode_cursor("'a' in parents", None, None, 5)
+
+    with pytest.raises(ValueError):
+        list_files(service, "'b' in parents", cursor=cursor)
+    with pytest.raises(ValueError):
+        list_files(service, "'a' in parents", cursor="not a cursor")
+
+
+class FakeDriveTree:
+    """Stand-in for files().list over a folder hierarchy, answering 'x' in parents queries."""
+
+    def __init__(self, fanout, depth):
+        self.children = {}
+        self.queries = []
+        self._add_level("root", fanout, depth)
+
+    def _add_level(self, parent_id, fanout, depth):
+        self.children[parent_id] = []
+        for i in range(fanout):
+            folder_id = f"{parent_id}/{i}"
+            self.children[parent_id].append(
+                {"id": folder_id, "name": folder_id, "mimeType": FOLDER_MIME_TYPE}
+            )
+            if depth > 1:
+                self._add_level(folder_id, fanout, depth - 1)
+            else:
+                self.children[folder_id] = []
+        self.children[parent_id].append(
+            {"id": f"{parent_id}/file", "name": "file", "mimeType": "text/plain"}
+        )
+
+    def files(self):
+        return self
+
+    def list(self, q, pageSize, fields, pageToken=None, orderBy=None):
+        self.queries.append(q)
+        files = [
+            {**child, "parents": [parent_id]}
+            for parent_id in re.findall(r"'([^']+)' in parents", q)
+            for child in self.children.get(parent_id, [])
+            if FOLDER_MIME_TYPE in child["mimeType"] or "mimeType =" not in q
+        ]
+        start = int(pageToken or 0)
+        response = {"files": files[start : start + pageSize]}
+        if start + pageSize < len(files):
+            response["nextPageToken"] = str(start + pageSize)
+        return FakeRequest(response)
+
+
+def test_walk_folder_tree_queries_grow_with_depth():
+    service = FakeDriveTree(fanout=6, depth=4)  # 1554 folders
+    items, truncated = walk_folder_tree(service, "root")
+
+    folders = [item for item in items if item["mimeType"] == FOLDER_MIME_TYPE]
+    assert len(folders) == 6 + 36 + 216 + 1296
+    assert not truncated
+    assert all(item["parent_id"] == item["id"].rsplit("/", 1)[0] for item in items)
+    # One query per 40 parents and level instead of one per folder
+    assert len(service.queries) < 60
+
+
+def test_walk_folder_tree_limits():
+    service = FakeDriveTree(fanout=5, depth=3)
+
+    items, truncated = walk_folder_tree(service, "root", max_depth=2)
+    assert max(item["depth"] for item in items) == 2
+    assert not truncated
+
+    items, truncated = walk_folder_tree(service, "root", max_nodes=20)
+    assert len(items) == 20
+    assert truncated
+
+    items, _ = walk_folder_tree(service, "root", folders_only=True)
+    assert all(item["mimeType"] == FOLDER_MIME_TYPE for item in items)
@@ -0,0 +1,64 @@
+import os
+import sys
+import asyncio
+import threading
+import contextvars
+from app.middleware.google.executor import BlockingExecutor
+from app.middleware.google.request_state import request_state
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+current_user = contextvars.ContextVar("current_user", default=None)
+
+
+def read_context():
+    return (
+        current_user.get(),
+        request_state.get("google_user_id"),
+        threading.current_thread().name,
+    )
+
+
+def test_run_keeps_the_callers_context_in_worker_threads():
+    executor = BlockingExecutor(max_workers=2)
+
+    async def handle(user_id):
+        token = request_state.begin()
+        try:
+            current_user.set(user_id)
+            request_state.set("google_user_id", user_id, True)
+            await asyncio.sleep(0)  # Let the other requests interleave
+            return await executor.run(read_context)
+        finally:
+            request_state.end(token)
+
+    async def main():
+        return await asyncio.gather(*(handle(f"user-{i}") for i in range(20)))
+
+    results = asyncio.run(main())
+    executor.shutdown()
+
+    for i, (user, state_user, thread_name) in enumerate(results):
+        assert user == state_user == f"user-{i}"
+        assert thread_name.startswith("google-auth")
+    assert executor.stats()["completed"] == 20
+
+
+def test_submit_keeps_the_context_and_counts_failures():
+    executor = BlockingExecutor(max_workers=1)
+    token = current_user.set("user-1")
+    try:
+        assert executor.submit(read_context).result()[0] == "user-1"
+    finally:
+        current_user.reset(token)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    assert isinstance(executor.submit(fail).exception(), RuntimeError)
+    executor.shutdown()
+
+    stats = executor.stats()
+    assert stats["completed"] == 1
+    assert stats["failed"] == 1
+    assert stats["active"] == stats["queued"] == 0
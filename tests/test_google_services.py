@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from app.utils import credentials as credentials_module
+from app.utils.credentials import (
+    LazyGoogleService,
+    ServiceCache,
+    build_google_service,
+)
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def credentials(token, refresh_token="refresh-1"):
+    return Credentials(
+        token=token,
+        refresh_token=refresh_token,
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="client-id",
+        client_secret="client-secret",
+    )
+
+
+def test_services_are_reused_until_the_token_rotates():
+    cache = ServiceCache()
+    drive = cache.get("google_drive_service", credentials("token-1"))
+
+    assert cache.get("google_drive_service", credentials("token-1")) is drive
+    assert cache.stats() == {
+        "hits": 1,
+        "builds": 1,
+        "rotations": 0,
+        "evictions": 0,
+        "users": 1,
+    }
+
+    # Same user, new access token, services are rebuilt with the new credentials
+    rotated = cache.get("google_drive_service", credentials("token-2"))
+    assert rotated is not drive
+    request = rotated.files().list()
+    assert request.http.credentials.token == "token-2"
+    assert cache.stats()["rotations"] == 1
+    assert cache.stats()["users"] == 1
+
+    # Another refresh token is another user
+    other = cache.get("google_drive_service", credentials("token-2", "refresh-2"))
+    assert other is not rotated
+    assert cache.stats()["users"] == 2
+
+
+def test_invalidate_drops_the_user_services():
+    cache = ServiceCache()
+    sheets = cache.get("google_sheets_service", credentials("token-1"))
+
+    cache.invalidate(credentials("token-1"))
+
+    assert cache.get("google_sheets_service", credentials("token-1")) is not sheets
+    assert cache.stats()["builds"] == 2
+
+
+def test_least_recently_used_user_is_evicted():
+    cache = ServiceCache(max_users=1)
+    drive = cache.get("google_drive_service", credentials("token-1"))
+    cache.get("google_drive_service", credentials("token-2", "refresh-2"))
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("google_drive_service", credentials("token-1")) is not drive
+
+
+def test_each_thread_gets_its_own_transport():
+    service = build_google_service("drive", "v3", credentials("token-1"))
+    transports = {}
+
+    def request(name):
+        first = service.files().list().http
+        second = service.files().get(fileId="file-1").http
+        assert first is second  # Reused for keep-alive within a thread
+        transports[name] = first
+
+    threads = [threading.Thread(target=request, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    request("main")
+
+    assert all(isinstance(http, AuthorizedHttp) for http in transports.values())
+    assert len({id(http) for http in transports.values()}) == 3
+    assert transports["a"].credentials.token == "token-1"
+
+
+def test_lazy_service_refreshes_only_on_first_use(monkeypatch):
+    monkeypatch.setattr(credentials_module, "service_cache", ServiceCache())
+    refreshes = []
+
+    def refresh():
+        refreshes.append(True)
+        return credentials("token-1")
+
+    services = {
+        name: LazyGoogleService(name, refresh)
+        for name in ("google_drive_service", "google_docs_service")
+    }
+    assert refreshes == []  # Nothing is built or refreshed up front
+
+    drive = services["google_drive_service"]
+    drive.files().list()
+    drive.files().get(fileId="file-1")
+    assert refreshes == [True]
+    assert credentials_module.service_cache.stats()["builds"] == 1
+
+    # The unused Docs service never triggered the refresh
+    assert services["google_docs_service"]._service is None
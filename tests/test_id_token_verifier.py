@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, exceptions, jwt
+from app.middleware.google import id_token_verifier as verifier_module
+from app.middleware.google.id_token_verifier import CachedIdTokenVerifier
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+AUDIENCE = "client-id.apps.googleusercontent.com"
+
+
+def signing_key():
+    """Return a PEM private key and its self-signed certificate."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+KEYS = {key_id: signing_key() for key_id in ("key-1", "key-2", "key-3")}
+
+
+def id_token(key_id, issuer="https://accounts.google.com"):
+    signer = crypt.RSASigner.from_string(KEYS[key_id][0], key_id=key_id)
+    now = int(time.time())
+    payload = {
+        "iss": issuer,
+        "aud": AUDIENCE,
+        "sub": "user-1",
+        "email": "user@example.com",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return jwt.encode(signer, payload).decode()
+
+
+class FakeResponse:
+    def __init__(self, certs, cache_control):
+        self.certs = certs
+        self.headers = {"Cache-Control": cache_control} if cache_control else {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return dict(self.certs)
+
+
+class FakeSession:
+    """Serves the certificates for the configured key ids and counts downloads."""
+
+    def __init__(self, key_ids, cache_control="public, max-age=120, must-revalidate"):
+        self.key_ids = key_ids
+        self.cache_control = cache_control
+        self.requests = 0
+
+    def get(self, url, timeout=None):
+        self.requests += 1
+        certs = {key_id: KEYS[key_id][1] for key_id in self.key_ids}
+        return FakeResponse(certs, self.cache_control)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    # Only the verifier sees the fake clock, token validation uses the real one
+    monkeypatch.setattr(verifier_module, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_certificates_are_cached_for_the_advertised_max_age(clock):
+    session = FakeSession(["key-1"])
+    verifier = CachedIdTokenVerifier(session=session)
+
+    assert verifier.verify(id_token("key-1"), AUDIENCE)["sub"] == "user-1"
+    clock[0] += 119
+    verifier.verify(id_token("key-1"), AUDIENCE)
+    assert session.requests == 1
+
+    clock[0] += 2
+    verifier.verify(id_token("key-1"), AUDIENCE)
+    assert session.requests == 2
+
+
+def test_missing_max_age_uses_the_default(clock):
+    session = FakeSession(["key-1"], cache_control=None)
+    verifier = CachedIdTokenVerifier(session=session)
+
+    verifier.get_certs()
+    clock[0] += verifier_module.DEFAULT_CERTS_MAX_AGE - 1
+    verifier.get_certs()
+    assert session.requests == 1
+
+    clock[0] += 2
+    verifier.get_certs()
+    assert session.requests == 2
+
+
+def test_unknown_key_id_refetches_at_most_once_a_minute(clock):
+    session = FakeSession(["key-1"])
+    verifier = CachedIdTokenVerifier(session=session)
+    verifier.get_certs()
+
+    # Fetched moments ago, the unknown key id does not trigger a download
+    with pytest.raises(exceptions.MalformedError):
+        verifier.verify(id_token("key-2"), AUDIENCE)
+    assert session.requests == 1
+
+    # Google rotated its keys, the next attempt a minute later picks them up
+    session.key_ids = ["key-1", "key-2"]
+    clock[0] += verifier_module.CERTS_MIN_REFETCH_INTERVAL
+    assert verifier.verify(id_token("key-2"), AUDIENCE)["sub"] == "user-1"
+    assert session.requests == 2
+
+    # Another unknown key id right after the forced download, no new request
+    clock[0] += 30
+    with pytest.raises(exceptions.MalformedError):
+        verifier.verify(id_token("key-3"), AUDIENCE)
+    assert session.requests == 2
+
+
+def test_wrong_issuer_is_rejected(clock):
+    verifier = CachedIdTokenVerifier(session=FakeSession(["key-1"]))
+
+    with pytest.raises(exceptions.GoogleAuthError, match="Wrong issuer"):
+        verifier.verify(id_token("key-1", issuer="https://evil.example.com"), AUDIENCE)
+
+    assert verifier.verify(id_token("key-1", issuer="accounts.google.com"), AUDIENCE)
@@ -0,0 +1,128 @@
+import time
+import random
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from cryptography.fernet import Fernet
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from core.utils.env import EnvConfig
+from core.utils.state import global_state
+from app.middleware.google.database import DatabaseHandler
+from app.middleware.google.request_state import request_state
+from app.middleware.google.GoogleAuthMiddleware import GoogleAuthMiddleware
+from app.tools.get_items import gdrive_get_items_tool
+
+USERS = 200
+REQUESTS = 600
+
+
+class FakeDriveService:
+    """Stand-in for the Drive v3 service, every user only sees a file of its own."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    def files(self):
+        return self
+
+    def list(self, **kwargs):
+        return self
+
+    def execute(self):
+        time.sleep(random.uniform(0, 0.002))  # Let other requests interleave
+        return {
+            "files": [
+                {
+                    "id": f"file-{self.user_id}",
+                    "name": f"{self.user_id}.txt",
+                    "mimeType": "text/plain",
+                }
+            ]
+        }
+
+
+def attach_fake_services(credentials):
+    user_id = credentials.token.removeprefix("google-token-")
+    request_state.set("google_drive_service", FakeDriveService(user_id), True)
+
+
+async def list_items(request):
+    await asyncio.sleep(random.uniform(0, 0.005))
+    result = await asyncio.to_thread(gdrive_get_items_tool)
+    return JSONResponse(
+        {"user_id": request_state.get("google_user_id"), "result": result}
+    )
+
+
+@pytest.fixture
+def client(tmp_path):
+    db_handler = DatabaseHandler(
+        str(tmp_path / "credentials.db"), Fernet(EnvConfig.get("CYPHER"))
+    )
+    global_state.set("db_handler", db_handler, True)
+    expiry = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+    tokens = {
+        f"user-{i}": db_handler.insert_credentials(
+            f"user-{i}",
+            {
+                "token": f"google-token-user-{i}",
+                "refresh_token": f"refresh-user-{i}",
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "client_id": "client-id",
+                "client_secret": "client-secret",
+                "scopes": ["https://www.googleapis.com/auth/drive"],
+                "expiry": expiry,
+            },
+        )
+        for i in range(USERS)
+    }
+
+    app = Starlette(routes=[Route("/items", list_items)])
+    app.add_middleware(GoogleAuthMiddleware, auth_callback=lambda: attach_fake_services)
+    yield httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ), tokens
+    db_handler.close()
+
+
+def test_concurrent_users_are_isolated(client):
+    http, tokens = client
+    users = [random.choice(list(tokens) + [None]) for _ in range(REQUESTS)]
+
+    async def request(user_id):
+        headers = {"x-access-token": tokens[user_id]} if user_id else {}
+        response = await http.get("/items", headers=headers)
+        return user_id, response.json()
+
+    async def run():
+        async with http:
+            return await asyncio.gather(*(request(user_id) for user_id in users))
+
+    for user_id, body in asyncio.run(run()):
+        if user_id is None:
+            # Anonymous requests never see another user's services
+            assert body["user_id"] is None
+            assert body["result"]["status"] == "error"
+        else:
+            assert body["user_id"] == user_id
+            assert body["result"]["status"] == "success"
+            assert body["result"]["data"][0]["id"] == f"file-{user_id}"
+
+
+def test_state_falls_back_to_global_state_outside_requests():
+    request_state.set("test_request_state_key", "global", True)
+    assert global_state.get("test_request_state_key") == "global"
+
+    async def scoped():
+        scope = request_state.begin()
+        try:
+            request_state.set("test_request_state_key", "request", True)
+            return request_state.get("test_request_state_key")
+        finally:
+            request_state.end(scope)
+
+    assert asyncio.run(scoped()) == "request"
+    assert request_state.get("test_request_state_key") == "global"
@@ -0,0 +1,674 @@
+import os
+import re
+import sys
+import pytest
+from app.middleware.google.request_state import request_state
+from app.utils.sheets import (
+    column_index,
+    column_letter,
+    plan_row_windows,
+    coalesce_rows,
+    merge_value_ranges,
+)
+from app.tools.get_sheet_values import gdrive_get_sheet_values_tool
+from app.tools.get_sheet_ranges import gdrive_get_sheet_ranges_tool
+from app.tools.delete_rows_from_sheet import gdrive_delete_rows_from_sheet_tool
+from app.tools.batch_edit_sheet import gdrive_batch_edit_sheet_tool
+from app.tools.add_rows_to_sheet import gdrive_add_rows_to_sheet_tool
+from app.tools.sync_sheet import gdrive_sync_sheet_tool
+from app.tools.upsert_sheet_rows import gdrive_upsert_sheet_rows_tool
+from app.tools.get_file_contents import get_google_sheet_contents
+from conftest import FakeRequest, http_error
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeSheetsService:
+    """Stand-in for the Sheets v4 API over in memory tabs."""
+
+    def __init__(self, tabs):
+        # title -> {"sheetId": int, "rows": list of rows, "rowCount": int}
+        self.tabs = tabs
+        self.calls = []
+        self.failing_appends = set()  # Append calls failing, counted from 1
+        self.append_error = http_error(429, "rateLimitExceeded")
+        self.failing_batches = set()  # Row deletion batches failing, counted from 1
+        self.failing_writes = set()  # Value writes failing, counted from 1
+        self.version = 1  # Drive file version, increased by every write
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(
+        self,
+        spreadsheetId,
+        fields=None,
+        range=None,
+        majorDimension=None,
+        valueRenderOption=None,
+    ):
+        if range is None:
+            self.calls.append(("metadata", fields))
+            assert fields and fields.startswith("sheets.properties")
+            return FakeRequest(
+                {
+                    "sheets": [
+                        {
+                            "properties": {
+                                "sheetId": tab["sheetId"],
+                                "title": title,
+                                "index": i,
+                                "gridProperties": {
+                                    "rowCount": tab["rowCount"],
+                                    "columnCount": 26,
+                                },
+                            }
+                        }
+                        for i, (title, tab) in enumerate(self.tabs.items())
+                    ]
+                }
+            )
+        self.calls.append(("get", range))
+        return FakeRequest(self.read(range))
+
+    def batchUpdate(self, spreadsheetId, body, fields=None):
+        if "data" in body:
+            return self.write(body)
+        self.calls.append(("batchUpdate", body["requests"]))
+        if (
+            len([call for call in self.calls if call[0] == "batchUpdate"])
+            in self.failing_batches
+        ):
+            raise TimeoutError("The read operation timed out")
+        for request in body["requests"]:
+            row_range = request["deleteDimension"]["range"]
+            tab = next(
+                tab
+                for tab in self.tabs.values()
+                if tab["sheetId"] == row_range["sheetId"]
+            )
+            del tab["rows"][row_range["startIndex"] : row_range["endIndex"]]
+            tab["rowCount"] -= row_range["endIndex"] - row_range["startIndex"]
+        return FakeRequest({"spreadsheetId": spreadsheetId})
+
+    def batchGet(self, spreadsheetId, ranges, majorDimension=None):
+        self.calls.append(("batchGet", ranges))
+        return FakeRequest({"valueRanges": [self.read(a1) for a1 in ranges]})
+
+    def parse_range(self, a1):
+        title, cells = a1.rsplit("!", 1)
+        title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+        match = re.fullmatch(r"([A-Z]*)(\d*):([A-Z]*)(\d*)", cells)
+        first_col, first_row, last_col, last_row = match.groups()
+        tab = self.tabs[title]
+        return (
+            tab,
+            int(first_row or 1),
+            int(last_row or tab["rowCount"]),
+            column_index(first_col) if first_col else 1,
+            column_index(last_col) if last_col else 26,
+        )
+
+    def append(self, spreadsheetId, range, valueInputOption, insertDataOption, body):
+        self.calls.append(("append", range))
+        if (
+            len([call for call in self.calls if call[0] == "append"])
+            in self.failing_appends
+        ):
+            raise self.append_error
+        assert insertDataOption == "INSERT_ROWS"
+        self.version += 1
+        title, _, anchor = range.partition("!")
+        tab = self.tabs[title[1:-1]]
+        start = int(anchor[1:]) if anchor else 1
+        # Below the last non empty row of the table starting at the anchor
+        row = start
+        while row <= len(tab["rows"]) and tab["rows"][row - 1]:
+            row += 1
+        tab["rows"][row - 1 : row - 1] = [list(values) for values in body["values"]]
+        tab["rowCount"] += len(body["values"])
+        last_row = row + len(body["values"]) - 1
+        return FakeRequest({"updates": {"updatedRange": f"{title}!A{row}:D{last_row}"}})
+
+    def write(self, body):
+        self.calls.append(
+            ("values.batchUpdate", [data["range"] for data in body["data"]])
+        )
+        if (
+            len([call for call in self.calls if call[0] == "values.batchUpdate"])
+            in self.failing_writes
+        ):
+            raise ConnectionResetError("Connection reset by peer")
+        self.version += 1
+        responses = []
+        for data in body["data"]:
+            tab, first_row, _, first_col, _ = self.parse_range(data["range"])
+            for r, row_values in enumerate(data["values"]):
+                while len(tab["rows"]) < first_row + r:
+                    tab["rows"].append([])
+                row = tab["rows"][first_row + r - 1]
+                for c, value in enumerate(row_values):
+                    if value is None:
+                        continue
+                    while len(row) < first_col + c:
+                        row.append("")
+                    row[first_col + c - 1] = value
+            responses.append({"updatedRange": data["range"]})
+        return FakeRequest({"responses": responses})
+
+    def read(self, a1):
+        tab, first_row, last_row, first_col, last_col = self.parse_range(a1)
+        values = []
+        for row in tab["rows"][first_row - 1 : last_row]:
+            row = row[first_col - 1 : last_col]
+            while row and row[-1] == "":
+                row = row[:-1]
+            values.append(row)
+        while values and not values[-1]:
+            values.pop()
+        response = {"range": a1, "majorDimension": "ROWS"}
+        if values:
+            response["values"] = values
+        return response
+
+
+class FakeDriveFiles:
+    """Stand-in for Drive files().get returning the version of the fake spreadsheet."""
+
+    def __init__(self, sheets):
+        self.sheets = sheets
+
+    def files(self):
+        return self
+
+    def get(self, fileId, fields):
+        assert fields == "version"
+        self.sheets.calls.append(("version", None))
+        return FakeRequest({"version": str(self.sheets.version)})
+
+
+def make_rows(count, columns=4):
+    return [
+        [f"{column_letter(c)}{r}" for c in range(1, columns + 1)]
+        for r in range(1, count + 1)
+    ]
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    monkeypatch.setattr("app.utils.sheets._metadata_cache", {})
+    rows = make_rows(12000)
+    rows[2] = []  # An empty row inside the data
+    service = FakeSheetsService(
+        {
+            "Data": {"sheetId": 0, "rows": rows, "rowCount": 12500},
+            "Notes": {"sheetId": 7, "rows": make_rows(3), "rowCount": 1000},
+        }
+    )
+    scope = request_state.begin()
+    request_state.set("middleware.GoogleAuthMiddleware.is_authenticated", True)
+    request_state.set("google_sheets_service", service)
+    yield service
+    request_state.end(scope)
+
+
+def test_plan_row_windows_stays_inside_grid():
+    assert list(plan_row_windows(1, None, 12, 5)) == [(1, 5), (6, 10), (11, 12)]
+    assert list(plan_row_windows(4, 3, 12, 5)) == [(4, 6)]
+    assert list(plan_row_windows(20, 10, 12, 5)) == []
+
+
+def test_read_window_with_cursor_and_columns(sheets):
+    response = gdrive_get_sheet_values_tool(
+        sheet_id="spreadsheet", start_row=2, row_count=3, columns="B:C"
+    )
+
+    assert response["status"] == "success"
+    assert response["rows"] == [
+        {"row": 2, "values": ["B2", "C2"]},
+        {"row": 4, "values": ["B4", "C4"]},
+    ]
+    assert sheets.calls[-1] == ("get", "'Data'!B2:C4")
+
+    response = gdrive_get_sheet_values_tool(
+        sheet_id="spreadsheet", cursor=response["next_cursor"], row_count=2
+    )
+    assert [row["values"] for row in response["rows"]] == [["B5", "C5"], ["B6", "C6"]]
+
+    # The grid size is fetched for every read
+    assert [call[0] for call in sheets.calls].count("metadata") == 2
+
+
+def test_read_tab_by_name_or_id_until_the_last_row(sheets):
+    response = gdrive_get_sheet_values_tool(sheet_id="spreadsheet", sheet=7)
+    assert response["sheet"] == "Notes"
+    assert len(response["rows"]) == 3
+    assert response["next_cursor"] is None
+
+    # Rows added by someone else within the metadata cache TTL are read too
+    sheets.tabs["Notes"]["rows"] += [[]] * 997 + [["added"]]
+    sheets.tabs["Notes"]["rowCount"] += 1
+    response = gdrive_get_sheet_values_tool(
+        sheet_id="spreadsheet", sheet=7, start_row=1000
+    )
+    assert response["rows"] == [{"row": 1001, "values": ["added"]}]
+    assert response["next_cursor"] is None
+
+    response = gdrive_get_sheet_values_tool(sheet_id="spreadsheet", sheet="Missing")
+    assert response["status"] == "error"
+
+
+def test_sheet_contents_are_streamed_in_windows(sheets):
+    response = get_google_sheet_contents("spreadsheet")
+
+    content = response["content"]
+    assert len(content["values"]) == 10000
+    assert content["values"][2] == []
+    assert content["values"][9999] == ["A10000", "B10000", "C10000", "D10000"]
+    assert content["truncated"] is True
+    assert [call[1] for call in sheets.calls if call[0] == "get"] == [
+        "'Data'!1:5000",
+        "'Data'!5001:10000",
+    ]
+
+    response = gdrive_get_sheet_values_tool(
+        sheet_id="spreadsheet", cursor=content["next_cursor"]
+    )
+    assert response["rows"][0] == {
+        "row": 10001,
+        "values": ["A10001", "B10001", "C10001", "D10001"],
+    }
+
+
+def test_tabs_and_ranges_are_read_with_one_batch_get(sheets):
+    response = gdrive_get_sheet_ranges_tool(
+        sheet_id="spreadsheet", sheets=["Notes", 0], ranges=["'Data'!B2:C3"]
+    )
+
+    assert response["status"] == "success"
+    notes, data, cells = response["ranges"]
+    assert notes["sheet"] == "Notes" and len(notes["values"]) == 3
+    assert len(data["values"]) == 10000 and data["truncated"] is True
+    assert cells["values"] == [["B2", "C2"]]  # Trailing empty rows are left out
+    assert [call[0] for call in sheets.calls] == ["metadata", "batchGet"]
+
+
+def test_every_tab_is_read_by_default(sheets):
+    response = gdrive_get_sheet_ranges_tool(sheet_id="spreadsheet")
+
+    assert [entry["sheet"] for entry in response["ranges"]] == ["Data", "Notes"]
+    assert len(sheets.calls) == 2
+
+
+def test_coalesce_rows_bottom_up():
+    assert coalesce_rows([1, 2, 3, 7, 5, 6, 10, 3]) == [(10, 10), (5, 7), (1, 3)]
+
+
+def test_delete_rows_in_contiguous_ranges_and_batches(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets.SHEET_BATCH_MAX_REQUESTS", 2)
+    # Every other row of 2..11, plus the run 20..9019
+    row_indices = list(range(2, 12, 2)) + list(range(20, 9020))
+
+    response = gdrive_delete_rows_from_sheet_tool(
+        sheet_id="spreadsheet", row_indices=row_indices, sheet="Data"
+    )
+
+    assert response["status"] == "success"
+    assert response["deleted_ranges"] == 6
+    batches = [call[1] for call in sheets.calls if call[0] == "batchUpdate"]
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+    rows = sheets.tabs["Data"]["rows"]
+    assert len(rows) == 12000 - len(row_indices)
+    assert [row[0] for row in rows[:6] if row] == ["A1", "A5", "A7", "A9", "A11"]
+    assert rows[13][0] == "A19" and rows[14][0] == "A9020"
+
+    # The tab size changed, its properties are fetched again
+    gdrive_get_sheet_values_tool(sheet_id="spreadsheet", sheet="Data")
+    assert [call[0] for call in sheets.calls].count("metadata") == 2
+
+
+def test_failed_delete_batch_returns_the_remaining_rows(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets.SHEET_BATCH_MAX_REQUESTS", 2)
+    sheets.failing_batches = {2}
+    row_indices = [2, 4, 6, 8, 10]
+
+    response = gdrive_delete_rows_from_sheet_tool(
+        sheet_id="spreadsheet", row_indices=row_indices, sheet="Data"
+    )
+
+    assert response["status"] == "partial"
+    assert response["deleted_ranges"] == 2
+    assert response["remaining_rows"] == [2, 4, 6]
+
+    # Retrying with the remaining rows deletes exactly the requested rows
+    sheets.failing_batches = set()
+    response = gdrive_delete_rows_from_sheet_tool(
+        sheet_id="spreadsheet", row_indices=response["remaining_rows"], sheet="Data"
+    )
+    assert response["status"] == "success"
+    rows = sheets.tabs["Data"]["rows"]
+    assert [row[:1] for row in rows[:6]] == [
+        ["A1"],
+        [],
+        ["A5"],
+        ["A7"],
+        ["A9"],
+        ["A11"],
+    ]
+
+
+def test_adjacent_ranges_are_merged():
+    blocks = merge_value_ranges(
+        [
+            {"range": "Data!A2", "values": [["x"]]},
+            {"range": "Data!A1:B1", "values": [["a", "b"]]},
+            {"range": "Data!B2", "values": [["y"]]},
+            {"range": "'Other tab'!C3", "values": [["z"]]},
+        ]
+    )
+
+    assert [(block["range"], block["values"]) for block in blocks] == [
+        ("'Data'!A1:B2", [["a", "b"], ["x", "y"]]),
+        ("'Other tab'!C3:C3", [["z"]]),
+    ]
+
+    # Overlapping ranges are written in order, without merging
+    blocks = merge_value_ranges(
+        [
+            {"range": "Data!A1:B1", "values": [["a", "b"]]},
+            {"range": "Data!B1", "values": [["c"]]},
+        ]
+    )
+    assert [block["range"] for block in blocks] == ["'Data'!A1:B1", "'Data'!B1:B1"]
+
+    # A range without a tab name may be on a named tab, the order is kept too
+    blocks = merge_value_ranges(
+        [
+            {"range": "A1", "values": [["x"]]},
+            {"range": "Sheet1!A2", "values": [["b"]]},
+            {"range": "A2", "values": [["c"]]},
+        ]
+    )
+    assert [block["range"] for block in blocks] == ["A1:A1", "'Sheet1'!A2:A2", "A2:A2"]
+
+
+def test_batch_edit_scattered_cells(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets.SHEET_WRITE_MAX_RANGES", 100)
+    # 300 scattered cells: column F of rows 1..150 and column H of every other row
+    updates = [
+        {"range": f"Data!F{row}", "values": [[f"f{row}"]]} for row in range(1, 151)
+    ]
+    updates += [
+        {"range": f"Data!H{row}", "values": [[f"h{row}"]]} for row in range(1, 300, 2)
+    ]
+
+    response = gdrive_batch_edit_sheet_tool(sheet_id="spreadsheet", updates=updates)
+
+    assert response["status"] == "success"
+    assert response["succeeded"] == 300
+    assert response["results"][0]["updated_ranges"] == ["'Data'!F1:F150"]
+    # One merged range for column F, 150 single cells for column H
+    assert response["requests"] == 2
+    rows = sheets.tabs["Data"]["rows"]
+    assert rows[0][:8] == ["A1", "B1", "C1", "D1", "", "f1", "", "h1"]
+    assert rows[149][5] == "f150" and len(rows[149]) == 6
+
+
+def test_batch_edit_reports_ranges_after_a_transport_error(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets.SHEET_WRITE_MAX_RANGES", 50)
+    sheets.failing_writes = {2}
+    updates = [
+        {"range": f"Data!F{row}", "values": [[f"f{row}"]]} for row in range(1, 151)
+    ]
+    updates += [
+        {"range": f"Data!H{row}", "values": [[f"h{row}"]]} for row in range(1, 300, 2)
+    ]
+
+    response = gdrive_batch_edit_sheet_tool(sheet_id="spreadsheet", updates=updates)
+
+    # Column F and 49 cells of H were written before the second request failed
+    assert response["status"] == "partial"
+    assert response["succeeded"] == 199
+    assert response["requests"] == 2
+    failed = [result for result in response["results"] if result["status"] != "success"]
+    assert failed[0]["error"] == "Connection reset by peer"
+    assert sum(1 for result in failed if result.get("not_sent")) == 51
+    assert sheets.tabs["Data"]["rows"][0][7] == "h1"
+
+
+def test_batch_edit_splits_large_payloads(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets.SHEET_WRITE_MAX_BYTES", 1000)
+    values = [[f"value {row}"] * 4 for row in range(100)]
+
+    response = gdrive_batch_edit_sheet_tool(
+        sheet_id="spreadsheet", updates=[{"range": "Notes!A1", "values": values}]
+    )
+
+    assert response["status"] == "success"
+    assert response["requests"] > 1
+    assert len(response["results"][0]["updated_ranges"]) == response["requests"]
+    assert sheets.tabs["Notes"]["rows"][99] == ["value 99"] * 4
+
+
+def test_add_rows_in_ordered_chunks(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets.SHEET_APPEND_MAX_ROWS", 400)
+    values = [[f"new {i}"] for i in range(1000)]
+
+    response = gdrive_add_rows_to_sheet_tool(
+        sheet_id="spreadsheet", values=values, sheet="Notes"
+    )
+
+    assert response["status"] == "success"
+    assert response["rows_added"] == 1000
+    appends = [call[1] for call in sheets.calls if call[0] == "append"]
+    assert appends == ["'Notes'", "'Notes'!A404", "'Notes'!A804"]
+    rows = sheets.tabs["Notes"]["rows"]
+    assert rows[3:1003] == values
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        http_error(429, "rateLimitExceeded"),
+        TimeoutError("The read operation timed out"),
+    ],
+)
+def test_add_rows_resumes_from_next_offset(sheets, monkeypatch, error):
+    monkeypatch.setattr("app.utils.sheets.SHEET_APPEND_MAX_ROWS", 400)
+    values = [[f"new {i}"] for i in range(1000)]
+    sheets.failing_appends = {2}
+    sheets.append_error = error
+
+    response = gdrive_add_rows_to_sheet_tool(sheet_id="spreadsheet", values=values)
+    assert response["status"] == "partial"
+    assert response["rows_added"] == 400
+    assert response["next_offset"] == 400
+
+    response = gdrive_add_rows_to_sheet_tool(
+        sheet_id="spreadsheet", values=values, start_offset=response["next_offset"]
+    )
+    assert response["status"] == "success"
+    assert response["rows_added"] == 600
+    assert sheets.tabs["Data"]["rows"][2:1002] == values  # Below rows 1 and 2
+
+
+def test_sync_writes_only_changed_cells(sheets):
+    desired = [list(row) for row in sheets.tabs["Data"]["rows"][:11990]]
+    desired[2] = ["x", None, "", "z"]  # Fills the empty row, skipping B3
+    desired[5000][1] = "changed"
+    desired[5000][3] = ""
+    desired[9000][2] = 42
+
+    response = gdrive_sync_sheet_tool(sheet_id="spreadsheet", values=desired)
+
+    assert response["status"] == "success"
+    assert response["cells_written"] == 5
+    assert response["rows_deleted"] == 10
+    writes = [call[1] for call in sheets.calls if call[0] == "values.batchUpdate"]
+    assert writes == [
+        [
+            "'Data'!A3:A3",
+            "'Data'!D3:D3",
+            "'Data'!B5001:B5001",
+            "'Data'!D5001:D5001",
+            "'Data'!C9001:C9001",
+        ]
+    ]
+    rows = sheets.tabs["Data"]["rows"]
+    assert len(rows) == 11990
+    assert rows[2] == ["x", "", "", "z"]
+    assert rows[5000] == ["A5001", "changed", "C5001", ""]
+    assert rows[9000][2] == 42
+
+
+def test_sync_appends_missing_rows_and_keeps_unchanged(sheets):
+    desired = [list(row) for row in sheets.tabs["Notes"]["rows"]]
+    desired += [["new", 1], ["newer", 2]]
+
+    response = gdrive_sync_sheet_tool(
+        sheet_id="spreadsheet", values=desired, sheet="Notes"
+    )
+
+    assert response["cells_written"] == 0
+    assert response["rows_appended"] == 2
+    assert [call[0] for call in sheets.calls if call[0] != "metadata"] == [
+        "get",
+        "append",
+    ]
+    assert sheets.tabs["Notes"]["rows"][3:] == [["new", 1], ["newer", 2]]
+
+
+def test_sync_sees_rows_added_after_the_metadata_was_cached(sheets):
+    gdrive_get_sheet_values_tool(sheet_id="spreadsheet", sheet="Notes")
+    # Someone else fills the grid and adds a row below it
+    sheets.tabs["Notes"]["rows"] += [[]] * 997 + [["added"]]
+    sheets.tabs["Notes"]["rowCount"] += 1
+    desired = [list(row) for row in make_rows(3)] + [["new", 1]]
+
+    response = gdrive_sync_sheet_tool(
+        sheet_id="spreadsheet", values=desired, sheet="Notes"
+    )
+
+    # Row 4 is inside the current table, it is written and row 1001 deleted
+    assert response["rows_deleted"] == 1
+    assert response["rows_appended"] == 0
+    assert sheets.tabs["Notes"]["rows"][:4] == desired
+    assert ["added"] not in sheets.tabs["Notes"]["rows"]
+
+
+def test_sync_appends_below_a_table_with_a_gap(sheets):
+    sheets.tabs["Notes"]["rows"][1] = []
+    desired = [list(row) for row in sheets.tabs["Notes"]["rows"]]
+    desired[1] = [None, None]  # Left as it is
+    desired += [["new", 1]]
+
+    response = gdrive_sync_sheet_tool(
+        sheet_id="spreadsheet", values=desired, sheet="Notes"
+    )
+
+    assert response["rows_appended"] == 1
+    assert [call[1] for call in sheets.calls if call[0] == "append"] == ["'Notes'!A4"]
+    rows = sheets.tabs["Notes"]["rows"]
+    assert rows[:4] == [make_rows(3)[0], [], make_rows(3)[2], ["new", 1]]
+
+
+def test_upsert_updates_known_keys_and_appends_new_ones(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets._key_index_cache", {})
+    customers = [["id", "name"]] + [[str(i), f"customer {i}"] for i in range(2000)]
+    sheets.tabs["Customers"] = {"sheetId": 3, "rows": customers, "rowCount": 2001}
+    request_state.set("google_drive_service", FakeDriveFiles(sheets))
+
+    records = [[i, f"renamed {i}"] for i in range(1500, 2500)]
+    response = gdrive_upsert_sheet_rows_tool(
+        sheet_id="spreadsheet", rows=records, sheet="Customers"
+    )
+
+    assert response["status"] == "success"
+    assert response["rows_updated"] == 500
+    assert response["rows_appended"] == 500
+    assert [call[0] for call in sheets.calls] == [
+        "metadata",
+        "version",
+        "metadata",
+        "get",
+        "values.batchUpdate",
+        "append",
+        "version",
+    ]
+    rows = sheets.tabs["Customers"]["rows"]
+    assert rows[1500] == ["1499", "customer 1499"]
+    assert rows[1501] == [1500, "renamed 1500"]
+    assert rows[2001] == [2000, "renamed 2000"]
+    assert len(rows) == 2501
+
+    # The index is reused for the new file version, the key column is not read again
+    sheets.calls.clear()
+    response = gdrive_upsert_sheet_rows_tool(
+        sheet_id="spreadsheet", rows=[["2400", "again"], ["new", "row"]], sheet=3
+    )
+    assert response["rows_updated"] == 1 and response["rows_appended"] == 1
+    assert "get" not in [call[0] for call in sheets.calls]
+    assert sheets.tabs["Customers"]["rows"][2401] == ["2400", "again"]
+
+
+def test_upsert_rebuilds_index_after_outside_changes(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets._key_index_cache", {})
+    sheets.tabs["Customers"] = {
+        "sheetId": 3,
+        "rows": [["id"], ["a"], ["b"]],
+        "rowCount": 3,
+    }
+    request_state.set("google_drive_service", FakeDriveFiles(sheets))
+    gdrive_upsert_sheet_rows_tool(
+        sheet_id="spreadsheet", rows=[["b", 1]], sheet="Customers"
+    )
+
+    # Someone else inserts a row above b
+    sheets.tabs["Customers"]["rows"].insert(1, ["z"])
+    sheets.tabs["Customers"]["rowCount"] += 1
+    sheets.version += 1
+    response = gdrive_upsert_sheet_rows_tool(
+        sheet_id="spreadsheet", rows=[["b", 2]], sheet="Customers"
+    )
+
+    assert response["rows_updated"] == 1
+    assert sheets.tabs["Customers"]["rows"] == [["id"], ["z"], ["a"], ["b", 2]]
+
+    response = gdrive_upsert_sheet_rows_tool(
+        sheet_id="spreadsheet", rows=[[None, 3]], sheet="Customers"
+    )
+    assert response["status"] == "error"
+
+
+def test_upsert_drops_index_changed_during_the_writes(sheets, monkeypatch):
+    monkeypatch.setattr("app.utils.sheets._key_index_cache", {})
+    sheets.tabs["Customers"] = {
+        "sheetId": 3,
+        "rows": [["id"], ["a"], ["b"]],
+        "rowCount": 3,
+    }
+    request_state.set("google_drive_service", FakeDriveFiles(sheets))
+    write = sheets.write
+
+    def write_then_insert(body):
+        response = write(body)
+        # Someone else inserts a row above b before the upsert reads the version
+        sheets.tabs["Customers"]["rows"].insert(1, ["z"])
+        sheets.tabs["Customers"]["rowCount"] += 1
+        sheets.version += 1
+        return response
+
+    sheets.write = write_then_insert
+    gdrive_upsert_sheet_rows_tool(
+        sheet_id="spreadsheet", rows=[["b", 1]], sheet="Customers"
+    )
+    sheets.write = write
+
+    response = gdrive_upsert_sheet_rows_tool(
+        sheet_id="spreadsheet", rows=[["b", 2]], sheet="Customers"
+    )
+    assert response["rows_updated"] == 1
+    assert sheets.tabs["Customers"]["rows"] == [["id"], ["z"], ["a"], ["b", 2]]
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from cryptography.fernet import Fernet
+from core.utils.env import EnvConfig
+from app.middleware.google.database import DatabaseHandler
+from app.middleware.google.token_refresh import (
+    TokenRefreshScheduler,
+    coalesced_refresh,
+)
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeTokenHandler(BaseHTTPRequestHandler):
+    """Stand-in for the Google OAuth token endpoint."""
+
+    requests = []
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        FakeTokenHandler.requests.append(self.rfile.read(length).decode())
+        body = json.dumps(
+            {
+                "access_token": f"refreshed-token-{len(FakeTokenHandler.requests)}",
+                "expires_in": 3600,
+                "token_type": "Bearer",
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def token_endpoint():
+    FakeTokenHandler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), FakeTokenHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/token"
+    server.shutdown()
+
+
+@pytest.fixture
+def db_handler(tmp_path):
+    handler = DatabaseHandler(
+        str(tmp_path / "credentials.db"), Fernet(EnvConfig.get("CYPHER"))
+    )
+    yield handler
+    handler.close()
+
+
+def insert_user(db_handler, user_id, expires_in, refresh_token=None):
+    expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+    return db_handler.insert_credentials(
+        user_id,
+        {
+            "token": f"old-token-{user_id}",
+            "refresh_token": (
+                f"refresh-{user_id}" if refresh_token is None else refresh_token
+            ),
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "client_id": "client-id",
+            "client_secret": "client-secret",
+            "scopes": ["openid"],
+            "expiry": expiry.isoformat(),
+        },
+    )
+
+
+def test_refreshes_active_users_before_expiry(db_handler, token_endpoint):
+    access_token = insert_user(db_handler, "expiring-user", expires_in=60)
+    db_handler.touch_last_used("expiring-user")
+
+    scheduler = TokenRefreshScheduler(
+        db_handler, refresh_window=300, token_uri=token_endpoint
+    )
+    assert scheduler.run_once() == 1
+
+    cred = db_handler.get_credentials(access_token)
+    assert cred["credentials"]["token"] == "refreshed-token-1"
+    assert cred["token_expiry"] > time.time() + 3000
+    assert "refresh_token=refresh-expiring-user" in FakeTokenHandler.requests[0]
+
+
+def test_skips_inactive_and_fresh_users(db_handler, token_endpoint):
+    insert_user(db_handler, "inactive-user", expires_in=60)
+    insert_user(db_handler, "fresh-user", expires_in=3600)
+    db_handler.touch_last_used("fresh-user")
+
+    scheduler = TokenRefreshScheduler(
+        db_handler, refresh_window=300, token_uri=token_endpoint
+    )
+    assert scheduler.run_once() == 0
+    assert FakeTokenHandler.requests == []
+
+
+def test_failed_users_do_not_hold_the_batch(db_handler, token_endpoint):
+    for user_id in ("revoked-1", "revoked-2"):
+        insert_user(db_handler, user_id, expires_in=10, refresh_token="")
+        db_handler.touch_last_used(user_id)
+    insert_user(db_handler, "waiting-user", expires_in=60)
+    db_handler.touch_last_used("waiting-user")
+
+    scheduler = TokenRefreshScheduler(
+        db_handler, refresh_window=300, batch_size=2, token_uri=token_endpoint
+    )
+    assert scheduler.run_once() == 0  # Both failed, their expiry comes first
+    assert scheduler.run_once() == 1
+    assert len(FakeTokenHandler.requests) == 1
+    assert "refresh_token=refresh-waiting-user" in FakeTokenHandler.requests[0]
+
+
+def test_concurrent_refreshes_are_coalesced(db_handler):
+    insert_user(db_handler, "burst-user", expires_in=-60)
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        time.sleep(0.2)  # Keep the refresh in flight while the others arrive
+        db_handler.update_access_token(
+            "burst-user", "new-token", datetime.utcnow() + timedelta(hours=1)
+        )
+        return "new-credentials"
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                coalesced_refresh(db_handler, "burst-user", refresh)
+            )
+        )
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 10
+
+
+def test_refresh_lease_excludes_other_workers(db_handler):
+    assert db_handler.acquire_refresh_lease("lease-user", "worker-1", ttl=30)
+    assert not db_handler.acquire_refresh_lease("lease-user", "worker-2", ttl=30)
+    db_handler.release_refresh_lease("lease-user", "worker-1")
+    assert db_handler.acquire_refresh_lease("lease-user", "worker-2", ttl=30)
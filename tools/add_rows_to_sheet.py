@@ -1,11 +1,12 @@
-from typing import List
+from typing import List, Literal, Optional, Union
 from typing_extensions import Annotated
 from pydantic import Field
 from core.utils.logger import logger
-from core.utils.state import global_state
 from core.utils.env import EnvConfig
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
+from app.utils.sheets import get_sheet_metadata, resolve_sheet, append_rows
 
 
 @doc_tag("Spreadsheets")
@@ -20,6 +21,25 @@ def gdrive_add_rows_to_sheet_tool(
             description="A list of lists representing rows and columns of content to add."
         ),
     ],
+    sheet: Annotated[
+        Optional[Union[str, int]],
+        Field(
+            description="The name or numeric ID of the tab to add rows to, the first tab by default."
+        ),
+    ] = None,
+    value_input_option: Annotated[
+        Literal["RAW", "USER_ENTERED"],
+        Field(
+            description="RAW stores values as they are, USER_ENTERED parses them like typed input (formulas, dates, numbers)."
+        ),
+    ] = "RAW",
+    start_offset: Annotated[
+        int,
+        Field(
+            description="The number of rows of values to skip, to resume an append that stopped at next_offset.",
+            ge=0,
+        ),
+    ] = 0,
 ) -> dict:
     """
     Adds content to an existing Google Sheets document.
@@ -29,9 +49,12 @@ def gdrive_add_rows_to_sheet_tool(
     Args:
     - sheet_id (str): The ID of the sheet to add content to.
     - values (list): A list of lists representing rows and columns of content to add.
+    - sheet (str | int): The name or numeric ID of the tab to add rows to, the first tab by default.
+    - value_input_option (str): RAW stores values as they are, USER_ENTERED parses them like typed input.
+    - start_offset (int): The number of rows of values to skip, to resume an append that stopped at next_offset.
 
     Returns:
-    - Dictionary indicating success or error.
+    - Dictionary indicating success or error, with the number of rows added and the next_offset to resume from when only part of the rows were added.
 
     Example Request Payload:
         gdrive_add_rows_to_sheet_tool(
@@ -44,29 +67,41 @@ def gdrive_add_rows_to_sheet_tool(
     if auth_response:
         return auth_response
 
-    # Retrieve the Google Sheets service from global state
-    service = global_state.get("google_sheets_service")
+    # Retrieve the Google Sheets service from request state
+    service = request_state.get("google_sheets_service")
     if service is None:
-        logger.error("Google Sheets service is not available in global state.")
+        logger.error("Google Sheets service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
         }
 
     try:
-        # Prepare the request body
-        body = {"values": values}
+        # Resolve the tab from the cached tab properties
+        properties = resolve_sheet(get_sheet_metadata(service, sheet_id), sheet)
 
-        # Specify the range where the content will be added (e.g., "Sheet1")
-        range_name = "Sheet1"  # Adjust if necessary
+        # Append the content in chunks, one request after the other
+        result = append_rows(
+            service, sheet_id, properties, values, value_input_option, start_offset
+        )
 
-        # Append the content to the sheet
-        service.spreadsheets().values().append(
-            spreadsheetId=sheet_id, range=range_name, valueInputOption="RAW", body=body
-        ).execute()
+        if "error" in result:
+            logger.error(
+                f"Added {result['rows_added']} row(s) to sheet ID: {sheet_id} before failing: {result['error']}"
+            )
+            return {
+                "status": "partial" if result["rows_added"] else "error",
+                **result,
+            }
 
-        logger.info(f"Successfully added content to sheet ID: {sheet_id}.")
-        return {"status": "success", "message": "Content added successfully."}
+        logger.info(
+            f"Successfully added {result['rows_added']} row(s) to sheet ID: {sheet_id} with {result['requests']} request(s)."
+        )
+        return {
+            "status": "success",
+            "message": "Content added successfully.",
+            **result,
+        }
 
     except Exception as e:
         logger.error(f"Failed to add content to sheet: {str(e)}")
@@ -0,0 +1,86 @@
+from typing import List, Literal, Union
+from typing_extensions import Annotated, TypedDict
+from pydantic import Field
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.sheets import write_value_ranges
+from app.utils.drive_batch import summarize_results
+
+
+class SheetRangeUpdate(TypedDict):
+    range: Annotated[
+        str, Field(description="The range of cells to edit (e.g., 'Sheet1!A1:B2').")
+    ]
+    values: Annotated[
+        List[List[Union[str, int, float, bool, None]]],
+        Field(description="The rows of values to write, null leaves a cell unchanged."),
+    ]
+
+
+@doc_tag("Spreadsheets")
+@doc_name("Batch edit spreadsheet")
+def gdrive_batch_edit_sheet_tool(
+    sheet_id: Annotated[
+        str, Field(description="The ID of the sheet to edit content in.")
+    ],
+    updates: Annotated[
+        List[SheetRangeUpdate],
+        Field(
+            description="The ranges to edit, each with the rows of values to write.",
+            min_length=1,
+        ),
+    ],
+    value_input_option: Annotated[
+        Literal["RAW", "USER_ENTERED"],
+        Field(
+            description="RAW stores values as they are, USER_ENTERED parses them like typed input (formulas, dates, numbers)."
+        ),
+    ] = "RAW",
+) -> dict:
+    """
+    Edits many ranges of an existing Google Sheets document at once, adjacent ranges are written together.
+
+    * Requires permission scope for spreadsheets.
+
+    Args:
+    - sheet_id (str): The ID of the sheet to edit content in.
+    - updates (list): The ranges to edit, each with a "range" (e.g., 'Sheet1!A1:B2') and the "values" to write.
+    - value_input_option (str): RAW stores values as they are, USER_ENTERED parses them like typed input.
+
+    Returns:
+    - Dictionary with the result of every range and the number of requests sent.
+    """
+
+    # Check authentication
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    # Retrieve the Google Sheets service from request state
+    service = request_state.get("google_sheets_service")
+    if service is None:
+        logger.error("Google Sheets service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        results, requests = write_value_ranges(
+            service, sheet_id, list(updates), value_input_option
+        )
+
+        logger.info(
+            f"Edited {len(updates)} range(s) with {requests} request(s) in sheet ID: {sheet_id}."
+        )
+        return {**summarize_results(results), "requests": requests}
+
+    except Exception as e:
+        logger.error(f"Failed to edit content in sheet: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e),
+        }
@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import time
+from typing import List, Optional
+from typing_extensions import Annotated
+from pydantic import Field
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.tools.delete_item import CONFIRMATION_TOKEN_VALIDITY_DURATION
+from app.utils.drive_batch import (
+    execute_batch,
+    error_message,
+    summarize_results,
+    BULK_MAX_ITEMS,
+)
+
+
+def get_items_digest(item_ids) -> str:
+    """Digest identifying a set of item IDs regardless of their order."""
+    return hashlib.sha256("\n".join(sorted(set(item_ids))).encode()).hexdigest()
+
+
+@doc_tag("Drive")
+@doc_name("Bulk delete items")
+def gdrive_bulk_delete_items_tool(
+    item_ids: Annotated[
+        List[str], Field(description="The IDs of the files and folders to delete.")
+    ],
+    confirmation_token: Annotated[
+        Optional[str],
+        Field(
+            description="An optional token to confirm the deletion of all the given items. "
+            "If not provided, a token will be generated based on the list of item IDs. "
+            "This token must be used to confirm the deletion request."
+        ),
+    ] = None,
+) -> dict:
+    """
+    Deletes several files and folders from Google Drive using batched requests, with confirmation logic.
+
+    * Requires permission scope for the drive.
+
+    The function first checks if a confirmation token is provided.
+    If not, it generates a single token bound to the whole list of item IDs.
+    The user must then confirm the deletion using this token, which is valid for a specified duration.
+
+    Args:
+    - item_ids (List[str]): The IDs of the files and folders to delete.
+    - confirmation_token (Optional[str]): An optional token to confirm the deletion of all the given items.
+
+    Returns:
+    - dict: The overall status (success, partial or error), the number of deleted and failed items and the result of each item.
+    """
+
+    logger.info(f"Request received to delete {len(item_ids)} items")
+
+    # Check authentication
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    if not item_ids:
+        return {"status": "error", "error": "No item IDs given."}
+    if len(item_ids) > BULK_MAX_ITEMS:
+        return {
+            "status": "error",
+            "error": f"Too many items, at most {BULK_MAX_ITEMS} items can be deleted at once.",
+        }
+
+    # Retrieve the Google Drive service from request state
+    drive_service = request_state.get("google_drive_service")
+    if drive_service is None:
+        logger.error("Google Drive service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    item_ids = list(dict.fromkeys(item_ids))
+    digest = get_items_digest(item_ids)
+
+    # Generate a confirmation token covering the whole list if not provided
+    if not confirmation_token:
+        params_string = f"{digest}:{int(time.time())}"
+        confirmation_token = base64.b64encode(params_string.encode()).decode()
+        logger.info(f"Generated confirmation token: {confirmation_token}")
+        return {
+            "message": f"Confirmation required to delete {len(item_ids)} items, confirm deletion with user and use the given confirmation_token with the same request parameters.",
+            "confirmation_token": confirmation_token,
+            "item_count": len(item_ids),
+            "action": "confirm_deletion",
+        }
+
+    # Decode and validate the confirmation token
+    try:
+        decoded_params = base64.b64decode(confirmation_token).decode()
+        token_digest, token_timestamp = decoded_params.split(":")
+        token_timestamp = int(token_timestamp)
+
+        # Check if the token has expired
+        if time.time() - token_timestamp > CONFIRMATION_TOKEN_VALIDITY_DURATION:
+            return {
+                "error": "Confirmation token has expired. Please request a new token."
+            }
+
+        # Check if the token was issued for exactly these items
+        if token_digest != digest:
+            return {
+                "error": "Invalid confirmation token. The list of items does not match, please request a new token."
+            }
+
+    except Exception as e:
+        logger.error(f"Failed to decode confirmation token: {e}")
+        return {"error": "Invalid confirmation token."}
+
+    results = {}
+    deletions = {
+        file_id: lambda file_id=file_id: drive_service.files().delete(fileId=file_id)
+        for file_id in item_ids
+    }
+
+    try:
+        for file_id, (response, error) in execute_batch(
+            drive_service, deletions
+        ).items():
+            if error is not None:
+                results[file_id] = {
+                    "id": file_id,
+                    "status": "error",
+                    "error": error_message(error),
+                }
+            else:
+                results[file_id] = {"id": file_id, "status": "success"}
+    except Exception as e:
+        logger.error(f"Unexpected error while deleting items: {str(e)}")
+        return {"status": "error", "error": f"Unexpected error: {str(e)}"}
+
+    response = summarize_results([results[file_id] for file_id in item_ids])
+    logger.info(f"Deleted {response['succeeded']} items, {response['failed']} failed.")
+    return response
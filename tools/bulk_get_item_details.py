@@ -0,0 +1,98 @@
+from typing import List
+from typing_extensions import Annotated
+from pydantic import Field
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.drive import FOLDER_MIME_TYPE
+from app.utils.drive_batch import (
+    execute_batch,
+    error_message,
+    summarize_results,
+    BULK_MAX_ITEMS,
+)
+
+
+@doc_tag("Drive")
+@doc_name("Bulk get item details")
+def gdrive_bulk_get_item_details_tool(
+    item_ids: Annotated[
+        List[str],
+        Field(description="The IDs of the files and folders to retrieve."),
+    ],
+) -> dict:
+    """
+    Retrieves information about several files and folders in Google Drive using batched requests.
+
+    * Requires permission scope for the drive.
+
+    Args:
+    - item_ids (List[str]): The IDs of the files and folders to retrieve information from.
+
+    Returns:
+    - dict: The overall status (success, partial or error) and the file/folder information or error of each item.
+    """
+
+    # Check authentication
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    item_ids = list(dict.fromkeys(item_ids))
+    if not item_ids:
+        return {"status": "error", "error": "No item IDs given."}
+    if len(item_ids) > BULK_MAX_ITEMS:
+        return {
+            "status": "error",
+            "error": f"Too many items, at most {BULK_MAX_ITEMS} items can be retrieved at once.",
+        }
+
+    # Retrieve the Google Drive service from request state
+    service = request_state.get("google_drive_service")
+    if service is None:
+        logger.error("Google Drive service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Drive permission scope not available. Please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        logger.info(f"Attempting to retrieve information for {len(item_ids)} items")
+
+        responses = execute_batch(
+            service,
+            {
+                item_id: lambda item_id=item_id: service.files().get(
+                    fileId=item_id, fields="id, name, mimeType, size, parents"
+                )
+                for item_id in item_ids
+            },
+        )
+
+        results = []
+        for item_id in item_ids:
+            file_metadata, error = responses[item_id]
+            if error is not None:
+                results.append(
+                    {"id": item_id, "status": "error", "error": error_message(error)}
+                )
+            else:
+                results.append(
+                    {
+                        "id": item_id,
+                        "status": "success",
+                        "file_info": file_metadata,
+                        "is_folder": file_metadata.get("mimeType") == FOLDER_MIME_TYPE,
+                    }
+                )
+
+        return summarize_results(results)
+
+    except Exception as e:
+        logger.error(f"Failed to retrieve file information: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e),
+        }
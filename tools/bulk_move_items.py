@@ -0,0 +1,129 @@
+from typing import List
+from typing_extensions import Annotated
+from pydantic import Field
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.drive_batch import (
+    execute_batch,
+    error_message,
+    summarize_results,
+    BULK_MAX_ITEMS,
+)
+
+
+@doc_tag("Drive")
+@doc_name("Bulk move items")
+def gdrive_bulk_move_items_tool(
+    item_ids: Annotated[
+        List[str], Field(description="The IDs of the files and folders to move.")
+    ],
+    new_parent_id: Annotated[
+        str, Field(description="The ID of the new parent folder.")
+    ],
+) -> dict:
+    """
+    Moves several files and folders to a new folder in Google Drive using batched requests.
+
+    * Requires permission scope for the drive.
+
+    Args:
+    - item_ids (List[str]): The IDs of the files and folders to move.
+    - new_parent_id (str): The ID of the new parent folder.
+
+    Returns:
+    - dict: The overall status (success, partial or error), the number of moved and failed items and the result of each item.
+    """
+
+    # Check authentication
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    item_ids = list(dict.fromkeys(item_ids))
+    if not item_ids:
+        return {"status": "error", "error": "No item IDs given."}
+    if len(item_ids) > BULK_MAX_ITEMS:
+        return {
+            "status": "error",
+            "error": f"Too many items, at most {BULK_MAX_ITEMS} items can be moved at once.",
+        }
+
+    # Retrieve the Google Drive service from request state
+    service = request_state.get("google_drive_service")
+    if service is None:
+        logger.error("Google Drive service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        logger.info(
+            f"Attempting to move {len(item_ids)} items to new parent ID: {new_parent_id}"
+        )
+
+        # Look up the current parents of every item in batches
+        lookups = execute_batch(
+            service,
+            {
+                item_id: lambda item_id=item_id: service.files().get(
+                    fileId=item_id, fields="id, parents"
+                )
+                for item_id in item_ids
+            },
+        )
+
+        results = {}
+        updates = {}
+        for item_id in item_ids:
+            metadata, error = lookups[item_id]
+            if error is not None:
+                results[item_id] = {
+                    "id": item_id,
+                    "status": "error",
+                    "error": error_message(error),
+                }
+                continue
+            old_parents = [
+                parent
+                for parent in metadata.get("parents", [])
+                if parent != new_parent_id
+            ]
+            if not old_parents and new_parent_id in metadata.get("parents", []):
+                results[item_id] = {"id": item_id, "status": "success"}
+                continue  # Already in the target folder
+            updates[item_id] = lambda item_id=item_id, old_parents=old_parents: (
+                service.files().update(
+                    fileId=item_id,
+                    removeParents=",".join(old_parents),
+                    addParents=new_parent_id,
+                    fields="id, parents",
+                )
+            )
+
+        # Move the items by updating their parents in batches
+        for item_id, (response, error) in execute_batch(service, updates).items():
+            if error is not None:
+                results[item_id] = {
+                    "id": item_id,
+                    "status": "error",
+                    "error": error_message(error),
+                }
+            else:
+                results[item_id] = {"id": item_id, "status": "success"}
+
+        response = summarize_results([results[item_id] for item_id in item_ids])
+        logger.info(
+            f"Moved {response['succeeded']} items to new parent ID: {new_parent_id}, {response['failed']} failed."
+        )
+        return response
+
+    except Exception as e:
+        logger.error(f"Failed to move items: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e),
+        }
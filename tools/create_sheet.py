@@ -2,9 +2,9 @@ from typing import Optional
 from typing_extensions import Annotated
 from pydantic import Field
 from core.utils.logger import logger
-from core.utils.state import global_state
 from core.utils.env import EnvConfig
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
 
 
@@ -39,10 +39,10 @@ def gdrive_create_sheet_tool(
     if auth_response:
         return auth_response
 
-    # Retrieve the Google Sheets service from global state
-    service = global_state.get("google_sheets_service")
+    # Retrieve the Google Sheets service from request state
+    service = request_state.get("google_sheets_service")
     if service is None:
-        logger.error("Google Sheets service is not available in global state.")
+        logger.error("Google Sheets service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
@@ -56,9 +56,9 @@ def gdrive_create_sheet_tool(
 
         # If a parent folder ID is provided, move the sheet to that folder
         if parent_folder_id:
-            drive_service = global_state.get("google_drive_service")
+            drive_service = request_state.get("google_drive_service")
             if drive_service is None:
-                logger.error("Google Drive service is not available in global state.")
+                logger.error("Google Drive service is not available in request state.")
                 return {
                     "status": "error",
                     "error": "Google Drive service is not initialized.",
@@ -1,10 +1,12 @@
+from typing import List, Optional, Union
 from typing_extensions import Annotated
 from pydantic import Field
 from core.utils.logger import logger
-from core.utils.state import global_state
 from core.utils.env import EnvConfig
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
+from app.utils.sheets import get_sheet_metadata, resolve_sheet, delete_rows
 
 
 @doc_tag("Spreadsheets")
@@ -14,8 +16,14 @@ def gdrive_delete_rows_from_sheet_tool(
         str, Field(description="The ID of the sheet from which to delete rows.")
     ],
     row_indices: Annotated[
-        list, Field(description="A list of row indices to delete (1-based).")
+        List[int], Field(description="A list of row indices to delete (1-based).")
     ],
+    sheet: Annotated[
+        Optional[Union[str, int]],
+        Field(
+            description="The name or numeric ID of the tab to delete rows from, the first tab by default."
+        ),
+    ] = None,
 ) -> dict:
     """
     Deletes specified rows from an existing Google Sheets document.
@@ -25,9 +33,10 @@ def gdrive_delete_rows_from_sheet_tool(
     Args:
     - sheet_id (str): The ID of the sheet from which to delete rows.
     - row_indices (list): A list of row indices (1-based) to delete.
+    - sheet (str | int): The name or numeric ID of the tab to delete rows from, the first tab by default.
 
     Returns:
-    - Dictionary indicating success or error.
+    - Dictionary indicating success or error, with the remaining_rows to retry when only some rows were deleted.
     """
 
     # Check authentication
@@ -35,50 +44,51 @@ def gdrive_delete_rows_from_sheet_tool(
     if auth_response:
         return auth_response
 
-    # Retrieve the Google Sheets service from global state
-    service = global_state.get("google_sheets_service")
+    # Retrieve the Google Sheets service from request state
+    service = request_state.get("google_sheets_service")
     if service is None:
-        logger.error("Google Sheets service is not available in global state.")
+        logger.error("Google Sheets service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
         }
 
+    if any(row_index < 1 for row_index in row_indices):
+        return {"status": "error", "error": "Row indices must be 1-based."}
+
     try:
-        # Get the sheet ID (numeric) from the spreadsheet
-        spreadsheet = service.spreadsheets().get(spreadsheetId=sheet_id).execute()
-        sheet_id_numeric = spreadsheet["sheets"][0]["properties"][
-            "sheetId"
-        ]  # First sheet
+        # Resolve the tab from the cached tab properties
+        properties = resolve_sheet(get_sheet_metadata(service, sheet_id), sheet)
 
-        # Prepare the requests for deleting rows
-        requests = []
-        for row_index in sorted(row_indices, reverse=True):  # Reverse to avoid shifting
-            requests.append(
-                {
-                    "deleteDimension": {
-                        "range": {
-                            "sheetId": sheet_id_numeric,
-                            "dimension": "ROWS",
-                            "startIndex": row_index - 1,
-                            "endIndex": row_index,
-                        }
-                    }
-                }
-            )
+        # Merge the rows into contiguous runs, deleted bottom-up to avoid shifting
+        result = delete_rows(service, sheet_id, properties["sheetId"], row_indices)
+        row_count = result["rows_deleted"]
 
-        # Execute the batch update request
-        body = {"requests": requests}
-        service.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body=body).execute()
+        if "error" in result:
+            # Rows above the deleted ones did not move, they can be retried as they are
+            logger.error(
+                f"Deleted {row_count} row(s) from sheet ID: {sheet_id} before failing: {result['error']}"
+            )
+            return {
+                "status": "partial" if row_count else "error",
+                "error": result["error"],
+                "message": f"{row_count} row(s) deleted from {properties['title']}, retry with remaining_rows to delete the others.",
+                "deleted_ranges": result["ranges_deleted"],
+                "remaining_rows": result["remaining_rows"],
+            }
 
         logger.info(
-            f"Successfully deleted rows {row_indices} from sheet ID: {sheet_id}."
+            f"Successfully deleted {row_count} row(s) in {result['ranges_deleted']} range(s) from sheet ID: {sheet_id}."
         )
         return {
             "status": "success",
-            "message": f"Rows {row_indices} deleted successfully.",
+            "message": f"{row_count} row(s) deleted successfully from {properties['title']}.",
+            "deleted_ranges": result["ranges_deleted"],
         }
 
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
     except Exception as e:
         logger.error(f"Failed to delete rows from sheet: {str(e)}")
         return {
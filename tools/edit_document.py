@@ -1,9 +1,9 @@
 from typing_extensions import Annotated
 from pydantic import Field
 from core.utils.logger import logger
-from core.utils.state import global_state
 from core.utils.env import EnvConfig
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from googleapiclient.errors import HttpError
 from core.utils.tools import doc_tag, doc_name
 
@@ -38,9 +38,9 @@ def gdrive_edit_document_tool(
     if auth_response:
         return auth_response
 
-    service = global_state.get("google_docs_service")
+    service = request_state.get("google_docs_service")
     if service is None:
-        logger.error("Google Docs service is not available in global state.")
+        logger.error("Google Docs service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Docs permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
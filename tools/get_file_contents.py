@@ -3,13 +3,23 @@ from typing_extensions import Annotated
 from pydantic import Field
 from PyPDF2 import PdfReader
 from core.utils.logger import logger
-from core.utils.state import global_state
 from core.utils.env import EnvConfig
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
+from core.utils.config import config
+from app.utils.sheets import (
+    get_sheet_metadata,
+    resolve_sheet,
+    iter_rows,
+    encode_sheet_cursor,
+)
 import csv
 import json
 
+# Rows returned for a spreadsheet, the rest is read with the sheet values tool
+SHEET_CONTENTS_MAX_ROWS = 10000
+
 
 @doc_tag("Drive")
 @doc_name("Get file contents")
@@ -29,9 +39,9 @@ def gdrive_get_file_contents_tool(
     Returns:
     - JSON string indicating success or error, along with the file contents.
     """
-    service = global_state.get("google_drive_service")
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
@@ -43,20 +53,10 @@ def gdrive_get_file_contents_tool(
 
         logger.info(f"File ID: {file_id}, MIME type: {mime_type}")
 
-        if mime_type == "application/vnd.google-apps.document":
-            return get_google_doc_contents(file_id)
-        elif mime_type == "application/vnd.google-apps.spreadsheet":
-            return get_google_sheet_contents(file_id)
-        elif mime_type == "application/pdf":
-            return download_pdf_and_extract_text(file_id)
-        elif mime_type == "text/plain":
-            return download_text_file(file_id)
-        elif mime_type == "text/csv":
-            return download_csv_file(file_id)
-        elif mime_type == "application/json":
-            return download_json_file(file_id)
-        else:
+        reader = CONTENT_READERS.get(mime_type)
+        if reader is None:
             return {"status": "error", "error": "Unsupported file type."}
+        return reader(file_id)
 
     except Exception as e:
         logger.error(f"Failed to retrieve file contents: {str(e)}")
@@ -64,9 +64,9 @@ def gdrive_get_file_contents_tool(
 
 
 def get_google_doc_contents(file_id: str) -> dict:
-    service = global_state.get("google_docs_service")
+    service = request_state.get("google_docs_service")
     if service is None:
-        logger.error("Google Docs service is not available in global state.")
+        logger.error("Google Docs service is not available in request state.")
         return {"status": "error", "error": "Google Docs service is not initialized."}
 
     try:
@@ -98,33 +98,33 @@ def get_google_sheet_contents(file_id: str) -> dict:
     if auth_response:
         return auth_response
 
-    service = global_state.get("google_sheets_service")
+    service = request_state.get("google_sheets_service")
     if service is None:
-        logger.error("Google Sheets service is not available in global state.")
+        logger.error("Google Sheets service is not available in request state.")
         return {"status": "error", "error": "Google Sheets service is not initialized."}
 
     try:
         logger.info(f"Attempting to retrieve sheet with ID: {file_id}")
-        sheet_metadata = service.spreadsheets().get(spreadsheetId=file_id).execute()
-        data = sheet_metadata.get("sheets", [])
-
-        if not data:
-            return {"status": "error", "error": "No sheets found in the spreadsheet."}
-
-        title = data[0].get("properties", {}).get("title", "Sheet")
-        values_response = (
-            service.spreadsheets()
-            .values()
-            .get(spreadsheetId=file_id, range=title)
-            .execute()
-        )
-        values = values_response.get("values", [])
-
-        if not values:
-            return {"status": "success", "content": {"title": title, "values": []}}
+        # Fresh grid size, rows may have been added since it was cached
+        properties = resolve_sheet(get_sheet_metadata(service, file_id, refresh=True))
+        title = properties.get("title", "Sheet")
+        max_rows = config.get("GOOGLE_SHEET_CONTENTS_MAX_ROWS", SHEET_CONTENTS_MAX_ROWS)
+
+        # Stream the first rows window by window instead of fetching the whole tab
+        values = []
+        for row_number, row in iter_rows(service, file_id, properties, 1, max_rows):
+            values.extend([] for _ in range(row_number - 1 - len(values)))
+            values.append(row)
+
+        content = {"title": title, "values": values}
+        if max_rows < properties.get("gridProperties", {}).get("rowCount", 0):
+            content["truncated"] = True
+            content["next_cursor"] = encode_sheet_cursor(
+                file_id, properties["sheetId"], None, max_rows + 1
+            )
 
         logger.info(f"Successfully retrieved contents for sheet ID: {file_id}.")
-        return {"status": "success", "content": {"title": title, "values": values}}
+        return {"status": "success", "content": content}
 
     except Exception as e:
         logger.error(f"Failed to retrieve sheet contents: {str(e)}")
@@ -132,9 +132,9 @@ def get_google_sheet_contents(file_id: str) -> dict:
 
 
 def download_pdf_and_extract_text(file_id: str) -> dict:
-    service = global_state.get("google_drive_service")
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {"status": "error", "error": "Google Drive service is not initialized."}
 
     try:
@@ -158,9 +158,9 @@ def download_pdf_and_extract_text(file_id: str) -> dict:
 
 
 def download_text_file(file_id: str) -> dict:
-    service = global_state.get("google_drive_service")
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {"status": "error", "error": "Google Drive service is not initialized."}
 
     try:
@@ -182,9 +182,9 @@ def download_text_file(file_id: str) -> dict:
 
 
 def download_json_file(file_id: str) -> dict:
-    service = global_state.get("google_drive_service")
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {"status": "error", "error": "Google Drive service is not initialized."}
 
     try:
@@ -201,9 +201,9 @@ def download_json_file(file_id: str) -> dict:
 
 
 def download_csv_file(file_id: str) -> dict:
-    service = global_state.get("google_drive_service")
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {"status": "error", "error": "Google Drive service is not initialized."}
 
     try:
@@ -222,3 +222,33 @@ def download_csv_file(file_id: str) -> dict:
     except Exception as e:
         logger.error(f"Failed to retrieve CSV file contents: {str(e)}")
         return {"status": "error", "error": str(e)}
+
+
+# Content readers by MIME type
+CONTENT_READERS = {
+    "application/vnd.google-apps.document": get_google_doc_contents,
+    "application/vnd.google-apps.spreadsheet": get_google_sheet_contents,
+    "application/pdf": download_pdf_and_extract_text,
+    "text/plain": download_text_file,
+    "text/csv": download_csv_file,
+    "application/json": download_json_file,
+}
+
+
+def extract_file_text(file_id: str, mime_type: str) -> str:
+    """Return the contents of a file as plain text, used to build the content index."""
+    reader = CONTENT_READERS.get(mime_type)
+    if reader is None:
+        raise ValueError(f"Unsupported file type: {mime_type}")
+    response = reader(file_id)
+    if response.get("status") != "success":
+        raise RuntimeError(response.get("error", "Failed to retrieve file contents."))
+
+    content = response["content"]
+    if mime_type == "application/vnd.google-apps.spreadsheet":
+        content = content["values"]
+    if mime_type == "application/json":
+        return json.dumps(content, ensure_ascii=False)
+    if isinstance(content, list):
+        return "\n".join("\t".join(str(cell) for cell in row) for row in content)
+    return content
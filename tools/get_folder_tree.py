@@ -0,0 +1,126 @@
+from typing import Optional
+from typing_extensions import Annotated
+from pydantic import Field
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.tools.get_items import get_file_extension
+from app.utils.drive import walk_folder_tree, FOLDER_MIME_TYPE
+
+
+@doc_tag("Drive")
+@doc_name("Get folder tree")
+def gdrive_get_folder_tree_tool(
+    folder_id: Annotated[
+        Optional[str],
+        Field(
+            default=None,
+            description="The ID of the folder to start from. If not provided, starts from the root directory.",
+        ),
+    ] = None,
+    max_depth: Annotated[
+        Optional[int],
+        Field(
+            default=5,
+            description="Maximum number of folder levels to descend, 1 lists only the direct children.",
+        ),
+    ] = 5,
+    max_nodes: Annotated[
+        Optional[int],
+        Field(
+            default=1000,
+            description="Maximum number of items to return.",
+        ),
+    ] = 1000,
+    folders_only: Annotated[
+        Optional[bool],
+        Field(
+            default=False,
+            description="Return only folders, leaving out files.",
+        ),
+    ] = False,
+) -> dict:
+    """
+    Returns the tree of folders and files below a Google Drive folder, or the root directory if no folder_id is provided.
+
+    * Requires permission scope for the drive.
+
+    Args:
+    - folder_id (Optional[str]): The ID of the folder to start from.
+    - max_depth (Optional[int]): Maximum number of folder levels to descend.
+    - max_nodes (Optional[int]): Maximum number of items to return.
+    - folders_only (Optional[bool]): Return only folders.
+
+    Returns:
+    - dict: Contains the nested items, the number of items and whether the tree was truncated by max_nodes on success or error message on failure.
+    """
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    if max_depth is not None and max_depth < 1:
+        return {"status": "error", "error": "max_depth must be a positive number."}
+    if max_nodes is not None and max_nodes < 1:
+        return {"status": "error", "error": "max_nodes must be a positive number."}
+
+    service = request_state.get("google_drive_service")
+    if service is None:
+        logger.error("Google Drive service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        root_id = folder_id or "root"
+        items, truncated = walk_folder_tree(
+            service,
+            root_id,
+            max_depth=max_depth,
+            max_nodes=max_nodes,
+            folders_only=folders_only,
+        )
+        logger.info(
+            f"Retrieved a tree of {len(items)} items below folder ID: {root_id}."
+        )
+
+        # Items arrive level by level, so parents are always known before their children
+        nodes = {root_id: {"children": []}}
+        for item in items:
+            node = {
+                "name": item["name"],
+                "id": item["id"],
+                "extension": get_file_extension(item["mimeType"]),
+                "type": "folder" if item["mimeType"] == FOLDER_MIME_TYPE else "file",
+            }
+            if node["type"] == "folder":
+                node["children"] = []
+                nodes[item["id"]] = node
+            nodes[item["parent_id"]]["children"].append(node)
+
+        return {
+            "status": "success",
+            "data": nodes[root_id]["children"],
+            "count": len(items),
+            "truncated": truncated,
+        }
+
+    except HttpError as e:
+        logger.error(f"Google API error: {e}")
+        return {
+            "status": "error",
+            "google_error": {
+                "code": e.resp.status,
+                "message": e._get_reason(),
+            },
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to retrieve folder tree: {str(e)}")
+        return {
+            "status": "error",
+            "error": f"Failed to retrieve folder tree: {str(e)}",
+        }
@@ -1,13 +1,77 @@
+from typing_extensions import Annotated
+from pydantic import Field
 from core.utils.logger import logger
-from core.utils.state import global_state
+from core.utils.config import config
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
 from core.utils.env import EnvConfig
+from app.utils.drive import count_files, walk_folder_tree, FOLDER_MIME_TYPE
+from app.utils.drive_index import lease_drive_index
+
+# Items visited by a recursive count through the API, can be overridden from app config
+RECURSIVE_COUNT_MAX_ITEMS = 100000
+
+
+def count_folder(service, folder_id, recursive=False):
+    """Count the items below a folder, from the local Drive index when it is available.
+
+    The index follows the Drive changes feed, so its counts are always those
+    of the latest sync. Otherwise direct children are counted by paging
+    through their ids and recursive counts walk the tree concurrently.
+    """
+    with lease_drive_index(service) as index:
+        if index is not None and index.get(folder_id) is not None:
+            files, folders, total_size = index.count_children(folder_id)
+            counts = {"file_count": files + folders}
+            if recursive:
+                files, folders, total_size = index.count_children(folder_id, True)
+                counts["recursive_counts"] = {
+                    "file_count": files,
+                    "folder_count": folders,
+                    "total_size": total_size,
+                    "truncated": False,
+                }
+            return counts
+
+    counts = {
+        "file_count": count_files(
+            service, f"'{folder_id}' in parents and trashed = false"
+        )
+    }
+    if recursive:
+        items, truncated = walk_folder_tree(
+            service,
+            folder_id,
+            max_nodes=config.get(
+                "GOOGLE_DRIVE_RECURSIVE_COUNT_MAX_ITEMS", RECURSIVE_COUNT_MAX_ITEMS
+            ),
+            fields=["id", "mimeType", "size"],
+        )
+        folders = sum(1 for item in items if item["mimeType"] == FOLDER_MIME_TYPE)
+        counts["recursive_counts"] = {
+            "file_count": len(items) - folders,
+            "folder_count": folders,
+            "total_size": sum(int(item.get("size", 0)) for item in items),
+            "truncated": truncated,
+        }
+    return counts
 
 
 @doc_tag("Drive")
 @doc_name("Get item details")
-def gdrive_get_item_details_tool(item_id: str) -> dict:
+def gdrive_get_item_details_tool(
+    item_id: Annotated[
+        str,
+        Field(description="The ID of the file or folder to retrieve information from."),
+    ],
+    recursive: Annotated[
+        bool,
+        Field(
+            description="For folders, also count the files and folders at every level below and their total size."
+        ),
+    ] = False,
+) -> dict:
     """
     Retrieves information about a file or folder in Google Drive based on its ID.
 
@@ -15,6 +79,7 @@ def gdrive_get_item_details_tool(item_id: str) -> dict:
 
     Args:
     - item_id (str): The ID of the file or folder to retrieve information from.
+    - recursive (bool): For folders, also count the files and folders at every level below and their total size.
 
     Returns:
     - dict indicating success or error, along with the file/folder information.
@@ -25,10 +90,10 @@ def gdrive_get_item_details_tool(item_id: str) -> dict:
     if auth_response:
         return auth_response
 
-    # Retrieve the Google Drive service from global state
-    service = global_state.get("google_drive_service")
+    # Retrieve the Google Drive service from request state
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Drive permission scope not available. Please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
@@ -45,25 +110,19 @@ def gdrive_get_item_details_tool(item_id: str) -> dict:
         )
 
         # Determine if it's a file or folder
-        is_folder = (
-            file_metadata.get("mimeType") == "application/vnd.google-apps.folder"
-        )
-
-        # Initialize file count
-        file_count = 0
+        is_folder = file_metadata.get("mimeType") == FOLDER_MIME_TYPE
 
-        # If it's a folder, count the files inside it
+        # If it's a folder, count the items inside it
+        counts = {"file_count": 0}
         if is_folder:
-            query = f"'{item_id}' in parents"
-            results = service.files().list(q=query, fields="files(id)").execute()
-            file_count = len(results.get("files", []))
+            counts = count_folder(service, file_metadata["id"], recursive)
 
         logger.info(f"Successfully retrieved information for ID: {item_id}.")
         return {
             "status": "success",
             "file_info": file_metadata,
             "is_folder": is_folder,
-            "file_count": file_count,
+            **counts,
         }
 
     except Exception as e:
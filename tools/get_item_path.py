@@ -0,0 +1,84 @@
+from typing_extensions import Annotated
+from pydantic import Field
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.drive_index import lease_drive_index
+
+# Guards against cycles in the parents chain
+MAX_PATH_DEPTH = 100
+
+
+def get_path_from_drive(service, item_id):
+    """Walk up the parents of an item with the Drive API, from the root down to the item."""
+    root_id = service.files().get(fileId="root", fields="id").execute()["id"]
+    path = []
+    while item_id and item_id != root_id and len(path) < MAX_PATH_DEPTH:
+        item = service.files().get(fileId=item_id, fields="id, name, parents").execute()
+        path.append(item)
+        item_id = item["parents"][0] if item.get("parents") else None
+    return path[::-1]
+
+
+@doc_tag("Drive")
+@doc_name("Get item path")
+def gdrive_get_item_path_tool(
+    item_id: Annotated[
+        str, Field(description="The ID of the file or folder to get the path of.")
+    ],
+) -> dict:
+    """
+    Returns the folder path of a file or folder in Google Drive, starting from the root directory.
+
+    * Requires permission scope for the drive.
+
+    Args:
+    - item_id (str): The ID of the file or folder to get the path of.
+
+    Returns:
+    - dict: Contains the path as text and the list of folders leading to the item on success or error message on failure.
+    """
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    service = request_state.get("google_drive_service")
+    if service is None:
+        logger.error("Google Drive service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        with lease_drive_index(service) as index:
+            path = index.get_path(item_id) if index is not None else None
+        if path is None:
+            path = get_path_from_drive(service, item_id)
+
+        logger.info(f"Retrieved path of item ID: {item_id}.")
+        return {
+            "status": "success",
+            "path": "/" + "/".join(item["name"] for item in path),
+            "items": [{"id": item["id"], "name": item["name"]} for item in path],
+        }
+
+    except HttpError as e:
+        logger.error(f"Google API error: {e}")
+        return {
+            "status": "error",
+            "google_error": {
+                "code": e.resp.status,
+                "message": e._get_reason(),
+            },
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to retrieve item path: {str(e)}")
+        return {
+            "status": "error",
+            "error": f"Failed to retrieve item path: {str(e)}",
+        }
@@ -1,12 +1,19 @@
-from typing import Optional
+from typing import Optional, List
 from typing_extensions import Annotated
 from pydantic import Field
 from googleapiclient.errors import HttpError
 from core.utils.logger import logger
-from core.utils.state import global_state
 from core.utils.env import EnvConfig
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
+from app.utils.drive_index import lease_drive_index, INDEX_FILE_FIELDS
+from app.utils.drive import (
+    list_files,
+    DEFAULT_FILE_FIELDS,
+    EXTRA_FILE_FIELDS,
+    FOLDER_MIME_TYPE,
+)
 
 
 def get_file_extension(mime_type: str) -> str:
@@ -35,6 +42,34 @@ def gdrive_get_items_tool(
             description="The ID of the folder to list items from. If not provided, lists items of the root directory.",
         ),
     ] = None,
+    limit: Annotated[
+        Optional[int],
+        Field(
+            default=1000,
+            description="Maximum number of items to return, use the returned next_cursor to get the following items.",
+        ),
+    ] = 1000,
+    cursor: Annotated[
+        Optional[str],
+        Field(
+            default=None,
+            description="The next_cursor value returned by a previous call to continue the listing.",
+        ),
+    ] = None,
+    order_by: Annotated[
+        Optional[str],
+        Field(
+            default=None,
+            description="Sort order, for example 'folder,name' or 'modifiedTime desc'.",
+        ),
+    ] = None,
+    extra_fields: Annotated[
+        Optional[List[str]],
+        Field(
+            default=None,
+            description=f"Additional fields to return for each item, any of: {', '.join(EXTRA_FILE_FIELDS)}.",
+        ),
+    ] = None,
 ) -> dict:
     """
     Lists all items in a specified Google Drive folder or the root directory if no folder_id is provided.
@@ -43,47 +78,75 @@ def gdrive_get_items_tool(
 
     Args:
     - folder_id (Optional[str]): The ID of the folder to list files and folders from.
+    - limit (Optional[int]): Maximum number of items to return.
+    - cursor (Optional[str]): The next_cursor of a previous call to continue the listing.
+    - order_by (Optional[str]): Sort order, for example 'folder,name' or 'modifiedTime desc'.
+    - extra_fields (Optional[List[str]]): Additional fields to return for each item.
 
     Returns:
-    - dict: Contains file/folder data on success or error message on failure.
+    - dict: Contains file/folder data and the next_cursor (None when there are no more items) on success or error message on failure.
     """
     auth_response = check_access(True)
     if auth_response:
         return auth_response
 
-    service = global_state.get("google_drive_service")
+    if limit is not None and limit < 1:
+        return {"status": "error", "error": "The limit must be a positive number."}
+
+    extra_fields = extra_fields or []
+    unknown_fields = [field for field in extra_fields if field not in EXTRA_FILE_FIELDS]
+    if unknown_fields:
+        return {
+            "status": "error",
+            "error": f"Unsupported extra fields: {', '.join(unknown_fields)}. Supported fields are: {', '.join(EXTRA_FILE_FIELDS)}.",
+        }
+
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
         }
 
     try:
-        query = f"'{folder_id}' in parents" if folder_id else "'root' in parents"
-        results = (
-            service.files()
-            .list(q=query, pageSize=100, fields="files(id, name, mimeType)")
-            .execute()
-        )
-        items = results.get("files", [])
+        items = None
+        next_cursor = None
+
+        # First pages without custom sorting can come from the local Drive index
+        if not cursor and not order_by and set(extra_fields) <= set(INDEX_FILE_FIELDS):
+            with lease_drive_index(service) as index:
+                if index is not None and (not folder_id or index.get(folder_id)):
+                    items = index.list_children(
+                        folder_id or "root", None if limit is None else limit + 1
+                    )
+                    if limit is not None and len(items) > limit:
+                        items = None  # More than one page, let Drive issue the cursor
+
+        if items is None:
+            query = f"'{folder_id or 'root'}' in parents and trashed = false"
+            items, next_cursor = list_files(
+                service,
+                query,
+                fields=DEFAULT_FILE_FIELDS + extra_fields,
+                limit=limit,
+                cursor=cursor,
+                order_by=order_by,
+            )
         logger.info(
             f"Retrieved {len(items)} items from folder ID: {folder_id or 'root'}."
         )
 
         if not items:
-            return {"status": "success", "data": []}
+            return {"status": "success", "data": [], "next_cursor": next_cursor}
 
         item_list = [
             {
                 "name": item["name"],
                 "id": item["id"],
                 "extension": get_file_extension(item["mimeType"]),
-                "type": (
-                    "folder"
-                    if item["mimeType"] == "application/vnd.google-apps.folder"
-                    else "file"
-                ),
+                "type": ("folder" if item["mimeType"] == FOLDER_MIME_TYPE else "file"),
+                **{field: item.get(field) for field in extra_fields},
             }
             for item in items
         ]
@@ -91,8 +154,12 @@ def gdrive_get_items_tool(
         return {
             "status": "success",
             "data": item_list,
+            "next_cursor": next_cursor,
         }
 
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
     except HttpError as e:
         logger.error(f"Google API error: {e}")
         return {
@@ -0,0 +1,77 @@
+from typing import List, Optional, Union
+from typing_extensions import Annotated
+from pydantic import Field
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.sheets import read_ranges
+
+
+@doc_tag("Spreadsheets")
+@doc_name("Get sheet ranges")
+def gdrive_get_sheet_ranges_tool(
+    sheet_id: Annotated[str, Field(description="The ID of the spreadsheet to read.")],
+    sheets: Annotated[
+        Optional[List[Union[str, int]]],
+        Field(description="The names or numeric IDs of the tabs to read entirely."),
+    ] = None,
+    ranges: Annotated[
+        Optional[List[str]],
+        Field(description="The ranges of cells to read (e.g., 'Sheet1!A1:B20')."),
+    ] = None,
+) -> dict:
+    """
+    Reads several tabs and ranges of a Google Sheets document at once, every tab when none are given.
+
+    * Requires permission scope for spreadsheets.
+
+    Args:
+    - sheet_id (str): The ID of the spreadsheet to read.
+    - sheets (list): The names or numeric IDs of the tabs to read entirely.
+    - ranges (list): The ranges of cells to read (e.g., 'Sheet1!A1:B20').
+
+    Returns:
+    - dict: Contains the values of every tab and range, in the requested order, on success or error message on failure.
+    """
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    service = request_state.get("google_sheets_service")
+    if service is None:
+        logger.error("Google Sheets service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        value_ranges = read_ranges(service, sheet_id, sheets, ranges)
+
+        logger.info(
+            f"Retrieved {len(value_ranges)} range(s) from sheet ID: {sheet_id}."
+        )
+        return {"status": "success", "ranges": value_ranges}
+
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
+    except HttpError as e:
+        logger.error(f"Google API error: {e}")
+        return {
+            "status": "error",
+            "google_error": {
+                "code": e.resp.status,
+                "message": e._get_reason(),
+            },
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to read sheet ranges: {str(e)}")
+        return {
+            "status": "error",
+            "error": f"Failed to read sheet ranges: {str(e)}",
+        }
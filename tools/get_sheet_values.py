@@ -0,0 +1,106 @@
+from typing import Optional, Union
+from typing_extensions import Annotated
+from pydantic import Field
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.sheets import read_rows, decode_sheet_cursor
+
+
+@doc_tag("Spreadsheets")
+@doc_name("Get sheet values")
+def gdrive_get_sheet_values_tool(
+    sheet_id: Annotated[str, Field(description="The ID of the spreadsheet to read.")],
+    sheet: Annotated[
+        Optional[Union[str, int]],
+        Field(
+            description="The name or numeric ID of the tab to read, the first tab by default."
+        ),
+    ] = None,
+    start_row: Annotated[
+        int, Field(description="The first row to read (1-based).", ge=1)
+    ] = 1,
+    row_count: Annotated[
+        int, Field(description="The number of rows to read.", ge=1, le=10000)
+    ] = 1000,
+    columns: Annotated[
+        Optional[str],
+        Field(description="The columns to read (e.g., 'B:D'), all columns by default."),
+    ] = None,
+    cursor: Annotated[
+        Optional[str],
+        Field(
+            description="The next_cursor of a previous call, to continue reading where it stopped."
+        ),
+    ] = None,
+) -> dict:
+    """
+    Reads a window of rows from a Google Sheets document, page by page with a cursor.
+
+    * Requires permission scope for spreadsheets.
+
+    Args:
+    - sheet_id (str): The ID of the spreadsheet to read.
+    - sheet (str | int): The name or numeric ID of the tab to read, the first tab by default.
+    - start_row (int): The first row to read (1-based).
+    - row_count (int): The number of rows to read.
+    - columns (str): The columns to read (e.g., 'B:D'), all columns by default.
+    - cursor (str): The next_cursor of a previous call, to continue reading where it stopped.
+
+    Returns:
+    - dict: Contains the non empty rows with their row number and the cursor of the next rows on success or error message on failure.
+    """
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    service = request_state.get("google_sheets_service")
+    if service is None:
+        logger.error("Google Sheets service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        if cursor:
+            sheet, columns, start_row = decode_sheet_cursor(cursor, sheet_id)
+
+        properties, rows, next_cursor = read_rows(
+            service, sheet_id, sheet, start_row, row_count, columns
+        )
+
+        logger.info(
+            f"Retrieved {len(rows)} row(s) from sheet ID: {sheet_id}, tab: {properties['title']}."
+        )
+        return {
+            "status": "success",
+            "sheet": properties["title"],
+            "sheet_id": properties["sheetId"],
+            "row_count": properties.get("gridProperties", {}).get("rowCount", 0),
+            "rows": rows,
+            "next_cursor": next_cursor,
+        }
+
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
+    except HttpError as e:
+        logger.error(f"Google API error: {e}")
+        return {
+            "status": "error",
+            "google_error": {
+                "code": e.resp.status,
+                "message": e._get_reason(),
+            },
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to read sheet values: {str(e)}")
+        return {
+            "status": "error",
+            "error": f"Failed to read sheet values: {str(e)}",
+        }
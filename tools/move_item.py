@@ -1,6 +1,6 @@
 from core.utils.logger import logger  # Importing the logger
-from core.utils.state import global_state  # Import global state
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
 
 # Define the validity duration for the confirmation token (in seconds)
@@ -28,10 +28,10 @@ def gdrive_move_item_tool(item_id: str, new_parent_id: str) -> dict:
     if auth_response:
         return auth_response  # Already a dict
 
-    # Retrieve the Google Drive service from global state
-    service = global_state.get("google_drive_service")
+    # Retrieve the Google Drive service from request state
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
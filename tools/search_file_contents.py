@@ -0,0 +1,88 @@
+from typing_extensions import Annotated
+from pydantic import Field
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.content_index import lease_content_index
+from app.tools.get_file_contents import extract_file_text
+
+
+@doc_tag("Drive")
+@doc_name("Search file contents")
+def gdrive_search_file_contents_tool(
+    query: Annotated[
+        str, Field(description="The words to search for inside the files.")
+    ],
+    limit: Annotated[
+        int, Field(description="The maximum number of files to return.", ge=1, le=100)
+    ] = 20,
+) -> dict:
+    """
+    Searches inside the contents of Google Docs, Google Sheets, PDF, text, CSV and JSON files in Google Drive, best matches first.
+
+    * Requires permission scope for the drive.
+
+    Args:
+    - query (str): The words to search for inside the files.
+    - limit (int): The maximum number of files to return.
+
+    Returns:
+    - dict: Contains the matching files with a snippet of the matching text when available or error message on failure.
+    """
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    service = request_state.get("google_drive_service")
+    if service is None:
+        logger.error("Google Drive service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        # Answer from the local content index once every file is indexed
+        files = None
+        with lease_content_index(service, extract_file_text) as index:
+            stats = index.stats() if index is not None else None
+            if stats and stats["indexed"] and not stats["pending"]:
+                files = index.search(query, limit)
+        if files is not None:
+            logger.info(f"Found {len(files)} indexed file(s) containing: {query}.")
+            return {"status": "success", "files": files, "index": stats}
+
+        escaped = query.replace("\\", "\\\\").replace("'", "\\'")
+        results = (
+            service.files()
+            .list(
+                q=f"fullText contains '{escaped}' and trashed = false",
+                pageSize=limit,
+                fields="files(id, name, mimeType, modifiedTime)",
+            )
+            .execute()
+        )
+        files = results.get("files", [])
+
+        logger.info(f"Found {len(files)} file(s) containing: {query}.")
+        return {"status": "success", "files": files}
+
+    except HttpError as e:
+        logger.error(f"Google API error: {e}")
+        return {
+            "status": "error",
+            "google_error": {
+                "code": e.resp.status,
+                "message": e._get_reason(),
+            },
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to search file contents: {str(e)}")
+        return {
+            "status": "error",
+            "error": f"Failed to search file contents: {str(e)}",
+        }
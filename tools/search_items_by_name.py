@@ -1,10 +1,12 @@
 from typing_extensions import Annotated
 from pydantic import Field
 from core.utils.logger import logger
-from core.utils.state import global_state
 from core.utils.env import EnvConfig
 from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
 from core.utils.tools import doc_tag, doc_name
+from core.utils.config import config
+from app.utils.drive_index import lease_drive_index, DRIVE_INDEX_SEARCH_LIMIT
 
 
 @doc_tag("Drive")
@@ -29,18 +31,35 @@ def gdrive_search_items_by_name_tool(
     if auth_response:
         return auth_response
 
-    # Retrieve the Google Drive service from global state
-    service = global_state.get("google_drive_service")
+    # Retrieve the Google Drive service from request state
+    service = request_state.get("google_drive_service")
     if service is None:
-        logger.error("Google Drive service is not available in global state.")
+        logger.error("Google Drive service is not available in request state.")
         return {
             "status": "error",
             "error": f"Google Drive permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
         }
 
     try:
+        # Answer from the local Drive index when it is available and fresh
+        with lease_drive_index(service) as index:
+            items = None
+            if index is not None:
+                items = [
+                    {key: item[key] for key in ("id", "name", "mimeType", "parents")}
+                    for item in index.search_by_name(
+                        name,
+                        config.get(
+                            "GOOGLE_DRIVE_INDEX_SEARCH_LIMIT", DRIVE_INDEX_SEARCH_LIMIT
+                        ),
+                    )
+                ]
+        if items is not None:
+            logger.info(f"Found {len(items)} indexed item(s) with name: {name}.")
+            return {"status": "success", "files": items}
+
         # Construct the query to search for files and folders by name
-        query = f"name contains '{name}'"
+        query = f"name contains '{name}' and trashed = false"
 
         # Execute the search
         results = (
@@ -0,0 +1,115 @@
+from typing import List, Literal, Optional, Union
+from typing_extensions import Annotated
+from pydantic import Field
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.sheets import get_sheet_metadata, resolve_sheet, sync_table
+
+
+@doc_tag("Spreadsheets")
+@doc_name("Sync spreadsheet")
+def gdrive_sync_sheet_tool(
+    sheet_id: Annotated[str, Field(description="The ID of the sheet to update.")],
+    values: Annotated[
+        List[List[Union[str, int, float, bool, None]]],
+        Field(
+            description="The whole table as it should be, null leaves a cell unchanged."
+        ),
+    ],
+    sheet: Annotated[
+        Optional[Union[str, int]],
+        Field(
+            description="The name or numeric ID of the tab to update, the first tab by default."
+        ),
+    ] = None,
+    start_cell: Annotated[
+        str, Field(description="The top left cell of the table (e.g., 'A1').")
+    ] = "A1",
+    value_input_option: Annotated[
+        Literal["RAW", "USER_ENTERED"],
+        Field(
+            description="RAW stores values as they are, USER_ENTERED parses them like typed input (formulas, dates, numbers)."
+        ),
+    ] = "RAW",
+    extra_rows: Annotated[
+        Literal["delete", "clear", "keep"],
+        Field(
+            description="What to do with rows of the sheet below the end of the new table: delete them, clear their cells or keep them."
+        ),
+    ] = "delete",
+) -> dict:
+    """
+    Updates a table in a Google Sheets document to match the given rows, writing only the cells that changed.
+
+    * Requires permission scope for spreadsheets.
+
+    Args:
+    - sheet_id (str): The ID of the sheet to update.
+    - values (list): The whole table as it should be, null leaves a cell unchanged.
+    - sheet (str | int): The name or numeric ID of the tab to update, the first tab by default.
+    - start_cell (str): The top left cell of the table (e.g., 'A1').
+    - value_input_option (str): RAW stores values as they are, USER_ENTERED parses them like typed input.
+    - extra_rows (str): What to do with rows below the end of the new table: delete, clear or keep.
+
+    Returns:
+    - Dictionary with the number of cells written, rows appended and rows deleted or cleared, or error message on failure.
+    """
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    service = request_state.get("google_sheets_service")
+    if service is None:
+        logger.error("Google Sheets service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        # Fresh grid size, rows past a cached one would never be compared
+        properties = resolve_sheet(
+            get_sheet_metadata(service, sheet_id, refresh=True), sheet
+        )
+        result = sync_table(
+            service,
+            sheet_id,
+            properties,
+            values,
+            start_cell,
+            value_input_option,
+            extra_rows,
+        )
+
+        if "error" in result:
+            logger.error(f"Failed to sync sheet ID: {sheet_id}: {result['error']}")
+            return {"status": "error", **result}
+
+        logger.info(
+            f"Synced sheet ID: {sheet_id}, wrote {result['cells_written']} cell(s), appended {result['rows_appended']} row(s)."
+        )
+        return {"status": "success", **result}
+
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
+    except HttpError as e:
+        logger.error(f"Google API error: {e}")
+        return {
+            "status": "error",
+            "google_error": {
+                "code": e.resp.status,
+                "message": e._get_reason(),
+            },
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to sync sheet: {str(e)}")
+        return {
+            "status": "error",
+            "error": f"Failed to sync sheet: {str(e)}",
+        }
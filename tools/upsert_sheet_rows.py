@@ -0,0 +1,121 @@
+from typing import List, Literal, Optional, Union
+from typing_extensions import Annotated
+from pydantic import Field
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.env import EnvConfig
+from app.middleware.google.GoogleAuthMiddleware import check_access
+from app.middleware.google.request_state import request_state
+from core.utils.tools import doc_tag, doc_name
+from app.utils.sheets import get_sheet_metadata, resolve_sheet, upsert_rows
+
+
+@doc_tag("Spreadsheets")
+@doc_name("Upsert rows of spreadsheet")
+def gdrive_upsert_sheet_rows_tool(
+    sheet_id: Annotated[str, Field(description="The ID of the sheet to update.")],
+    rows: Annotated[
+        List[List[Union[str, int, float, bool, None]]],
+        Field(
+            description="The rows to update or add, starting at column A, each with its key in the key column.",
+            min_length=1,
+        ),
+    ],
+    key_column: Annotated[
+        str, Field(description="The column holding the key of each row (e.g., 'A').")
+    ] = "A",
+    sheet: Annotated[
+        Optional[Union[str, int]],
+        Field(
+            description="The name or numeric ID of the tab to update, the first tab by default."
+        ),
+    ] = None,
+    header_rows: Annotated[
+        int, Field(description="The number of header rows above the data.", ge=0)
+    ] = 1,
+    value_input_option: Annotated[
+        Literal["RAW", "USER_ENTERED"],
+        Field(
+            description="RAW stores values as they are, USER_ENTERED parses them like typed input (formulas, dates, numbers)."
+        ),
+    ] = "RAW",
+) -> dict:
+    """
+    Updates the rows of a Google Sheets document whose key is already present and adds the others at the end.
+
+    * Requires permission scope for spreadsheets.
+
+    Args:
+    - sheet_id (str): The ID of the sheet to update.
+    - rows (list): The rows to update or add, starting at column A, each with its key in the key column.
+    - key_column (str): The column holding the key of each row (e.g., 'A').
+    - sheet (str | int): The name or numeric ID of the tab to update, the first tab by default.
+    - header_rows (int): The number of header rows above the data.
+    - value_input_option (str): RAW stores values as they are, USER_ENTERED parses them like typed input.
+
+    Returns:
+    - Dictionary with the number of rows updated and added, or error message on failure.
+    """
+    auth_response = check_access(True)
+    if auth_response:
+        return auth_response
+
+    service = request_state.get("google_sheets_service")
+    if service is None:
+        logger.error("Google Sheets service is not available in request state.")
+        return {
+            "status": "error",
+            "error": f"Google Sheets permission scope not available, please add this scope here: {EnvConfig.get('APP_HOST')}/auth/login",
+        }
+
+    try:
+        properties = resolve_sheet(get_sheet_metadata(service, sheet_id), sheet)
+        # The Drive file version tells when the cached key index is still current
+        result = upsert_rows(
+            service,
+            request_state.get("google_drive_service"),
+            sheet_id,
+            properties,
+            rows,
+            key_column,
+            header_rows,
+            value_input_option,
+        )
+
+        if "error" in result:
+            logger.error(
+                f"Failed to upsert rows in sheet ID: {sheet_id}: {result['error']}"
+            )
+            return {
+                "status": (
+                    "partial"
+                    if result["rows_updated"] or result["rows_appended"]
+                    else "error"
+                ),
+                **result,
+            }
+
+        logger.info(
+            f"Upserted rows in sheet ID: {sheet_id}, updated {result['rows_updated']} and added {result['rows_appended']}."
+        )
+        return {"status": "success", **result}
+
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
+    except HttpError as e:
+        logger.error(f"Google API error: {e}")
+        return {
+            "status": "error",
+            "google_error": {
+                "code": e.resp.status,
+                "message": e._get_reason(),
+            },
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to upsert rows: {str(e)}")
+        return {
+            "status": "error",
+            "error": f"Failed to upsert rows: {str(e)}",
+        }
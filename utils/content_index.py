@@ -0,0 +1,285 @@
+import re
+import time
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from core.utils.logger import logger
+from core.utils.config import config
+from app.utils.drive_index import lease_drive_index, get_index_manager
+
+# Content index defaults, can be overridden from app config
+CONTENT_INDEX_BATCH_SIZE = 50  # Files extracted per transaction
+CONTENT_INDEX_MAX_CHARS = 1_000_000  # Text kept per file
+CONTENT_INDEX_WORKERS = 2  # Threads extracting file contents in the background
+
+# File types whose text can be extracted, see tools/get_file_contents.py
+INDEXABLE_MIME_TYPES = [
+    "application/vnd.google-apps.document",
+    "application/vnd.google-apps.spreadsheet",
+    "application/pdf",
+    "text/plain",
+    "text/csv",
+    "application/json",
+]
+
+_fts5_available = None
+
+
+def fts5_available():
+    """Tell whether the sqlite library Python was built with supports FTS5."""
+    global _fts5_available
+    if _fts5_available is None:
+        try:
+            conn = sqlite3.connect(":memory:")
+            conn.execute("CREATE VIRTUAL TABLE probe USING fts5(body)")
+            conn.close()
+            _fts5_available = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite FTS5 is not available, content search is disabled")
+            _fts5_available = False
+    return _fts5_available
+
+
+def match_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching documents containing every word."""
+    terms = re.findall(r"\w+", text)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+class ContentIndex:
+    """Full-text index of extracted file contents, stored in a user's Drive index.
+
+    Every file is indexed at the revision (modifiedTime) recorded in the
+    metadata index, files are extracted again only after they change.
+    """
+
+    def __init__(self, drive_index):
+        self.drive_index = drive_index
+        self._conn = drive_index._conn
+        self._lock = drive_index._lock
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS content_versions (
+                    id INTEGER PRIMARY KEY,
+                    file_id TEXT NOT NULL UNIQUE,
+                    version TEXT,
+                    indexed_at REAL NOT NULL,
+                    error TEXT
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+                    name, body, tokenize = 'unicode61 remove_diacritics 2'
+                );
+                """
+            )
+
+    def _mime_filter(self):
+        return ", ".join(f"'{mime_type}'" for mime_type in INDEXABLE_MIME_TYPES)
+
+    def _pending_sql(self, columns):
+        return f"""
+            SELECT {columns}
+            FROM files f LEFT JOIN content_versions v ON v.file_id = f.id
+            WHERE f.mime_type IN ({self._mime_filter()})
+                AND (v.file_id IS NULL OR v.version IS NOT f.modified_time)
+        """
+
+    def pending(self, limit=None):
+        """Return indexable files that are new or changed since they were indexed."""
+        sql = self._pending_sql("f.id, f.name, f.mime_type, f.modified_time")
+        sql += " ORDER BY f.modified_time DESC"
+        params = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def stats(self):
+        with self._lock:
+            indexed = self._conn.execute(
+                "SELECT count(*) FROM content_versions WHERE error IS NULL"
+            ).fetchone()[0]
+            pending = self._conn.execute(self._pending_sql("count(*)")).fetchone()[0]
+        return {"indexed": indexed, "pending": pending}
+
+    def purge(self):
+        """Drop the contents of files that are no longer in the metadata index."""
+        with self._lock, self._conn:
+            stale = self._conn.execute(
+                "SELECT id FROM content_versions WHERE file_id NOT IN (SELECT id FROM files)"
+            ).fetchall()
+            self._conn.executemany("DELETE FROM content_fts WHERE rowid = ?", stale)
+            self._conn.executemany("DELETE FROM content_versions WHERE id = ?", stale)
+        return len(stale)
+
+    def store(self, file, text=None, error=None):
+        """Save the text of a file at its current revision, replacing older revisions."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO content_versions (file_id, version, indexed_at, error)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (file_id) DO UPDATE SET
+                    version = excluded.version,
+                    indexed_at = excluded.indexed_at,
+                    error = excluded.error
+                """,
+                (file["id"], file["modified_time"], time.time(), error),
+            )
+            rowid = self._conn.execute(
+                "SELECT id FROM content_versions WHERE file_id = ?", (file["id"],)
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM content_fts WHERE rowid = ?", (rowid,))
+            if text:
+                self._conn.execute(
+                    "INSERT INTO content_fts (rowid, name, body) VALUES (?, ?, ?)",
+                    (rowid, file["name"], text),
+                )
+
+    def update(self, extract_text, batch_size=None, max_chars=None):
+        """Extract and index up to batch_size new or changed files, returns how many were processed.
+
+        extract_text(file_id, mime_type) returns the text of a file. Files
+        that fail are recorded at their revision and retried once they change.
+        """
+        batch_size = batch_size or CONTENT_INDEX_BATCH_SIZE
+        max_chars = max_chars or CONTENT_INDEX_MAX_CHARS
+        if not self.drive_index.is_seeded():
+            return 0  # The files table is being rebuilt
+        self.purge()
+        files = self.pending(batch_size)
+        for file in files:
+            try:
+                text = extract_text(file["id"], file["mime_type"]) or ""
+                self.store(file, text[:max_chars])
+            except Exception as e:
+                logger.warning(f"Failed to index contents of file {file['id']}: {e}")
+                self.store(file, error=str(e))
+        return len(files)
+
+    def search(self, text, limit=20):
+        """Return indexed files matching every word of text, best matches first."""
+        query = match_query(text)
+        if not query:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT v.file_id, f.name, f.mime_type, f.modified_time,
+                    snippet(content_fts, 1, '[', ']', '...', 16) AS snippet,
+                    bm25(content_fts, 5.0, 1.0) AS rank
+                FROM content_fts
+                JOIN content_versions v ON v.id = content_fts.rowid
+                JOIN files f ON f.id = v.file_id
+                WHERE content_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (query, limit),
+            ).fetchall()
+        return [
+            {
+                "id": row["file_id"],
+                "name": row["name"],
+                "mimeType": row["mime_type"],
+                "modifiedTime": row["modified_time"],
+                "snippet": row["snippet"],
+                "score": round(-row["rank"], 4),
+            }
+            for row in rows
+        ]
+
+
+_content_indexes = {}  # Drive index path -> ContentIndex
+_updating = set()
+_lock = threading.Lock()
+_executor = None
+
+
+def _update_all(content_index, extract_text, release=None):
+    try:
+        batch_size = config.get(
+            "GOOGLE_DRIVE_CONTENT_INDEX_BATCH_SIZE", CONTENT_INDEX_BATCH_SIZE
+        )
+        max_chars = config.get(
+            "GOOGLE_DRIVE_CONTENT_INDEX_MAX_CHARS", CONTENT_INDEX_MAX_CHARS
+        )
+        while content_index.update(extract_text, batch_size, max_chars):
+            pass
+    except Exception as e:
+        logger.error(f"Content index update failed: {str(e)}")
+    finally:
+        with _lock:
+            _updating.discard(content_index.drive_index.db_path)
+        if release is not None:
+            release()
+
+
+def schedule_update(content_index, extract_text, release=None):
+    """Index new and changed files in the background unless an update is already running.
+
+    The update runs in a copy of the current context, so extract_text sees the
+    Google services of the request that started it. release is called once
+    the update is done, or right away when none is started.
+    """
+    global _executor
+    key = content_index.drive_index.db_path
+    with _lock:
+        running = key in _updating
+        if not running:
+            _updating.add(key)
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.get(
+                        "GOOGLE_DRIVE_CONTENT_INDEX_WORKERS", CONTENT_INDEX_WORKERS
+                    ),
+                    thread_name_prefix="content-index",
+                )
+    if running:
+        if release is not None:
+            release()
+        return
+    context = contextvars.copy_context()
+    _executor.submit(context.run, _update_all, content_index, extract_text, release)
+
+
+@contextmanager
+def lease_content_index(service, extract_text):
+    """Hold the current user's content index for the with block and update it in the background.
+
+    Yields None when content indexing is disabled or the Drive index is not
+    available, the tool should then search with the Drive API. The Drive
+    index it is stored in stays open until the block and the background
+    update are done.
+    """
+    enabled = config.get("GOOGLE_DRIVE_CONTENT_INDEX_ENABLED", False)
+    if not enabled or not fts5_available():
+        yield None
+        return
+    with lease_drive_index(service) as drive_index:
+        content_index = None
+        if drive_index is not None:
+            try:
+                with _lock:
+                    content_index = _content_indexes.get(drive_index.db_path)
+                    # Indexes closed by the Drive index manager are opened again
+                    if (
+                        content_index is None
+                        or content_index.drive_index is not drive_index
+                    ):
+                        content_index = ContentIndex(drive_index)
+                        _content_indexes[drive_index.db_path] = content_index
+                manager = get_index_manager()
+                manager.retain(drive_index)  # For the background update
+                schedule_update(
+                    content_index,
+                    extract_text,
+                    release=lambda: manager.release(drive_index),
+                )
+            except Exception as e:
+                logger.error(f"Content index unavailable: {str(e)}")
+                content_index = None
+        yield content_index
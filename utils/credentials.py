@@ -1,8 +1,28 @@
+import json
+import time
+import hashlib
+import threading
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from core.utils.logger import logger
-from core.utils.state import global_state  # Import global state
 from core.utils.env import EnvConfig
+from core.utils.config import config
 from cryptography.fernet import Fernet
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+from app.middleware.google.request_state import request_state
+
+# Request state keys and the Google API each service is built for
+GOOGLE_SERVICES = {
+    "google_drive_service": ("drive", "v3"),
+    "google_docs_service": ("docs", "v1"),
+    "google_sheets_service": ("sheets", "v4"),
+}
+
+# Service cache defaults, can be overridden from app config
+SERVICE_CACHE_MAX_USERS = 512  # Maximum number of users with cached services
+SERVICE_CACHE_IDLE_TIMEOUT = 15 * 60  # Seconds before idle users are evicted
 
 
 def decode_access_token(access_token: str):
@@ -32,21 +52,177 @@ def credentials_to_json(credentials):
         "client_id": credentials.client_id,
         "client_secret": credentials.client_secret,
         "scopes": credentials.scopes,
+        "expiry": credentials.expiry.isoformat() if credentials.expiry else None,
     }
 
 
+_discovery_documents = {}  # (api, version) -> parsed discovery document
+_discovery_lock = threading.Lock()
+
+
+def get_discovery_document(api: str, version: str):
+    """Return the parsed discovery document bundled with the client library, loaded once."""
+    key = (api, version)
+    document = _discovery_documents.get(key)
+    if document is None:
+        with _discovery_lock:
+            document = _discovery_documents.get(key)
+            if document is None:
+                content = get_static_doc(api, version)
+                document = json.loads(content) if content else None
+                _discovery_documents[key] = document
+    return document
+
+
+def build_google_service(api: str, version: str, credentials):
+    """Build a Google API service that is safe to share between threads.
+
+    The underlying httplib2 transport is not thread safe, so each thread gets
+    its own authorized transport, created once and reused for keep-alive.
+    """
+    local = threading.local()
+
+    def request_builder(http, *args, **kwargs):
+        if not hasattr(local, "http"):
+            local.http = AuthorizedHttp(credentials, http=httplib2.Http())
+        return HttpRequest(local.http, *args, **kwargs)
+
+    http = AuthorizedHttp(credentials, http=httplib2.Http())
+    document = get_discovery_document(api, version)
+    if document is None:
+        return build(api, version, http=http, requestBuilder=request_builder)
+    return build_from_document(document, http=http, requestBuilder=request_builder)
+
+
+def get_credentials_key(credentials):
+    """Identify the user of a set of credentials without storing secrets."""
+    secret = credentials.refresh_token or credentials.token or ""
+    return hashlib.sha256(f"{credentials.client_id}:{secret}".encode()).hexdigest()
+
+
+class ServiceCache:
+    """Per-user cache of built Google API services, rebuilt when the access token rotates."""
+
+    def __init__(
+        self,
+        max_users=SERVICE_CACHE_MAX_USERS,
+        idle_timeout=SERVICE_CACHE_IDLE_TIMEOUT,
+    ):
+        self.max_users = max(1, int(max_users))
+        self.idle_timeout = idle_timeout
+        self._entries = {}  # user key -> entry
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self._stats = {"hits": 0, "builds": 0, "rotations": 0, "evictions": 0}
+
+    def _entry(self, credentials):
+        """Return the cache entry for the credentials, resetting it on token rotation."""
+        key = get_credentials_key(credentials)
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry["generation"] != credentials.token:
+                self._stats["rotations"] += 1
+                entry = None
+            if entry is None:
+                entry = {
+                    "generation": credentials.token,
+                    "credentials": credentials,
+                    "services": {},
+                    "lock": threading.Lock(),
+                    "last_used": now,
+                }
+                self._entries[key] = entry
+                self._evict_lru()
+            entry["last_used"] = now
+            return entry
+
+    def get(self, name: str, credentials):
+        """Return the service registered under name for these credentials."""
+        entry = self._entry(credentials)
+        service = entry["services"].get(name)
+        if service is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+            return service
+
+        with entry["lock"]:  # Build each service only once per user
+            service = entry["services"].get(name)
+            if service is None:
+                api, version = GOOGLE_SERVICES[name]
+                service = build_google_service(api, version, entry["credentials"])
+                entry["services"][name] = service
+                with self._lock:
+                    self._stats["builds"] += 1
+        return service
+
+    def invalidate(self, credentials):
+        with self._lock:
+            self._entries.pop(get_credentials_key(credentials), None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "users": len(self._entries)}
+
+    def _sweep(self, now):
+        """Evict users idle for longer than the timeout, the lock must be held."""
+        if now - self._last_sweep < min(60, self.idle_timeout):
+            return
+        self._last_sweep = now
+        for key in [
+            key
+            for key, entry in self._entries.items()
+            if now - entry["last_used"] > self.idle_timeout
+        ]:
+            del self._entries[key]
+            self._stats["evictions"] += 1
+
+    def _evict_lru(self):
+        """Keep the cache within max_users, the lock must be held."""
+        while len(self._entries) > self.max_users:
+            oldest = min(self._entries, key=lambda k: self._entries[k]["last_used"])
+            del self._entries[oldest]
+            self._stats["evictions"] += 1
+
+
+service_cache = ServiceCache(
+    max_users=config.get("GOOGLE_SERVICE_CACHE_MAX_USERS", SERVICE_CACHE_MAX_USERS),
+    idle_timeout=config.get(
+        "GOOGLE_SERVICE_CACHE_IDLE_TIMEOUT", SERVICE_CACHE_IDLE_TIMEOUT
+    ),
+)
+
+
+class LazyGoogleService:
+    """Proxy for a Google API service, built the first time a tool uses it.
+
+    The credentials can be a Credentials object or a callable returning one,
+    which allows deferring work such as a token refresh until it is needed.
+    """
+
+    def __init__(self, name: str, credentials):
+        self._name = name
+        self._credentials = credentials
+        self._service = None
+
+    def _resolve(self):
+        if self._service is None:
+            credentials = (
+                self._credentials()
+                if callable(self._credentials)
+                else self._credentials
+            )
+            self._service = service_cache.get(self._name, credentials)
+        return self._service
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+
 def attach_google_services(credentials):
-    """Attach Google API services to the global state."""
-    drive_service = build("drive", "v3", credentials=credentials)
-    docs_service = build("docs", "v1", credentials=credentials)
-    sheets_service = build("sheets", "v4", credentials=credentials)
-
-    global_state.set(
-        "google_drive_service", drive_service, True
-    )  # Save Drive service to global state
-    global_state.set(
-        "google_docs_service", docs_service, True
-    )  # Save Docs service to global state
-    global_state.set(
-        "google_sheets_service", sheets_service, True
-    )  # Save Sheets service to global state
+    """Attach lazily built Google API services to the current request state."""
+    for name in GOOGLE_SERVICES:
+        request_state.set(
+            name, LazyGoogleService(name, credentials), True
+        )  # Save service proxy to request state
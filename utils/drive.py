@@ -0,0 +1,209 @@
+import json
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.utils.config import config
+
+# Largest page size accepted by files().list
+DRIVE_MAX_PAGE_SIZE = 1000
+
+# Fields returned for every listed item
+DEFAULT_FILE_FIELDS = ["id", "name", "mimeType"]
+
+# Additional file fields callers may ask for
+EXTRA_FILE_FIELDS = [
+    "size",
+    "modifiedTime",
+    "createdTime",
+    "parents",
+    "webViewLink",
+    "md5Checksum",
+]
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+# Tree traversal defaults, can be overridden from app config
+FOLDER_TREE_PARENTS_PER_QUERY = 40  # Parent ids combined into one files().list query
+FOLDER_TREE_WORKERS = 8  # Concurrent files().list queries per tree level
+
+
+def encode_cursor(query: str, order_by, page_token, skip: int) -> str:
+    """Encode the position after the last returned item as an opaque cursor."""
+    payload = {"q": query, "o": order_by, "t": page_token, "s": skip}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, query: str, order_by):
+    """Return (page_token, skip) of a cursor, it must belong to the same listing."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        page_token, skip = payload["t"], int(payload["s"])
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if payload.get("q") != query or payload.get("o") != order_by:
+        raise ValueError("The cursor belongs to a different listing.")
+    return page_token, skip
+
+
+def _list_page(service, query, fields, page_size, page_token=None, order_by=None):
+    params = {
+        "q": query,
+        "pageSize": page_size,
+        "fields": f"nextPageToken, files({', '.join(fields)})",
+    }
+    if page_token:
+        params["pageToken"] = page_token
+    if order_by:
+        params["orderBy"] = order_by
+    return service.files().list(**params).execute()
+
+
+def iter_files(service, query: str, fields=None, order_by=None):
+    """Yield every file matching query, following nextPageToken at the maximum page size."""
+    fields = fields or DEFAULT_FILE_FIELDS
+    page_token = None
+    while True:
+        response = _list_page(
+            service, query, fields, DRIVE_MAX_PAGE_SIZE, page_token, order_by
+        )
+        yield from response.get("files", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def count_files(service, query: str) -> int:
+    """Count the files matching query, transferring only their ids."""
+    return sum(1 for _ in iter_files(service, query, ["id"]))
+
+
+def list_files(
+    service, query: str, fields=None, limit=None, cursor=None, order_by=None
+):
+    """Return up to limit files matching query and the cursor of the next item.
+
+    Pages are requested at the largest size that is still needed, the returned
+    cursor is None when the listing is exhausted.
+    """
+    fields = fields or DEFAULT_FILE_FIELDS
+    page_token, skip = decode_cursor(cursor, query, order_by) if cursor else (None, 0)
+    files = []
+
+    while True:
+        wanted = DRIVE_MAX_PAGE_SIZE if limit is None else limit - len(files)
+        page_size = min(DRIVE_MAX_PAGE_SIZE, skip + wanted)
+        response = _list_page(service, query, fields, page_size, page_token, order_by)
+        page = response.get("files", [])
+        next_token = response.get("nextPageToken")
+
+        taken = page[skip : skip + wanted]
+        files.extend(taken)
+        consumed = skip + len(taken)
+        skip = max(0, skip - len(page))
+
+        if consumed < len(page):
+            # Stopped in the middle of the page, resume from the same page
+            return files, encode_cursor(query, order_by, page_token, consumed)
+        if not next_token:
+            return files, None
+        if limit is not None and len(files) >= limit:
+            return files, encode_cursor(query, order_by, next_token, 0)
+        page_token = next_token
+
+
+def _list_children(service, parent_ids, fields, folders_only, take):
+    """List the children of several folders with a single query."""
+    query = " or ".join(f"'{parent_id}' in parents" for parent_id in parent_ids)
+    query = f"({query}) and trashed = false"
+    if folders_only:
+        query += f" and mimeType = '{FOLDER_MIME_TYPE}'"
+
+    children = []
+    for child in iter_files(service, query, fields, order_by="folder,name"):
+        if not take():
+            break  # The node budget is used up by this or another worker
+        children.append(child)
+    return children
+
+
+def walk_folder_tree(
+    service,
+    folder_id="root",
+    max_depth=None,
+    max_nodes=None,
+    fields=None,
+    folders_only=False,
+):
+    """Breadth-first listing of everything below folder_id.
+
+    Each level is fetched with queries combining many parent ids, run
+    concurrently, so the number of round trips grows with the depth of the
+    tree rather than with its number of folders. The service must be safe to
+    share between threads.
+
+    Returns (items, truncated), every item has a "parent_id" and a "depth".
+    """
+    fields = list(dict.fromkeys((fields or DEFAULT_FILE_FIELDS) + ["parents"]))
+    parents_per_query = config.get(
+        "GOOGLE_DRIVE_TREE_PARENTS_PER_QUERY", FOLDER_TREE_PARENTS_PER_QUERY
+    )
+    workers = config.get("GOOGLE_DRIVE_TREE_WORKERS", FOLDER_TREE_WORKERS)
+
+    items = []
+    seen = {folder_id}
+    level = [folder_id]
+    depth = 1
+    budget = {"left": max_nodes, "exhausted": False}
+    lock = threading.Lock()
+
+    def take():
+        with lock:
+            if budget["left"] is None:
+                return True
+            if budget["left"] <= 0:
+                budget["exhausted"] = True
+                return False
+            budget["left"] -= 1
+            return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while level and (max_depth is None or depth <= max_depth):
+            chunks = [
+                level[i : i + parents_per_query]
+                for i in range(0, len(level), parents_per_query)
+            ]
+            results = pool.map(
+                lambda chunk: _list_children(
+                    service, chunk, fields, folders_only, take
+                ),
+                chunks,
+            )
+
+            next_level = []
+            for chunk, children in zip(chunks, results):
+                for child in children:
+                    if child["id"] in seen:
+                        with lock:  # Items with several parents are listed once
+                            if budget["left"] is not None:
+                                budget["left"] += 1
+                        continue
+                    seen.add(child["id"])
+                    child["parent_id"] = (
+                        chunk[0]
+                        if len(chunk) == 1
+                        else next(
+                            (p for p in child.get("parents", []) if p in chunk),
+                            chunk[0],
+                        )
+                    )
+                    child["depth"] = depth
+                    items.append(child)
+                    if child["mimeType"] == FOLDER_MIME_TYPE:
+                        next_level.append(child["id"])
+
+            if budget["exhausted"]:
+                break
+            level = next_level
+            depth += 1
+
+    return items, budget["exhausted"]
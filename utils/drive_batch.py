@@ -0,0 +1,145 @@
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from core.utils.logger import logger
+from core.utils.config import config
+
+# Largest number of calls Drive accepts in one batch request
+DRIVE_BATCH_SIZE = 100
+
+# Retry and concurrency defaults, can be overridden from app config
+BATCH_MAX_ATTEMPTS = 5
+BATCH_RETRY_DELAY = 1.0  # Seconds before the first retry, doubled on every attempt
+BATCH_CONCURRENCY = 4  # Batch requests sent at the same time
+
+# Largest number of items accepted by the bulk tools in one call
+BULK_MAX_ITEMS = 1000
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def is_retryable(error) -> bool:
+    """Tell whether a failed call was rate limited or hit a transient server error."""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 429 or status >= 500:
+        return True
+    if status == 403:
+        try:
+            errors = json.loads(error.content)["error"].get("errors", [])
+        except Exception:
+            return False
+        return any(e.get("reason") in RATE_LIMIT_REASONS for e in errors)
+    return False
+
+
+def error_message(error) -> str:
+    """Return the message Google gave for a failed call."""
+    if isinstance(error, HttpError):
+        try:
+            return error._get_reason() or str(error)
+        except Exception:
+            pass
+    return str(error)
+
+
+def execute_batch(service, requests: dict, batch_size=None, workers=None, sleep=None):
+    """Run many calls of a Google API service through its batch endpoint.
+
+    requests maps a key to a function returning the HttpRequest to run, so
+    calls can be rebuilt when they are retried. Up to workers batches are
+    sent at the same time. Rate limited calls are collected and sent again
+    in new batches with exponential backoff.
+
+    Returns a dict mapping every key to a (response, error) tuple.
+    """
+    batch_size = min(
+        batch_size or config.get("GOOGLE_DRIVE_BATCH_SIZE", DRIVE_BATCH_SIZE),
+        DRIVE_BATCH_SIZE,
+    )
+    workers = workers or config.get("GOOGLE_DRIVE_BATCH_CONCURRENCY", BATCH_CONCURRENCY)
+    sleep = sleep or time.sleep
+    max_attempts = config.get("GOOGLE_DRIVE_BATCH_MAX_ATTEMPTS", BATCH_MAX_ATTEMPTS)
+    retry_delay = config.get("GOOGLE_DRIVE_BATCH_RETRY_DELAY", BATCH_RETRY_DELAY)
+
+    keys = list(requests)
+    results = {}
+    pending = list(range(len(keys)))
+    attempt = 1
+    lock = threading.Lock()
+
+    while pending:
+        retry = []
+        last_attempt = attempt >= max_attempts
+
+        def record(index, response, exception):
+            with lock:
+                if (
+                    exception is not None
+                    and is_retryable(exception)
+                    and not last_attempt
+                ):
+                    retry.append(index)
+                else:
+                    results[keys[index]] = (response, exception)
+
+        def run_batch(chunk):
+            # Built in the worker thread, so the calls use that thread's transport
+            batch = service.new_batch_http_request(
+                callback=lambda request_id, response, exception: record(
+                    int(request_id), response, exception
+                )
+            )
+            for index in chunk:
+                batch.add(requests[keys[index]](), request_id=str(index))
+            try:
+                batch.execute()
+            except Exception as e:
+                # The batch request itself failed, record the calls without a result
+                for index in chunk:
+                    with lock:
+                        answered = keys[index] in results or index in retry
+                    if not answered:
+                        record(index, None, e)
+
+        chunks = [
+            pending[i : i + batch_size] for i in range(0, len(pending), batch_size)
+        ]
+        if workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                list(pool.map(run_batch, chunks))
+        else:
+            for chunk in chunks:
+                run_batch(chunk)
+
+        if retry:
+            delay = retry_delay * 2 ** (attempt - 1) + random.uniform(0, retry_delay)
+            logger.warning(
+                f"Retrying {len(retry)} rate limited batch call(s) in {delay:.1f}s"
+            )
+            sleep(delay)
+        pending = sorted(retry)
+        attempt += 1
+
+    return results
+
+
+def summarize_results(results: list) -> dict:
+    """Build the response of a bulk tool from its per-item results."""
+    failed = sum(1 for result in results if result["status"] != "success")
+    if not failed:
+        status = "success"
+    elif failed == len(results):
+        status = "error"
+    else:
+        status = "partial"
+    return {
+        "status": status,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results,
+    }
@@ -0,0 +1,519 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from core.utils.logger import logger
+from core.utils.config import config
+from core.utils.state import global_state
+from app.middleware.google.request_state import request_state
+from app.utils.drive import iter_files, FOLDER_MIME_TYPE
+
+# Index defaults, can be overridden from app config
+DRIVE_INDEX_REFRESH_INTERVAL = 15  # Seconds before a background sync is started
+DRIVE_INDEX_MAX_STALENESS = 60  # Older indexes are synced before answering
+DRIVE_INDEX_SYNC_WORKERS = 2  # Threads running background seeds and syncs
+DRIVE_INDEX_MAX_OPEN = 64  # Indexes kept open, least recently used are closed
+DRIVE_INDEX_SEARCH_LIMIT = 100  # Matches returned by a search, one Drive page
+
+# File fields stored in the index
+INDEX_FILE_FIELDS = ["id", "name", "mimeType", "parents", "modifiedTime", "size"]
+CHANGES_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    f"changes(fileId, removed, file({', '.join(INDEX_FILE_FIELDS + ['trashed'])}))"
+)
+SEED_CHUNK_SIZE = 1000  # Files written per transaction while seeding
+
+
+class DriveIndex:
+    """Local SQLite copy of the file metadata of one user's Drive.
+
+    The index is seeded with a full listing and then kept current by
+    replaying the Drive changes feed from the saved page token.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()  # Guards the connection
+        self._sync_lock = threading.Lock()  # One seed or sync at a time
+        self.leases = 0  # Holders of the index, counted by DriveIndexManager
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    name_lower TEXT NOT NULL,
+                    mime_type TEXT NOT NULL,
+                    modified_time TEXT,
+                    size TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_files_name_lower ON files (name_lower);
+                CREATE TABLE IF NOT EXISTS parents (
+                    parent_id TEXT NOT NULL,
+                    file_id TEXT NOT NULL,
+                    PRIMARY KEY (parent_id, file_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_parents_file_id ON parents (file_id);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                """
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, **values):
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()],
+        )
+
+    def is_seeded(self):
+        return self._get_meta("page_token") is not None
+
+    def age(self):
+        """Seconds since the index was last brought up to date."""
+        synced_at = self._get_meta("synced_at")
+        return time.time() - float(synced_at) if synced_at else float("inf")
+
+    def _write(self, conn, files=(), removed=()):
+        """Insert or replace files and drop removed ones, the lock must be held."""
+        ids = [(file_id,) for file_id in removed] + [(file["id"],) for file in files]
+        conn.executemany("DELETE FROM parents WHERE file_id = ?", ids)
+        conn.executemany("DELETE FROM files WHERE id = ?", [(i,) for i in removed])
+        conn.executemany(
+            "INSERT OR REPLACE INTO files (id, name, name_lower, mime_type, modified_time, size) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    file["id"],
+                    file.get("name", ""),
+                    file.get("name", "").lower(),
+                    file.get("mimeType", ""),
+                    file.get("modifiedTime"),
+                    file.get("size"),
+                )
+                for file in files
+            ],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO parents (parent_id, file_id) VALUES (?, ?)",
+            [
+                (parent_id, file["id"])
+                for file in files
+                for parent_id in file.get("parents", [])
+            ],
+        )
+        self._remove_orphans(conn, list(removed))
+
+    def _remove_orphans(self, conn, removed):
+        """Drop descendants of removed folders that have no other parent left."""
+        while removed:
+            orphans = []
+            for i in range(0, len(removed), 500):
+                chunk = removed[i : i + 500]
+                marks = ", ".join("?" * len(chunk))
+                children = [
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT file_id FROM parents WHERE parent_id IN ({marks})",
+                        chunk,
+                    )
+                ]
+                conn.execute(f"DELETE FROM parents WHERE parent_id IN ({marks})", chunk)
+                orphans += [
+                    child
+                    for child in children
+                    if not conn.execute(
+                        "SELECT 1 FROM parents WHERE file_id = ?", (child,)
+                    ).fetchone()
+                ]
+            conn.executemany("DELETE FROM files WHERE id = ?", [(i,) for i in orphans])
+            removed = orphans
+
+    def seed(self, service):
+        """Rebuild the index from a full listing of the user's Drive."""
+        # Take the page token first, changes made during the listing are replayed later
+        page_token = service.changes().getStartPageToken().execute()["startPageToken"]
+        root_id = service.files().get(fileId="root", fields="id").execute()["id"]
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("DELETE FROM parents")
+            self._conn.execute("DELETE FROM files")
+
+        chunk = []
+        count = 0
+        for file in iter_files(service, "trashed = false", INDEX_FILE_FIELDS):
+            chunk.append(file)
+            if len(chunk) >= SEED_CHUNK_SIZE:
+                with self._lock, self._conn:
+                    self._write(self._conn, files=chunk)
+                count += len(chunk)
+                chunk = []
+
+        with self._lock, self._conn:
+            self._write(self._conn, files=chunk)
+            self._set_meta(
+                self._conn,
+                root_id=root_id,
+                page_token=page_token,
+                synced_at=time.time(),
+            )
+        count += len(chunk)
+        logger.info(f"Drive index seeded with {count} files at: {self.db_path}")
+        return count
+
+    def sync(self, service):
+        """Apply the changes made since the last sync, returns the number of changes."""
+        page_token = self._get_meta("page_token")
+        count = 0
+        while True:
+            response = (
+                service.changes()
+                .list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    includeRemoved=True,
+                    spaces="drive",
+                    fields=CHANGES_FIELDS,
+                )
+                .execute()
+            )
+
+            files, removed = [], []
+            for change in response.get("changes", []):
+                if not change.get("fileId"):
+                    continue  # Shared drive changes carry no file
+                file = change.get("file")
+                if change.get("removed") or not file or file.get("trashed"):
+                    removed.append(change["fileId"])
+                else:
+                    files.append(file)
+            count += len(files) + len(removed)
+
+            # Save the token with every page, an interrupted sync resumes from there
+            page_token = response.get("newStartPageToken") or response.get(
+                "nextPageToken"
+            )
+            with self._lock, self._conn:
+                self._write(self._conn, files=files, removed=removed)
+                if "newStartPageToken" in response:
+                    self._set_meta(
+                        self._conn, page_token=page_token, synced_at=time.time()
+                    )
+                else:
+                    self._set_meta(self._conn, page_token=page_token)
+
+            if "newStartPageToken" in response:
+                return count
+
+    def refresh(self, service):
+        """Seed the index on first use, sync it afterwards."""
+        with self._sync_lock:
+            if not self.is_seeded():
+                return self.seed(service)
+            return self.sync(service)
+
+    def _files(self, where, params, order="", limit=None, offset=0):
+        sql = f"""
+            SELECT f.id, f.name, f.mime_type, f.modified_time, f.size,
+                (SELECT group_concat(parent_id) FROM parents WHERE file_id = f.id) AS parents
+            FROM files f {where} {order}
+        """
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = (*params, limit, offset)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "mimeType": row["mime_type"],
+                "parents": row["parents"].split(",") if row["parents"] else [],
+                "modifiedTime": row["modified_time"],
+                "size": row["size"],
+            }
+            for row in rows
+        ]
+
+    def get(self, file_id):
+        files = self._files("WHERE f.id = ?", (file_id,))
+        return files[0] if files else None
+
+    def search_by_name(self, name, limit=None):
+        """Return files whose name contains the given text, ignoring case."""
+        pattern = (
+            name.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        return self._files(
+            "WHERE f.name_lower LIKE ? ESCAPE '\\'",
+            (f"%{pattern}%",),
+            "ORDER BY f.name_lower",
+            limit,
+        )
+
+    def list_children(self, folder_id="root", limit=None, offset=0):
+        """Return the children of a folder, folders first and then by name."""
+        if folder_id == "root":
+            folder_id = self._get_meta("root_id")
+        return self._files(
+            "JOIN parents p ON p.file_id = f.id WHERE p.parent_id = ?",
+            (folder_id,),
+            f"ORDER BY f.mime_type = '{FOLDER_MIME_TYPE}' DESC, f.name_lower",
+            limit,
+            offset,
+        )
+
+    def count_children(self, folder_id, recursive=False):
+        """Return (file_count, folder_count, total_size) of the items below a folder.
+
+        Only direct children are counted unless recursive is set, total_size
+        is the sum of the sizes Drive reports for the counted files.
+        """
+        if recursive:
+            tree = """
+                WITH RECURSIVE tree(id) AS (
+                    SELECT file_id FROM parents WHERE parent_id = ?
+                    UNION
+                    SELECT p.file_id FROM parents p JOIN tree t ON p.parent_id = t.id
+                )
+            """
+        else:
+            tree = "WITH tree(id) AS (SELECT file_id FROM parents WHERE parent_id = ?)"
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                {tree}
+                SELECT
+                    coalesce(sum(f.mime_type != ?), 0),
+                    coalesce(sum(f.mime_type = ?), 0),
+                    coalesce(sum(CAST(f.size AS INTEGER)), 0)
+                FROM files f JOIN tree t ON t.id = f.id
+                """,
+                (folder_id, FOLDER_MIME_TYPE, FOLDER_MIME_TYPE),
+            ).fetchone()
+        return tuple(row)
+
+    def get_path(self, file_id):
+        """Return the items from the root down to file_id, None if it or an ancestor is not indexed."""
+        root_id = self._get_meta("root_id")
+        path = []
+        seen = set()
+        while file_id and file_id != root_id and file_id not in seen:
+            seen.add(file_id)
+            file = self.get(file_id)
+            if file is None:
+                return None
+            path.append(file)
+            file_id = file["parents"][0] if file["parents"] else None
+        return path[::-1]
+
+
+class DriveIndexManager:
+    """Open per-user indexes and keep them within the freshness bound.
+
+    Requests and background syncs hold a lease on the index they use, only
+    indexes without leases are closed to stay within max_open.
+    """
+
+    def __init__(
+        self,
+        directory,
+        refresh_interval=DRIVE_INDEX_REFRESH_INTERVAL,
+        max_staleness=DRIVE_INDEX_MAX_STALENESS,
+        workers=DRIVE_INDEX_SYNC_WORKERS,
+        max_open=DRIVE_INDEX_MAX_OPEN,
+    ):
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.max_open = max(1, int(max_open))
+        os.makedirs(directory, exist_ok=True)
+        self._indexes = {}  # user_id -> (index, last used)
+        self._syncing = set()  # Users with a background seed or sync queued or running
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="drive-index"
+        )
+        self._stats = {"hits": 0, "fallbacks": 0, "syncs": 0, "failures": 0}
+
+    def acquire(self, user_id):
+        """Open the user's index and take a lease on it, to be given back with release."""
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is None:
+                name = hashlib.sha256(user_id.encode()).hexdigest()[:32]
+                index = DriveIndex(os.path.join(self.directory, f"{name}.db"))
+            else:
+                index = entry[0]
+            index.leases += 1
+            self._indexes[user_id] = (index, time.time())
+            self._close_idle()
+            return index
+
+    def retain(self, index):
+        """Take another lease on an index already held, e.g. for a background task."""
+        with self._lock:
+            index.leases += 1
+
+    def release(self, index):
+        with self._lock:
+            index.leases -= 1
+            self._close_idle()
+
+    def _close_idle(self):
+        """Keep at most max_open indexes open, the lock must be held."""
+        while len(self._indexes) > self.max_open:
+            user_id = min(
+                (u for u in self._indexes if not self._indexes[u][0].leases),
+                key=lambda u: self._indexes[u][1],
+                default=None,
+            )
+            if user_id is None:
+                return
+            self._indexes.pop(user_id)[0].close()
+
+    def _refresh(self, user_id, index, service):
+        try:
+            index.refresh(service)
+            with self._lock:
+                self._stats["syncs"] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats["failures"] += 1
+            logger.error(f"Drive index sync failed for user {user_id}: {str(e)}")
+            raise
+
+    def _background_refresh(self, user_id, index, service):
+        try:
+            self._refresh(user_id, index, service)
+        finally:
+            with self._lock:
+                self._syncing.discard(user_id)
+            self.release(index)
+
+    def _schedule(self, user_id, index, service):
+        """Start a background seed or sync unless one is already running."""
+        with self._lock:
+            if user_id in self._syncing:
+                return
+            self._syncing.add(user_id)
+            index.leases += 1  # Given back when the sync is done
+        future = self._executor.submit(
+            self._background_refresh, user_id, index, service
+        )
+        future.add_done_callback(lambda f: f.exception())  # Already logged
+
+    @contextmanager
+    def lease(self, user_id, service):
+        """Hold the user's index for the with block, None to use the API instead.
+
+        Unseeded indexes are seeded in the background. Indexes older than the
+        refresh interval are synced in the background, indexes older than the
+        staleness bound are synced before they are handed out.
+        """
+        index = self.acquire(user_id)
+        try:
+            yield self._lookup(user_id, index, service)
+        finally:
+            self.release(index)
+
+    def _lookup(self, user_id, index, service):
+        if not index.is_seeded():
+            self._schedule(user_id, index, service)
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return None
+
+        age = index.age()
+        if age >= self.max_staleness:
+            try:
+                # Serialized with background syncs by the index's sync lock
+                self._refresh(user_id, index, service)
+            except Exception:
+                with self._lock:
+                    self._stats["fallbacks"] += 1
+                return None
+        elif age >= self.refresh_interval:
+            self._schedule(user_id, index, service)
+
+        with self._lock:
+            self._stats["hits"] += 1
+        return index
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "open": len(self._indexes)}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_index_manager():
+    """Return the shared index manager, stored next to the credentials database."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            db_handler = global_state.get("db_handler")
+            default_directory = os.path.join(
+                os.path.dirname(os.path.abspath(db_handler.db_path)), "drive_index"
+            )
+            _manager = DriveIndexManager(
+                config.get("GOOGLE_DRIVE_INDEX_PATH", default_directory),
+                refresh_interval=config.get(
+                    "GOOGLE_DRIVE_INDEX_REFRESH_INTERVAL", DRIVE_INDEX_REFRESH_INTERVAL
+                ),
+                max_staleness=config.get(
+                    "GOOGLE_DRIVE_INDEX_MAX_STALENESS", DRIVE_INDEX_MAX_STALENESS
+                ),
+                workers=config.get(
+                    "GOOGLE_DRIVE_INDEX_SYNC_WORKERS", DRIVE_INDEX_SYNC_WORKERS
+                ),
+                max_open=config.get(
+                    "GOOGLE_DRIVE_INDEX_MAX_OPEN", DRIVE_INDEX_MAX_OPEN
+                ),
+            )
+            global_state.set("drive_index_manager", _manager, True)
+        return _manager
+
+
+@contextmanager
+def lease_drive_index(service):
+    """Hold the current user's up to date index for the with block.
+
+    Yields None when the tool should query Drive. The index stays open until
+    the block exits, even when other users' indexes are opened meanwhile.
+    """
+    user_id = request_state.get("google_user_id")
+    if not config.get("GOOGLE_DRIVE_INDEX_ENABLED", False) or service is None:
+        user_id = None
+    with ExitStack() as stack:
+        index = None
+        if user_id:
+            try:
+                index = stack.enter_context(get_index_manager().lease(user_id, service))
+            except Exception as e:
+                logger.error(f"Drive index unavailable: {str(e)}")
+        yield index
@@ -0,0 +1,1037 @@
+import re
+import json
+import time
+import base64
+import threading
+from googleapiclient.errors import HttpError
+from core.utils.config import config
+from app.middleware.google.request_state import request_state
+
+# Tab properties fetched for planning reads and writes
+SHEET_METADATA_FIELDS = (
+    "sheets.properties(sheetId, title, index, gridProperties(rowCount, columnCount))"
+)
+
+# Sheets defaults, can be overridden from app config
+SHEET_METADATA_CACHE_TTL = 60  # Seconds tab properties are reused
+SHEET_METADATA_CACHE_MAX = 1024  # Spreadsheets kept in the metadata cache
+SHEET_READ_WINDOW = 5000  # Rows fetched per values().get request
+SHEET_TAB_MAX_ROWS = 10000  # Rows of a whole tab returned by read_ranges
+SHEET_BATCH_MAX_REQUESTS = 1000  # Requests sent in one spreadsheets().batchUpdate
+SHEET_WRITE_MAX_BYTES = 2_000_000  # Approximate values payload of one write request
+SHEET_WRITE_MAX_RANGES = 500  # Ranges written by one values().batchUpdate
+SHEET_APPEND_MAX_ROWS = 10000  # Rows sent by one values().append
+# Seconds a key column index is reused at the same file version
+SHEET_KEY_INDEX_TTL = 300
+SHEET_KEY_INDEX_CACHE_MAX = 256  # Key column indexes kept in memory
+SHEET_KEY_READ_WINDOW = 50000  # Rows of the key column fetched per request
+
+_metadata_cache = {}  # (user id, spreadsheet id) -> (sheets, fetched at)
+_metadata_lock = threading.Lock()
+
+
+def get_sheet_metadata(service, spreadsheet_id: str, refresh=False):
+    """Return the properties of every tab of a spreadsheet, cached per user for a short time.
+
+    Only the tab properties are requested, never the cell data.
+    """
+    key = (request_state.get("google_user_id"), spreadsheet_id)
+    ttl = config.get("GOOGLE_SHEET_METADATA_CACHE_TTL", SHEET_METADATA_CACHE_TTL)
+    now = time.time()
+    with _metadata_lock:
+        entry = _metadata_cache.get(key)
+    if entry is not None and not refresh and now - entry[1] < ttl:
+        return entry[0]
+
+    response = (
+        service.spreadsheets()
+        .get(spreadsheetId=spreadsheet_id, fields=SHEET_METADATA_FIELDS)
+        .execute()
+    )
+    sheets = [sheet["properties"] for sheet in response.get("sheets", [])]
+    with _metadata_lock:
+        _metadata_cache.pop(key, None)
+        _metadata_cache[key] = (sheets, now)
+        max_entries = config.get(
+            "GOOGLE_SHEET_METADATA_CACHE_MAX", SHEET_METADATA_CACHE_MAX
+        )
+        while len(_metadata_cache) > max_entries:
+            _metadata_cache.pop(next(iter(_metadata_cache)))  # Oldest first
+    return sheets
+
+
+def invalidate_sheet_metadata(spreadsheet_id: str):
+    """Forget the cached tab properties after the tabs or their size changed."""
+    key = (request_state.get("google_user_id"), spreadsheet_id)
+    with _metadata_lock:
+        _metadata_cache.pop(key, None)
+
+
+def resolve_sheet(sheets, sheet=None):
+    """Return the properties of the tab named sheet or with that sheetId, the first tab by default."""
+    if not sheets:
+        raise ValueError("No sheets found in the spreadsheet.")
+    if sheet is None or sheet == "":
+        return sheets[0]
+    for properties in sheets:
+        if properties.get("title") == str(sheet):
+            return properties
+    for properties in sheets:
+        if str(properties.get("sheetId")) == str(sheet):
+            return properties
+    raise ValueError(f"Sheet '{sheet}' not found in the spreadsheet.")
+
+
+def quote_sheet_title(title: str) -> str:
+    """Quote a tab title for use in A1 notation."""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def column_letter(index: int) -> str:
+    """Return the A1 letters of a 1-based column index."""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def column_index(letters: str) -> int:
+    """Return the 1-based index of A1 column letters."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def parse_columns(columns):
+    """Return the (first, last) column letters of a column range like "B:D" or "C"."""
+    if not columns:
+        return None
+    match = re.fullmatch(r"\s*([A-Za-z]{1,3})\s*(?::\s*([A-Za-z]{1,3}))?\s*", columns)
+    if not match:
+        raise ValueError(f"Invalid column range '{columns}', use letters like 'B:D'.")
+    first, last = match.group(1).upper(), (match.group(2) or match.group(1)).upper()
+    if column_index(first) > column_index(last):
+        first, last = last, first
+    return first, last
+
+
+def row_range(title: str, first_row: int, last_row: int, columns=None) -> str:
+    """Return the A1 range of rows first_row to last_row, limited to a column range."""
+    first_col, last_col = parse_columns(columns) or ("A", None)
+    if last_col is None:
+        return f"{quote_sheet_title(title)}!{first_row}:{last_row}"
+    return f"{quote_sheet_title(title)}!{first_col}{first_row}:{last_col}{last_row}"
+
+
+def _error_reason(error):
+    """Return the message of a failed request, the API reason for HTTP errors."""
+    if isinstance(error, HttpError):
+        return error._get_reason()
+    return str(error) or type(error).__name__
+
+
+def coalesce_rows(row_indices):
+    """Merge 1-based row numbers into (first, last) runs of contiguous rows, bottom-up."""
+    runs = []
+    for row in sorted(set(row_indices), reverse=True):
+        if runs and runs[-1][0] == row + 1:
+            runs[-1][0] = row
+        else:
+            runs.append([row, row])
+    return [tuple(run) for run in runs]
+
+
+def delete_rows(service, spreadsheet_id: str, sheet_id: int, row_indices):
+    """Delete rows of a tab as contiguous runs sent bottom-up.
+
+    Runs are deleted bottom-up so no deletion shifts another, in batch
+    updates of at most GOOGLE_SHEET_BATCH_MAX_REQUESTS requests. Returns a
+    dict with the number of ranges and rows deleted and the requests sent;
+    when a batch fails it also holds the error and the remaining_rows, which
+    are all above the deleted ones and so keep their row numbers.
+    """
+    runs = coalesce_rows(row_indices)
+    batch_size = config.get("GOOGLE_SHEET_BATCH_MAX_REQUESTS", SHEET_BATCH_MAX_REQUESTS)
+    result = {"ranges_deleted": 0, "rows_deleted": 0, "requests": 0}
+    try:
+        # Higher row numbers are sent in earlier batches
+        for i in range(0, len(runs), batch_size):
+            batch = runs[i : i + batch_size]
+            service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={
+                    "requests": [
+                        {
+                            "deleteDimension": {
+                                "range": {
+                                    "sheetId": sheet_id,
+                                    "dimension": "ROWS",
+                                    "startIndex": first - 1,
+                                    "endIndex": last,
+                                }
+                            }
+                        }
+                        for first, last in batch
+                    ]
+                },
+                fields="spreadsheetId",
+            ).execute()
+            result["requests"] += 1
+            result["ranges_deleted"] += len(batch)
+            result["rows_deleted"] += sum(last - first + 1 for first, last in batch)
+    except Exception as e:
+        result["error"] = _error_reason(e)
+        result["remaining_rows"] = sorted(
+            row
+            for first, last in runs[result["ranges_deleted"] :]
+            for row in range(first, last + 1)
+        )
+    finally:
+        if runs:
+            invalidate_sheet_metadata(spreadsheet_id)  # The row count changed
+    return result
+
+
+def plan_row_windows(start_row: int, row_count, grid_rows: int, window: int):
+    """Yield (first_row, last_row) windows covering the requested rows of the grid."""
+    last_row = (
+        grid_rows if row_count is None else min(grid_rows, start_row + row_count - 1)
+    )
+    first_row = max(1, start_row)
+    while first_row <= last_row:
+        end = min(last_row, first_row + window - 1)
+        yield first_row, end
+        first_row = end + 1
+
+
+def iter_rows(
+    service,
+    spreadsheet_id: str,
+    properties: dict,
+    start_row=1,
+    row_count=None,
+    columns=None,
+    window=None,
+    value_render_option="FORMATTED_VALUE",
+):
+    """Yield (row_number, values) of a tab, fetched window by window.
+
+    Windows are planned from the tab's grid size, so no request goes past the
+    last row and at most one window of values is held in memory.
+    """
+    window = window or config.get("GOOGLE_SHEET_READ_WINDOW", SHEET_READ_WINDOW)
+    grid_rows = properties.get("gridProperties", {}).get("rowCount", 0)
+    for first_row, last_row in plan_row_windows(
+        start_row, row_count, grid_rows, window
+    ):
+        response = (
+            service.spreadsheets()
+            .values()
+            .get(
+                spreadsheetId=spreadsheet_id,
+                range=row_range(properties["title"], first_row, last_row, columns),
+                majorDimension="ROWS",
+                valueRenderOption=value_render_option,
+            )
+            .execute()
+        )
+        for offset, values in enumerate(response.get("values", [])):
+            yield first_row + offset, values
+
+
+def encode_sheet_cursor(spreadsheet_id: str, sheet_id, columns, next_row: int) -> str:
+    """Encode the position of the next row to read as an opaque cursor."""
+    payload = {"i": spreadsheet_id, "s": sheet_id, "c": columns, "r": next_row}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_sheet_cursor(cursor: str, spreadsheet_id: str):
+    """Return (sheet_id, columns, next_row) of a cursor issued for the same spreadsheet."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        sheet_id, columns, next_row = payload["s"], payload["c"], int(payload["r"])
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if payload.get("i") != spreadsheet_id:
+        raise ValueError("The cursor belongs to a different spreadsheet.")
+    return sheet_id, columns, next_row
+
+
+def read_rows(
+    service, spreadsheet_id: str, sheet=None, start_row=1, row_count=1000, columns=None
+):
+    """Read a window of rows of a tab, returns (properties, rows, next_cursor).
+
+    Every row is returned as {"row": row_number, "values": [...]}, empty rows
+    are left out. next_cursor is None once the last row of the grid was read.
+    The grid size is fetched again, rows may have been added by someone else
+    since the tab properties were cached.
+    """
+    properties = resolve_sheet(
+        get_sheet_metadata(service, spreadsheet_id, refresh=True), sheet
+    )
+    parse_columns(columns)  # Validate before any request
+    rows = [
+        {"row": row_number, "values": values}
+        for row_number, values in iter_rows(
+            service, spreadsheet_id, properties, start_row, row_count, columns
+        )
+        if values
+    ]
+    next_row = start_row + row_count
+    next_cursor = None
+    if next_row <= properties.get("gridProperties", {}).get("rowCount", 0):
+        next_cursor = encode_sheet_cursor(
+            spreadsheet_id, properties["sheetId"], columns, next_row
+        )
+    return properties, rows, next_cursor
+
+
+def read_ranges(service, spreadsheet_id: str, sheets=None, ranges=None, max_rows=None):
+    """Read whole tabs and A1 ranges of a spreadsheet with a single values().batchGet.
+
+    Tabs are given by name or sheetId and read up to max_rows rows, with a
+    cursor for the Get Sheet Values tool when more rows may follow. Without
+    sheets and ranges every tab is read. Returns one entry per tab and then
+    one per range, each in the requested order.
+    """
+    max_rows = max_rows or config.get("GOOGLE_SHEET_TAB_MAX_ROWS", SHEET_TAB_MAX_ROWS)
+    entries = []
+    if sheets or not ranges:
+        # Fresh grid sizes, so no added rows are cut off without a cursor
+        tabs = get_sheet_metadata(service, spreadsheet_id, refresh=True)
+        selected = [resolve_sheet(tabs, sheet) for sheet in sheets] if sheets else tabs
+        for properties in selected:
+            grid_rows = properties.get("gridProperties", {}).get("rowCount", 0)
+            if not grid_rows:
+                continue  # Chart and other object tabs have no cells
+            entry = {
+                "sheet": properties["title"],
+                "range": row_range(properties["title"], 1, min(grid_rows, max_rows)),
+            }
+            if grid_rows > max_rows:
+                entry["truncated"] = True
+                entry["next_cursor"] = encode_sheet_cursor(
+                    spreadsheet_id, properties["sheetId"], None, max_rows + 1
+                )
+            entries.append(entry)
+    entries += [{"range": a1_range} for a1_range in ranges or []]
+    if not entries:
+        return []
+
+    response = (
+        service.spreadsheets()
+        .values()
+        .batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[entry["range"] for entry in entries],
+            majorDimension="ROWS",
+        )
+        .execute()
+    )
+    for entry, value_range in zip(entries, response.get("valueRanges", [])):
+        entry["range"] = value_range.get("range", entry["range"])
+        entry["values"] = value_range.get("values", [])
+    return entries
+
+
+_A1_CELL = re.compile(
+    r"^(?:(?P<title>'(?:[^']|'')+'|[^!]+)!)?"
+    r"(?P<col>[A-Za-z]{1,3})(?P<row>\d+)"
+    r"(?::(?P<last_col>[A-Za-z]{1,3})(?P<last_row>\d+))?$"
+)
+
+
+def parse_a1(a1_range: str):
+    """Return (title, first_row, first_col, last_row, last_col) of a cell range.
+
+    The title is None when the range has no tab, the last row and column are
+    None for a single cell. Returns None for ranges that are not made of
+    cells, like whole columns or named ranges.
+    """
+    match = _A1_CELL.match(a1_range.strip())
+    if not match:
+        return None
+    title = match.group("title")
+    if title and title.startswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return (
+        title,
+        int(match.group("row")),
+        column_index(match.group("col")),
+        int(match.group("last_row")) if match.group("last_row") else None,
+        column_index(match.group("last_col")) if match.group("last_col") else None,
+    )
+
+
+def _block_range(block):
+    last_row = block["row"] + len(block["values"]) - 1
+    last_col = block["col"] + block["width"] - 1
+    cells = f"{column_letter(block['col'])}{block['row']}:{column_letter(last_col)}{last_row}"
+    if block["title"] is None:
+        return cells
+    return f"{quote_sheet_title(block['title'])}!{cells}"
+
+
+def _overlaps(a, b):
+    return (
+        a["title"] == b["title"]
+        and a["row"] < b["row"] + len(b["values"])
+        and b["row"] < a["row"] + len(a["values"])
+        and a["col"] < b["col"] + b["width"]
+        and b["col"] < a["col"] + a["width"]
+    )
+
+
+def _any_overlap(blocks):
+    """Sweep the blocks from top to bottom, comparing each with those still spanning its row."""
+    active = []
+    for block in sorted(blocks, key=lambda b: (b["title"] or "", b["row"])):
+        active = [
+            a
+            for a in active
+            if a["title"] == block["title"]
+            and a["row"] + len(a["values"]) > block["row"]
+        ]
+        if any(_overlaps(a, block) for a in active):
+            return True
+        active.append(block)
+    return False
+
+
+def _merge_pass(blocks, vertical):
+    """Merge blocks that touch along one direction and have the same extent across it."""
+    if vertical:
+        key = lambda b: (b["title"] or "", b["col"], b["width"], b["row"])
+    else:
+        key = lambda b: (b["title"] or "", b["row"], len(b["values"]), b["col"])
+    merged = []
+    for block in sorted(blocks, key=key):
+        last = merged[-1] if merged else None
+        if last is not None and last["title"] == block["title"]:
+            if (
+                vertical
+                and last["col"] == block["col"]
+                and last["width"] == block["width"]
+                and last["row"] + len(last["values"]) == block["row"]
+            ):
+                last["values"].extend(block["values"])
+                last["sources"].extend(block["sources"])
+                continue
+            if (
+                not vertical
+                and last["row"] == block["row"]
+                and len(last["values"]) == len(block["values"])
+                and last["col"] + last["width"] == block["col"]
+            ):
+                last["values"] = [
+                    a + b for a, b in zip(last["values"], block["values"])
+                ]
+                last["width"] += block["width"]
+                last["sources"].extend(block["sources"])
+                continue
+        merged.append(
+            {
+                **block,
+                "values": list(block["values"]),
+                "sources": list(block["sources"]),
+            }
+        )
+    return merged
+
+
+def merge_value_ranges(updates):
+    """Turn [{"range", "values"}] updates into as few rectangular blocks as possible.
+
+    Ranges sharing an edge and the same extent along it are merged, rows are
+    padded with None, which the API skips, so no other cell is written.
+    Nothing is merged when updates overlap, are not cell ranges or mix
+    ranges with and without a tab name, which may be the same tab, so they
+    are still applied in their original order. Every block lists the indexes
+    of its updates in "sources".
+    """
+    blocks, others = [], []
+    for i, update in enumerate(updates):
+        values = update["values"]
+        if not values:
+            continue  # Nothing to write
+        parsed = parse_a1(update["range"])
+        if parsed is None:
+            others.append({"range": update["range"], "values": values, "sources": [i]})
+            continue
+        title, row, col, last_row, last_col = parsed
+        width = max(len(row_values) for row_values in values)
+        if (last_row is not None and row + len(values) - 1 > last_row) or (
+            last_col is not None and col + width - 1 > last_col
+        ):
+            raise ValueError(f"The values do not fit in the range {update['range']}.")
+        blocks.append(
+            {
+                "title": title,
+                "row": row,
+                "col": col,
+                "width": width,
+                "values": [
+                    list(row_values) + [None] * (width - len(row_values))
+                    for row_values in values
+                ],
+                "sources": [i],
+            }
+        )
+
+    untitled = {block["title"] is None for block in blocks}
+    if others or len(untitled) > 1 or _any_overlap(blocks):
+        # Later updates must win, keep the order of the request
+        merged = blocks
+    else:
+        merged = blocks
+        while True:  # A merge along one direction can allow one along the other
+            count = len(merged)
+            merged = _merge_pass(_merge_pass(merged, vertical=True), vertical=False)
+            if len(merged) == count:
+                break
+    for block in merged:
+        block["range"] = _block_range(block)
+    return sorted(merged + others, key=lambda block: block["sources"][0])
+
+
+def split_value_ranges(blocks, max_bytes=None):
+    """Split blocks whose values exceed max_bytes into blocks of fewer rows."""
+    max_bytes = max_bytes or config.get(
+        "GOOGLE_SHEET_WRITE_MAX_BYTES", SHEET_WRITE_MAX_BYTES
+    )
+    for block in blocks:
+        if "row" not in block or len(json.dumps(block["values"])) <= max_bytes:
+            yield block
+            continue
+        chunk, size, row = [], 0, block["row"]
+        for row_values in block["values"]:
+            row_size = len(json.dumps(row_values)) + 1
+            if chunk and size + row_size > max_bytes:
+                part = {**block, "row": row, "values": chunk}
+                yield {**part, "range": _block_range(part)}
+                row += len(chunk)
+                chunk, size = [], 0
+            chunk.append(row_values)
+            size += row_size
+        part = {**block, "row": row, "values": chunk}
+        yield {**part, "range": _block_range(part)}
+
+
+def _plan_write_batches(blocks, max_bytes, max_ranges):
+    batch, size = [], 0
+    for block in split_value_ranges(blocks, max_bytes):
+        block_size = len(json.dumps(block["values"]))
+        if batch and (size + block_size > max_bytes or len(batch) >= max_ranges):
+            yield batch
+            batch, size = [], 0
+        batch.append(block)
+        size += block_size
+    if batch:
+        yield batch
+
+
+def write_value_ranges(service, spreadsheet_id: str, updates, value_input_option="RAW"):
+    """Write many ranges with as few values().batchUpdate requests as possible.
+
+    Adjacent ranges are merged and the payload is split into requests of at
+    most GOOGLE_SHEET_WRITE_MAX_BYTES and GOOGLE_SHEET_WRITE_MAX_RANGES
+    ranges. Returns (results, requests), one result per update in the order
+    of the updates and the number of requests sent. API errors fail the
+    ranges of their request only; after a transport error (timeout, dropped
+    connection) no more requests are sent and the remaining ranges are
+    reported as not_sent.
+    """
+    max_bytes = config.get("GOOGLE_SHEET_WRITE_MAX_BYTES", SHEET_WRITE_MAX_BYTES)
+    max_ranges = config.get("GOOGLE_SHEET_WRITE_MAX_RANGES", SHEET_WRITE_MAX_RANGES)
+    results = [None] * len(updates)
+    requests = 0
+    batches = list(
+        _plan_write_batches(merge_value_ranges(updates), max_bytes, max_ranges)
+    )
+    for position, batch in enumerate(batches):
+        body = {
+            "valueInputOption": value_input_option,
+            "data": [
+                {
+                    "range": block["range"],
+                    "majorDimension": "ROWS",
+                    "values": block["values"],
+                }
+                for block in batch
+            ],
+        }
+        requests += 1
+        try:
+            response = (
+                service.spreadsheets()
+                .values()
+                .batchUpdate(spreadsheetId=spreadsheet_id, body=body)
+                .execute()
+            )
+            responses = response.get("responses", [])
+            for i, block in enumerate(batch):
+                updated_range = (
+                    responses[i].get("updatedRange", block["range"])
+                    if i < len(responses)
+                    else block["range"]
+                )
+                for source in block["sources"]:
+                    if results[source] is None:
+                        results[source] = {
+                            "range": updates[source]["range"],
+                            "status": "success",
+                            "updated_ranges": [],
+                        }
+                    if results[source]["status"] == "success":
+                        results[source]["updated_ranges"].append(updated_range)
+        except HttpError as e:
+            for block in batch:
+                for source in block["sources"]:
+                    results[source] = {
+                        "range": updates[source]["range"],
+                        "status": "error",
+                        "error": e._get_reason(),
+                    }
+        except Exception as e:
+            # The outcome of this request is unknown, the connection may be gone
+            for block in batch:
+                for source in block["sources"]:
+                    results[source] = {
+                        "range": updates[source]["range"],
+                        "status": "error",
+                        "error": _error_reason(e),
+                    }
+            for later in batches[position + 1 :]:
+                for block in later:
+                    for source in block["sources"]:
+                        if results[source] is not None:
+                            if results[source]["status"] == "success":
+                                results[source] = {
+                                    "range": updates[source]["range"],
+                                    "status": "error",
+                                    "error": f"Partly written before a request failed: {_error_reason(e)}",
+                                }
+                            continue
+                        results[source] = {
+                            "range": updates[source]["range"],
+                            "status": "error",
+                            "error": f"Not sent after a request failed: {_error_reason(e)}",
+                            "not_sent": True,
+                        }
+            break
+
+    for source, update in enumerate(updates):
+        if results[source] is None:
+            results[source] = {
+                "range": update["range"],
+                "status": "success",
+                "updated_ranges": [],
+            }
+    return results, requests
+
+
+def chunk_rows(values, max_rows, max_bytes):
+    """Yield (offset, rows) chunks of at most max_rows rows and about max_bytes of values."""
+    chunk, size, offset = [], 0, 0
+    for row_values in values:
+        row_size = len(json.dumps(row_values)) + 1
+        if chunk and (len(chunk) >= max_rows or size + row_size > max_bytes):
+            yield offset, chunk
+            offset += len(chunk)
+            chunk, size = [], 0
+        chunk.append(row_values)
+        size += row_size
+    if chunk:
+        yield offset, chunk
+
+
+def append_rows(
+    service,
+    spreadsheet_id: str,
+    properties: dict,
+    values,
+    value_input_option="RAW",
+    start_offset=0,
+    anchor_cell=None,
+):
+    """Append rows below the table of a tab in size-bounded chunks sent one after the other.
+
+    The table is looked for from anchor_cell (e.g. "B2"), in the whole tab by default.
+    Every chunk is anchored right below the rows written by the previous one,
+    so the rows keep their order. New rows are inserted rather than written
+    over the cells below the table. Returns a dict with the number of rows
+    added, the first_row they were written to and the requests sent; when a
+    chunk fails it also holds the error and the next_offset to resume from.
+    """
+    max_rows = config.get("GOOGLE_SHEET_APPEND_MAX_ROWS", SHEET_APPEND_MAX_ROWS)
+    max_bytes = config.get("GOOGLE_SHEET_WRITE_MAX_BYTES", SHEET_WRITE_MAX_BYTES)
+    title = quote_sheet_title(properties["title"])
+    target = f"{title}!{anchor_cell}" if anchor_cell else title
+    result = {"rows_added": 0, "requests": 0}
+    try:
+        for offset, chunk in chunk_rows(values[start_offset:], max_rows, max_bytes):
+            result["requests"] += 1
+            response = (
+                service.spreadsheets()
+                .values()
+                .append(
+                    spreadsheetId=spreadsheet_id,
+                    range=target,
+                    valueInputOption=value_input_option,
+                    insertDataOption="INSERT_ROWS",
+                    body={"majorDimension": "ROWS", "values": chunk},
+                )
+                .execute()
+            )
+            result["rows_added"] += len(chunk)
+            updated = parse_a1(response.get("updates", {}).get("updatedRange", ""))
+            if updated is not None:
+                result.setdefault("first_row", updated[1])
+                last_row = updated[3] or updated[1]
+                target = f"{title}!{column_letter(updated[2])}{last_row + 1}"
+    except Exception as e:
+        # Timeouts and dropped connections can be resumed like API errors
+        result["error"] = _error_reason(e)
+        result["next_offset"] = start_offset + result["rows_added"]
+    finally:
+        if result["requests"]:
+            invalidate_sheet_metadata(spreadsheet_id)  # Rows were inserted
+    return result
+
+
+def _cell_text(value):
+    """Normalize a cell value for comparison with the values read from a sheet."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _changed_runs(row_number, first_col, title, current, desired):
+    """Return updates for the runs of consecutive cells of a row that differ."""
+    width = max(len(current), len(desired))
+    updates = []
+    run_start, run = None, []
+    for i in range(width + 1):
+        changed = False
+        if i < width:
+            want = desired[i] if i < len(desired) else ""  # Cleared
+            have = _cell_text(current[i]) if i < len(current) else ""
+            changed = want is not None and _cell_text(want) != (have or "")
+        if changed:
+            if run_start is None:
+                run_start = i
+            run.append(want)
+        elif run_start is not None:
+            cell = f"{column_letter(first_col + run_start)}{row_number}"
+            updates.append(
+                {"range": f"{quote_sheet_title(title)}!{cell}", "values": [run]}
+            )
+            run_start, run = None, []
+    return updates
+
+
+def sync_table(
+    service,
+    spreadsheet_id: str,
+    properties: dict,
+    desired,
+    start_cell="A1",
+    value_input_option="RAW",
+    extra_rows="delete",
+):
+    """Make the table at start_cell equal to desired, writing only what differs.
+
+    The current table, from start_cell to the end of the tab, is read once
+    window by window with formulas and unformatted values, and compared row
+    by row: identical rows are skipped with a single comparison, the cells
+    that differ in other rows are written with merged values().batchUpdate
+    requests. Rows missing from the sheet are appended, rows the desired
+    table does not have are deleted, cleared or kept depending on
+    extra_rows. Cells set to None in desired are left unchanged.
+    """
+    parsed = parse_a1(start_cell if "!" in start_cell else f"x!{start_cell}")
+    if parsed is None or parsed[3] is not None:
+        raise ValueError(f"Invalid start cell '{start_cell}', use a cell like 'A1'.")
+    _, first_row, first_col, _, _ = parsed
+    title = properties["title"]
+    grid_cols = properties.get("gridProperties", {}).get("columnCount", 26)
+    columns = f"{column_letter(first_col)}:{column_letter(max(first_col, grid_cols))}"
+
+    updates, extra, seen = [], [], set()
+    current_rows = 0
+    for row_number, current in iter_rows(
+        service,
+        spreadsheet_id,
+        properties,
+        first_row,
+        columns=columns,
+        value_render_option="FORMULA",
+    ):
+        offset = row_number - first_row
+        if current:
+            current_rows = offset + 1
+        seen.add(offset)
+        if offset >= len(desired):
+            if current:
+                extra.append((row_number, current))
+            continue
+        want = desired[offset]
+        if [_cell_text(value) for value in want] == [
+            _cell_text(value) for value in current
+        ]:
+            continue  # Unchanged row
+        updates += _changed_runs(row_number, first_col, title, current, want)
+
+    # Rows inside the current table that were empty
+    for offset in range(min(current_rows, len(desired))):
+        if offset not in seen:
+            updates += _changed_runs(
+                first_row + offset, first_col, title, [], desired[offset]
+            )
+
+    result = {
+        "cells_written": sum(len(update["values"][0]) for update in updates),
+        "rows_appended": 0,
+        "rows_deleted": 0,
+        "rows_cleared": 0,
+        "requests": 0,
+    }
+    if extra and extra_rows == "clear":
+        for row_number, current in extra:
+            updates += _changed_runs(row_number, first_col, title, current, [])
+        result["rows_cleared"] = len(extra)
+
+    if updates:
+        results, requests = write_value_ranges(
+            service, spreadsheet_id, updates, value_input_option
+        )
+        result["requests"] += requests
+        errors = [r for r in results if r["status"] != "success"]
+        if errors:
+            result["error"] = errors[0]["error"]
+            return result
+
+    if extra and extra_rows == "delete":
+        rows = [row_number for row_number, _ in extra]
+        deleted = delete_rows(service, spreadsheet_id, properties["sheetId"], rows)
+        result["rows_deleted"] = deleted["rows_deleted"]
+        result["requests"] += deleted["requests"]
+        if "error" in deleted:
+            result["error"] = deleted["error"]
+            return result
+
+    if len(desired) > current_rows:
+        appended = append_rows(
+            service,
+            spreadsheet_id,
+            properties,
+            desired[current_rows:],
+            value_input_option,
+            # Right below the current table, a gap in it must not end the table early
+            anchor_cell=f"{column_letter(first_col)}{first_row + current_rows}",
+        )
+        result["rows_appended"] = appended["rows_added"]
+        result["requests"] += appended["requests"]
+        if "error" in appended:
+            result["error"] = appended["error"]
+    return result
+
+
+# (user id, spreadsheet id, sheetId, column, header rows) -> entry
+_key_index_cache = {}
+_key_index_lock = threading.Lock()
+
+
+def get_file_version(drive_service, spreadsheet_id: str):
+    """Return the Drive version of a file, it increases with every change."""
+    if drive_service is None:
+        return None
+    response = (
+        drive_service.files().get(fileId=spreadsheet_id, fields="version").execute()
+    )
+    return response.get("version")
+
+
+def build_key_index(
+    service, spreadsheet_id: str, properties: dict, key_column, header_rows=1
+):
+    """Read the key column of a tab and map every key to the first row holding it."""
+    index = {}
+    window = config.get("GOOGLE_SHEET_KEY_READ_WINDOW", SHEET_KEY_READ_WINDOW)
+    for row_number, values in iter_rows(
+        service,
+        spreadsheet_id,
+        properties,
+        header_rows + 1,
+        columns=key_column,
+        window=window,
+        value_render_option="UNFORMATTED_VALUE",
+    ):
+        key = _cell_text(values[0]) if values else None
+        if key:
+            index.setdefault(key, row_number)
+    return index
+
+
+def get_key_index(
+    service,
+    drive_service,
+    spreadsheet_id: str,
+    properties: dict,
+    key_column,
+    header_rows=1,
+):
+    """Return (index, version), the key index of a tab reused while the file version is unchanged.
+
+    Without a Drive service the version is unknown and the index is rebuilt
+    on every call.
+    """
+    version = get_file_version(drive_service, spreadsheet_id)
+    key = (
+        request_state.get("google_user_id"),
+        spreadsheet_id,
+        properties["sheetId"],
+        key_column,
+        header_rows,
+    )
+    ttl = config.get("GOOGLE_SHEET_KEY_INDEX_TTL", SHEET_KEY_INDEX_TTL)
+    with _key_index_lock:
+        entry = _key_index_cache.get(key)
+    if (
+        version is not None
+        and entry is not None
+        and entry["version"] == version
+        and time.time() - entry["built_at"] < ttl
+    ):
+        return entry["index"], version
+
+    # The cached grid size may predate the change that invalidated the index
+    properties = resolve_sheet(
+        get_sheet_metadata(service, spreadsheet_id, refresh=True),
+        properties["sheetId"],
+    )
+    index = build_key_index(
+        service, spreadsheet_id, properties, key_column, header_rows
+    )
+    if version is not None:
+        store_key_index(
+            spreadsheet_id, properties, key_column, header_rows, index, version
+        )
+    return index, version
+
+
+def store_key_index(
+    spreadsheet_id, properties, key_column, header_rows, index, version
+):
+    key = (
+        request_state.get("google_user_id"),
+        spreadsheet_id,
+        properties["sheetId"],
+        key_column,
+        header_rows,
+    )
+    with _key_index_lock:
+        _key_index_cache.pop(key, None)
+        _key_index_cache[key] = {
+            "index": index,
+            "version": version,
+            "built_at": time.time(),
+        }
+        max_entries = config.get(
+            "GOOGLE_SHEET_KEY_INDEX_CACHE_MAX", SHEET_KEY_INDEX_CACHE_MAX
+        )
+        while len(_key_index_cache) > max_entries:
+            _key_index_cache.pop(next(iter(_key_index_cache)))  # Oldest first
+
+
+def upsert_rows(
+    service,
+    drive_service,
+    spreadsheet_id: str,
+    properties: dict,
+    rows,
+    key_column="A",
+    header_rows=1,
+    value_input_option="RAW",
+):
+    """Update the rows whose key is already in the tab and append the others.
+
+    Rows are looked up in a key column index, matched rows are written with
+    one merged values().batchUpdate and new rows with one chunked append.
+    Rows without a key are rejected, when a key is given several times the
+    last row wins. After the writes the index is kept for the new file
+    version, so consecutive upserts do not read the key column again, unless
+    the version moved more than the requests sent, which means someone else
+    changed the file meanwhile.
+    """
+    first, last = parse_columns(key_column) or (None, None)
+    if first is None or first != last:
+        raise ValueError("The key column must be a single column, like 'A'.")
+    key_offset = column_index(first) - 1
+
+    latest = {}
+    for position, row in enumerate(rows):
+        key = _cell_text(row[key_offset]) if key_offset < len(row) else None
+        if not key:
+            raise ValueError(f"Row {position + 1} has no value in key column {first}.")
+        latest[key] = row
+
+    index, version = get_key_index(
+        service, drive_service, spreadsheet_id, properties, first, header_rows
+    )
+    title = quote_sheet_title(properties["title"])
+    updates, new_keys, new_rows = [], [], []
+    for key, row in latest.items():
+        if key in index:
+            updates.append({"range": f"{title}!A{index[key]}", "values": [row]})
+        else:
+            new_keys.append(key)
+            new_rows.append(row)
+
+    result = {"rows_updated": 0, "rows_appended": 0, "requests": 0}
+    if updates:
+        results, requests = write_value_ranges(
+            service, spreadsheet_id, updates, value_input_option
+        )
+        result["requests"] += requests
+        result["rows_updated"] = sum(1 for r in results if r["status"] == "success")
+        errors = [r for r in results if r["status"] != "success"]
+        if errors:
+            result["error"] = errors[0]["error"]
+            return result
+
+    if new_rows:
+        appended = append_rows(
+            service, spreadsheet_id, properties, new_rows, value_input_option
+        )
+        result["rows_appended"] = appended["rows_added"]
+        result["requests"] += appended["requests"]
+        if "error" in appended:
+            result["error"] = appended["error"]
+            return result
+        if "first_row" not in appended or any(
+            row >= appended["first_row"] for row in index.values()
+        ):
+            return result  # Inserted above indexed rows, which moved down
+        index = dict(index)
+        for offset, key in enumerate(new_keys):
+            index[key] = appended["first_row"] + offset
+
+    if version is not None and (updates or new_rows):
+        new_version = get_file_version(drive_service, spreadsheet_id)
+        # Every request sent moves the version, any further change may have moved rows
+        if (
+            new_version is not None
+            and int(new_version) - int(version) <= result["requests"]
+        ):
+            store_key_index(
+                spreadsheet_id, properties, first, header_rows, index, new_version
+            )
+    return result